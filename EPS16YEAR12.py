@@ -1,23 +1,13 @@
-import os
+import argparse
 import pandas as pd
-import requests
 from bs4 import BeautifulSoup
-from supabase import create_client, Client
+from clients import supabase, get_session
+from fundamentals import read_sheet, locate_columns
 from dotenv import load_dotenv
-import sys
 import time
 
 # --- 1. ตั้งค่าการเชื่อมต่อ ---
 load_dotenv()
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-
-try:
-    supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-    print("--- เชื่อมต่อ Supabase สำเร็จ ---")
-except Exception as e:
-    print(f"Error: {e}")
-    sys.exit()
 
 def safe_float(value):
     try:
@@ -29,29 +19,33 @@ def safe_float(value):
         return None
 
 # --- 2. ดึงราคาประวัติศาสตร์ (จากอดีตใน CSV ทั้งหมด) ---
+# หาคอลัมน์จากชื่อ header (เดิมใช้ index 338-343 และ 69 ซึ่งเลื่อนเมื่อไฟล์ถูกแก้)
+PRICE_LABELS = ["DATE", "OPEN", "HIGH", "LOW", "CLOSE", "VOLUME", "EPSเฉลี่ย"]
+
 def get_historical_prices(file_path, stock_name):
     print(f"--- เริ่มประมวลผลข้อมูลราคาอดีตจากไฟล์ CSV ---")
     try:
         # อ่านไฟล์ทั้งหมดโดยไม่ระบุ Header
-        df = pd.read_csv(file_path, header=None, low_memory=False)
+        df = read_sheet(file_path)
+        header_row, col = locate_columns(df, PRICE_LABELS)
         data_to_insert = []
         
-        # วนลูปทุกแถวเพื่อดึงประวัติศาสตร์
-        for i in range(len(df)):
+        # วนลูปทุกแถวใต้ header เพื่อดึงประวัติศาสตร์
+        for i in range(header_row + 1, len(df)):
             row = df.iloc[i]
-            close_val = safe_float(row[342]) # Index 342 ตามที่คุณตรวจพบ
+            close_val = safe_float(row[col["CLOSE"]])
             
             # ถ้ามีราคาปิด ให้ถือว่าเป็นแถวข้อมูล
             if close_val is not None and close_val > 0:
                 data_to_insert.append({
                     "stock_symbol": stock_name,
-                    "date": str(row[338]) if pd.notnull(row[338]) else None,
-                    "open_price": safe_float(row[339]) or 0.0,
-                    "high_price": safe_float(row[340]) or 0.0,
-                    "low_price": safe_float(row[341]) or 0.0,
+                    "date": row[col["DATE"]] or None,
+                    "open_price": safe_float(row[col["OPEN"]]) or 0.0,
+                    "high_price": safe_float(row[col["HIGH"]]) or 0.0,
+                    "low_price": safe_float(row[col["LOW"]]) or 0.0,
                     "close_price": close_val,
-                    "volume": int(safe_float(row[343])) if safe_float(row[343]) else 0,
-                    "eps": safe_float(row[69]) # EPSเฉลี่ย
+                    "volume": int(safe_float(row[col["VOLUME"]])) if safe_float(row[col["VOLUME"]]) else 0,
+                    "eps": safe_float(row[col["EPSเฉลี่ย"]])
                 })
         return data_to_insert
     except Exception as e:
@@ -68,7 +62,7 @@ def scrape_news_to_past(stock_name, pages=5):
         # เว็บส่วนใหญ่ใช้โครงสร้าง /page/x สำหรับหน้าถัดไป
         url = f"https://www.kaohoon.com/tag/{stock_name.lower()}/page/{page}"
         try:
-            res = requests.get(url, headers=headers, timeout=15)
+            res = get_session().get(url, headers=headers, timeout=15)
             if res.status_code != 200:
                 break # หยุดถ้าไม่พบหน้าถัดไป
                 
@@ -122,4 +116,5 @@ def main():
             print(f"Error Insert News: {e}")
 
 if __name__ == "__main__":
+    argparse.ArgumentParser(description="อัปโหลดราคาอดีตจาก EPS16YEAR12.csv และข่าว Kaohoon ของ TEAMG").parse_args()
     main()
\ No newline at end of file
@@ -0,0 +1,349 @@
+"""
+Backtest แบบ vectorized บนราคาย้อนหลังหลายหุ้นพร้อมกัน
+
+ข้อมูลเป็นเมทริกซ์ (วัน x หุ้น) ทุกขั้นคำนวณด้วย NumPy ทั้งเมทริกซ์ ไม่มี loop ทีละแท่ง
+- เงื่อนไขเขียนเป็นนิพจน์ Python เช่น "z_score < -2 and close > ema_200"
+  แปลงด้วย AST (and/or/not -> & | ~, a < b < c -> (a < b) & (b < c)) แล้ว eval ได้ boolean array
+  ใช้ได้เฉพาะชื่อตัวแปร ตัวเลข การเปรียบเทียบ และ + - * / เท่านั้น
+- ตัวแปร: open high low close volume, คอลัมน์ตัวเลขอื่นในตาราง และ indicator ที่คำนวณให้เมื่อถูกใช้
+  ema_N, sma_N, rsi_N, z_N, std_N, ret_N (% N วัน), high_N / low_N (สูง/ต่ำสุด N วันก่อนหน้า)
+  ชื่อแบบ teamg_data_pipeline: rsi = rsi_14, z_score = z_20
+- parameter: ใส่ใน {} เช่น "z_score < -{th} and close > ema_{slow}" แล้วกวาดค่าด้วย run_grid()
+  (หลาย process, ส่งข้อมูลให้แต่ละ worker ครั้งเดียวตอนเริ่ม)
+
+ถือหุ้นตั้งแต่แท่งถัดจากวันที่เกิดสัญญาณ (ไม่มองอนาคต) หักค่าธรรมเนียม COST ทุกครั้งที่สถานะเปลี่ยน
+พอร์ตเฉลี่ยน้ำหนักเท่ากันทุกหุ้น
+
+    python backtest.py --entry "z_score < -{th} and close > ema_{slow}" --exit "z_score > 0" \\
+        --grid th=1,1.5,2,2.5 --grid slow=100:250:25 --since 2018-01-01
+"""
+import os
+import re
+import ast
+import time
+import argparse
+import itertools
+from functools import lru_cache, reduce
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import indicators
+
+PRICE_TABLE = "stock_prices"
+PRICE_FIELDS = ("open", "high", "low", "close", "volume")
+
+# ค่าธรรมเนียม + slippage ต่อการเปลี่ยนสถานะ 1 ครั้ง (สัดส่วน)
+COST = 0.0015
+BARS_PER_YEAR = 252
+
+INDICATOR_RE = re.compile(r"^(ema|sma|rsi|z|std|ret|high|low)_(\d+)$")
+
+# ชื่อคอลัมน์ใน teamg_master_analysis -> indicator ที่สูตรเดียวกัน
+ALIASES = {"rsi": "rsi_14", "z_score": "z_20"}
+
+
+class Panel:
+    """
+    ราคาหลายหุ้นในรูปเมทริกซ์ fields[name] มีขนาด (len(dates), len(symbols))
+    indicator ถูกคำนวณครั้งแรกที่ถูกเรียกแล้วเก็บไว้ใน process นั้น
+    """
+
+    def __init__(self, dates, symbols, fields):
+        self.dates = list(dates)
+        self.symbols = list(symbols)
+        self.fields = dict(fields)
+        self._cache = {}
+
+    def __getstate__(self):
+        # ส่งไป worker เฉพาะข้อมูลดิบ indicator ไปคำนวณใหม่ฝั่งโน้น
+        return {"dates": self.dates, "symbols": self.symbols, "fields": self.fields, "_cache": {}}
+
+    def __getitem__(self, name):
+        if name in self.fields:
+            return self.fields[name]
+        name = ALIASES.get(name, name)
+        if name not in self._cache:
+            self._cache[name] = self._compute(name)
+        return self._cache[name]
+
+    def _compute(self, name):
+        import pandas as pd
+
+        match = INDICATOR_RE.match(name)
+        if not match:
+            raise KeyError(f"ไม่รู้จักตัวแปร {name!r} (มี {', '.join(sorted(self.fields))} และ ema_N sma_N rsi_N z_N ...)")
+        kind, window = match.group(1), int(match.group(2))
+        if kind == "ema":
+            return indicators.ema(self.fields["close"], window)
+        if kind == "rsi":
+            # Wilder RSI แบบเดียวกับ teamg_data_pipeline.py
+            return indicators.rsi(self.fields["close"], window)
+
+        close = pd.DataFrame(self.fields["close"])
+        if kind == "sma":
+            out = close.rolling(window).mean()
+        elif kind == "std":
+            out = close.rolling(window).std()
+        elif kind == "z":
+            out = (close - close.rolling(window).mean()) / close.rolling(window).std()
+        elif kind == "ret":
+            out = close.pct_change(window, fill_method=None) * 100
+        elif kind == "high":
+            out = pd.DataFrame(self.fields["high"]).rolling(window).max().shift(1)
+        else:
+            out = pd.DataFrame(self.fields["low"]).rolling(window).min().shift(1)
+        return out.to_numpy(dtype=float)
+
+
+def panel_from_rows(rows):
+    """แถวแบบ stock_prices (symbol, date, ราคา ...) -> Panel (คอลัมน์ตัวเลขทุกคอลัมน์เป็น field)"""
+    import pandas as pd
+
+    df = pd.DataFrame(rows)
+    if df.empty:
+        raise ValueError("ไม่มีข้อมูลราคา")
+    df = df.drop_duplicates(["date", "symbol"], keep="last")
+    values = df.drop(columns=["symbol", "date"]).apply(pd.to_numeric, errors="coerce")
+    values = values.drop(columns=[c for c in ("id",) if c in values.columns]).dropna(axis=1, how="all")
+
+    wide = values.assign(symbol=df["symbol"], date=df["date"]).pivot(index="date", columns="symbol").sort_index()
+    symbols = sorted(df["symbol"].unique())
+    fields = {column: wide[column].reindex(columns=symbols).to_numpy(dtype=float) for column in values.columns}
+    return Panel(wide.index, symbols, fields)
+
+
+def load_panel(symbols=None, since=None, table=PRICE_TABLE, source="storage"):
+    """
+    อ่านราคาเป็น Panel
+    source="storage": จาก Supabase/TEAMG_STORAGE ทีละหน้า / "cache": จาก price_cache.py (memmap ไม่ต้องยิง network)
+    """
+    if source == "cache":
+        from price_cache import PriceCache
+
+        cache = PriceCache()
+        if not cache.exists():
+            raise ValueError("ยังไม่มี price cache (รัน python price_cache.py --rebuild ก่อน)")
+        return cache.panel(symbols, since)
+
+    from clients import supabase
+    from storage import fetch_all
+
+    def build_query():
+        query = supabase.table(table).select("*")
+        if symbols:
+            query = query.in_("symbol", symbols)
+        if since:
+            query = query.gte("date", str(since))
+        return query.order("symbol").order("date")
+
+    return panel_from_rows(fetch_all(build_query))
+
+
+class _Vectorize(ast.NodeTransformer):
+    """and/or/not และการเปรียบเทียบแบบต่อกัน -> operator แบบ element-wise ของ NumPy"""
+
+    def visit_BoolOp(self, node):
+        self.generic_visit(node)
+        op = ast.BitAnd if isinstance(node.op, ast.And) else ast.BitOr
+        return reduce(lambda left, right: ast.BinOp(left, op(), right), node.values)
+
+    def visit_UnaryOp(self, node):
+        self.generic_visit(node)
+        if isinstance(node.op, ast.Not):
+            return ast.UnaryOp(ast.Invert(), node.operand)
+        return node
+
+    def visit_Compare(self, node):
+        self.generic_visit(node)
+        if len(node.ops) == 1:
+            return node
+        parts, left = [], node.left
+        for op, right in zip(node.ops, node.comparators):
+            parts.append(ast.Compare(left, [op], [right]))
+            left = right
+        return reduce(lambda a, b: ast.BinOp(a, ast.BitAnd(), b), parts)
+
+
+_ALLOWED_NODES = (
+    ast.Expression, ast.BoolOp, ast.And, ast.Or, ast.UnaryOp, ast.Not, ast.USub, ast.UAdd,
+    ast.BinOp, ast.Add, ast.Sub, ast.Mult, ast.Div, ast.Compare, ast.Lt, ast.LtE, ast.Gt, ast.GtE,
+    ast.Eq, ast.NotEq, ast.Name, ast.Load, ast.Constant,
+)
+
+
+@lru_cache(maxsize=4096)
+def compile_signal(expression):
+    """นิพจน์เงื่อนไข -> (code object, ชื่อตัวแปรที่ใช้) ตรวจว่าไม่มีอะไรนอกจากตัวแปร ตัวเลข และ operator"""
+    tree = ast.parse(expression, mode="eval")
+    for node in ast.walk(tree):
+        if not isinstance(node, _ALLOWED_NODES):
+            raise ValueError(f"ใช้ {type(node).__name__} ในนิพจน์ไม่ได้: {expression}")
+        if isinstance(node, ast.Constant) and not isinstance(node.value, (int, float)):
+            raise ValueError(f"ค่าคงที่ต้องเป็นตัวเลข: {expression}")
+    tree = ast.fix_missing_locations(_Vectorize().visit(tree))
+    names = frozenset(node.id for node in ast.walk(tree) if isinstance(node, ast.Name))
+    return compile(tree, "<signal>", "eval"), names
+
+
+def evaluate(panel, expression, params=None):
+    """คืน boolean array (วัน x หุ้น) ของนิพจน์ ({name} ถูกแทนด้วยค่าใน params ก่อน)"""
+    params = params or {}
+    if "{" in expression:
+        expression = expression.format(**params)
+    code, names = compile_signal(expression)
+    scope = {name: params[name] if name in params else panel[name] for name in names}
+    with np.errstate(invalid="ignore"):
+        result = eval(code, {"__builtins__": {}}, scope)
+    shape = (len(panel.dates), len(panel.symbols))
+    return np.broadcast_to(np.asarray(result, dtype=bool), shape)
+
+
+def positions(entry, exit=None):
+    """
+    สถานะถือ (1/0) ณ สิ้นวัน ไม่มี exit = ถือเฉพาะวันที่ entry เป็นจริง
+    มี exit = เข้าเมื่อ entry ออกเมื่อ exit ระหว่างนั้นคงสถานะเดิม (forward-fill ด้วย maximum.accumulate)
+    """
+    if exit is None:
+        return entry.astype(float)
+    state = np.where(entry, 1.0, np.where(exit, 0.0, np.nan))
+    rows = np.arange(len(state))[:, None]
+    last = np.where(np.isnan(state), 0, rows)
+    np.maximum.accumulate(last, axis=0, out=last)
+    filled = np.take_along_axis(state, last, axis=0)
+    return np.nan_to_num(filled, nan=0.0)
+
+
+def backtest(panel, entry, exit=None, params=None, cost=COST):
+    """ผลของกลยุทธ์ 1 ชุด parameter (พอร์ตถ่วงเท่ากันทุกหุ้นที่มีราคาในวันนั้น)"""
+    close = panel["close"]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        returns = np.zeros_like(close)
+        returns[1:] = close[1:] / close[:-1] - 1
+    # หุ้นที่ยังไม่เข้าตลาด (ไม่มีราคาวันนั้น) ไม่นับในค่าเฉลี่ยของวันนั้น ไม่ใช่นับเป็นผลตอบแทน 0
+    active = np.isfinite(close)
+    returns = np.nan_to_num(returns, nan=0.0, posinf=0.0, neginf=0.0)
+
+    pos = positions(evaluate(panel, entry, params), evaluate(panel, exit, params) if exit else None)
+    held = np.zeros_like(pos)
+    held[1:] = pos[:-1]
+    changes = np.abs(np.diff(pos, axis=0, prepend=0.0))
+
+    pnl = np.where(active, held * returns - cost * changes, 0.0)
+    count = active.sum(axis=1)
+    daily = np.divide(pnl.sum(axis=1), count, out=np.zeros(len(count)), where=count > 0)
+    equity = np.cumprod(1 + daily)
+    drawdown = equity / np.maximum.accumulate(equity) - 1
+    years = max(len(daily) / BARS_PER_YEAR, 1e-9)
+    std = daily.std()
+
+    return {
+        "total_return": float(equity[-1] - 1),
+        "cagr": float(equity[-1] ** (1 / years) - 1) if equity[-1] > 0 else -1.0,
+        "sharpe": float(daily.mean() / std * np.sqrt(BARS_PER_YEAR)) if std > 0 else 0.0,
+        "max_drawdown": float(drawdown.min()),
+        "turnover": float(changes.sum() / len(panel.symbols) / years),
+        "exposure": float(held.mean()),
+        "trades": int((np.diff(pos, axis=0, prepend=0.0) > 0).sum()),
+    }
+
+
+def parameter_grid(grid):
+    """{"th": [1, 2], "slow": [100, 200]} -> list ของ dict ทุกชุด (ถ้าเป็น list ของ dict อยู่แล้วคืนตามเดิม)"""
+    if isinstance(grid, list):
+        return grid
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+
+
+_worker_panel = None
+
+
+def _init_worker(panel):
+    global _worker_panel
+    _worker_panel = panel
+
+
+def _run_params(task):
+    entry, exit, params, cost = task
+    try:
+        result = backtest(_worker_panel, entry, exit, params, cost)
+    except (KeyError, ValueError) as e:
+        result = {"error": str(e)}
+    return {**params, **result}
+
+
+def run_grid(panel, entry, exit=None, grid=None, cost=COST, workers=None, rank_by="sharpe",
+             initializer=None, initargs=()):
+    """
+    รัน backtest ทุกชุด parameter (dict ของ list หรือ list ของ dict) บน process pool
+    คืน DataFrame เรียงตาม rank_by (มากไปน้อย)
+    panel ถูกส่งให้แต่ละ worker ครั้งเดียว (initializer) task เป็นแค่ dict ของ parameter
+    initializer/initargs: ให้ worker สร้าง panel เอง (เช่น param_sweep.py ผูกกับ shared memory) แทนการ pickle panel
+    """
+    import pandas as pd
+
+    tasks = [(entry, exit, params, cost) for params in parameter_grid(grid or {})]
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(tasks) < 2:
+        _init_worker(panel)
+        results = [_run_params(task) for task in tasks]
+    else:
+        if initializer is None:
+            initializer, initargs = _init_worker, (panel,)
+        chunksize = max(1, len(tasks) // (workers * 4))
+        with ProcessPoolExecutor(workers, initializer=initializer, initargs=initargs) as pool:
+            results = list(pool.map(_run_params, tasks, chunksize=chunksize))
+
+    df = pd.DataFrame(results)
+    if rank_by in df.columns:
+        df = df.sort_values(rank_by, ascending=False, na_position="last")
+    return df.reset_index(drop=True)
+
+
+def parse_grid(specs):
+    """["th=1,1.5,2", "slow=100:250:25"] -> {"th": [1, 1.5, 2], "slow": [100, 125, ..., 250]}"""
+    def number(text):
+        value = float(text)
+        return int(value) if value.is_integer() and "." not in text else value
+
+    grid = {}
+    for spec in specs or []:
+        name, _, values = spec.partition("=")
+        if ":" in values:
+            start, stop, step = (number(v) for v in values.split(":"))
+            count = int(round((stop - start) / step)) + 1
+            grid[name.strip()] = [number(f"{start + i * step:g}") for i in range(count)]
+        else:
+            grid[name.strip()] = [number(v) for v in values.split(",") if v.strip()]
+    return grid
+
+
+if __name__ == "__main__":
+    from save_bec_to_supabase import set50_symbols
+
+    parser = argparse.ArgumentParser(description="backtest เงื่อนไขซื้อ/ขายบนราคาย้อนหลังหลายหุ้น (vectorized)")
+    parser.add_argument("--entry", required=True, help='เงื่อนไขเข้า เช่น "z_score < -2 and close > ema_200"')
+    parser.add_argument("--exit", help="เงื่อนไขออก (ไม่ใส่ = ถือเฉพาะวันที่ entry เป็นจริง)")
+    parser.add_argument("--grid", action="append", help="parameter เช่น th=1,1.5,2 หรือ slow=100:250:25 (ใส่ซ้ำได้)")
+    parser.add_argument("--symbols", help="คั่นด้วย , (default SET50)")
+    parser.add_argument("--since", help="วันเริ่ม YYYY-MM-DD")
+    parser.add_argument("--table", default=PRICE_TABLE)
+    parser.add_argument("--source", choices=["storage", "cache"], default="storage",
+                        help="cache = อ่านจาก price_cache.py (memmap) แทน query")
+    parser.add_argument("--cost", type=float, default=COST)
+    parser.add_argument("--workers", type=int, help="จำนวน process (default ทุก core)")
+    parser.add_argument("--rank-by", default="sharpe", help="คอลัมน์ที่ใช้เรียงผล (sharpe, cagr, total_return ...)")
+    parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args()
+
+    symbols = args.symbols.split(",") if args.symbols else [s.replace(".BK", "") for s in set50_symbols]
+    started = time.perf_counter()
+    panel = load_panel(symbols, args.since, args.table, args.source)
+    print(f"โหลด {len(panel.symbols)} หุ้น x {len(panel.dates)} วัน ({time.perf_counter() - started:.1f} วินาที)")
+
+    started = time.perf_counter()
+    results = run_grid(panel, args.entry, args.exit, parse_grid(args.grid), args.cost, args.workers,
+                       args.rank_by)
+    print(f"รัน {len(results)} ชุด parameter ใน {time.perf_counter() - started:.1f} วินาที")
+    print(results.head(args.top).to_string(index=False))
@@ -0,0 +1,122 @@
+"""
+เทียบการอ่าน workbook หลาย sheet: pd.read_excel + iterrows (วิธีเดิมของ import_data.py) กับ excel_ingest แบบ stream
+
+สร้าง workbook จำลองหน้าตาแบบ MyAllYear.xlsx (ตารางละปีต่อกันใน sheet, หลาย sheet) ลงไฟล์ชั่วคราว
+แล้ววัดเวลา (และหน่วยความจำสูงสุดด้วย tracemalloc เมื่อใส่ --memory) ของแต่ละวิธี ผลจำนวนแถวต้องเท่ากัน
+
+ตัวอย่าง:
+    python bench_excel.py
+    python bench_excel.py --sheets 20 --years 10 --rows 2000 --memory
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import tracemalloc
+from datetime import datetime
+
+import excel_ingest
+
+HEADER = ["SYMBOL", "วันปิดสมุด", "ผู้ถือหุ้นรายใหญ่", "จำนวนหุ้น", "%", "%Free", "ราคา", "รวมมูลค่า", "DPS",
+          "รวมปันผล", "P/E"]
+
+
+def synth_workbook(path, sheets, years, rows, seed=0):
+    """sheet ละตระกูล แต่ละ sheet มี years ตาราง ตารางละ rows แถว (มีบรรทัดสรุปคั่นแบบไฟล์จริง)"""
+    import openpyxl
+
+    rng = random.Random(seed)
+    workbook = openpyxl.Workbook(write_only=True)
+    for s in range(sheets):
+        sheet = workbook.create_sheet(f"พอร์ต{s}")
+        sheet.append([f"พอร์ตลงทุนของ พอร์ต{s}"])
+        for y in range(years):
+            year = 2015 + y
+            sheet.append([])
+            sheet.append([None] * 6 + ["ณ วันที่", "รวมมูลค่า", "%D/P", "รวมมูลค่า", "+/-ปีก่อน"])
+            sheet.append([None, None, "รวมมูลค่าพอร์ตที่ปรากฎชื่อ", None, None, None, datetime(year, 12, 31),
+                          rng.uniform(1e8, 1e10), 0.02, 1e6, 0.1])
+            sheet.append(HEADER)
+            for i in range(rows):
+                price = round(rng.uniform(1, 50), 2)
+                shares = rng.randint(1_000_000, 200_000_000)
+                sheet.append([f"S{i % 300:03d}", datetime(year, 1 + i % 12, 1 + i % 28), f"ผู้ถือหุ้น {i}", shares,
+                              rng.random() / 5, rng.random(), price, price * shares, 0.1, 0.1 * shares,
+                              rng.uniform(5, 40)])
+    workbook.save(path)
+
+
+def with_read_excel(path):
+    """วิธีเดิม: โหลดทุก sheet เข้า DataFrame แล้ววน iterrows ทีละตาราง"""
+    import pandas as pd
+
+    count = 0
+    for sheet, df in pd.read_excel(path, sheet_name=None, header=None).items():
+        header = None
+        for _, row in df.iterrows():
+            values = row.tolist()
+            if "SYMBOL" in values:
+                header = values
+                continue
+            if header is None or pd.isna(values[0]):
+                continue
+            record = dict(zip(header, values))
+            count += record["SYMBOL"] is not None
+    return count
+
+
+def with_stream(path, engine):
+    return sum(1 for _ in excel_ingest.iter_source("my_all_year", path, engine))
+
+
+def peak_memory(fn, *args):
+    """หน่วยความจำสูงสุดระหว่างรัน (รันแยกจากรอบจับเวลา เพราะ tracemalloc ทำให้ช้าลงมาก)"""
+    tracemalloc.start()
+    try:
+        fn(*args)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="วัดเวลาอ่าน workbook: read_excel เทียบ excel_ingest แบบ stream")
+    parser.add_argument("--sheets", type=int, default=5)
+    parser.add_argument("--years", type=int, default=10)
+    parser.add_argument("--rows", type=int, default=1000, help="แถวต่อปีต่อ sheet")
+    parser.add_argument("--memory", action="store_true", help="วัดหน่วยความจำสูงสุดด้วย (รันซ้ำอีกรอบ)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "bench.xlsx")
+        synth_workbook(path, args.sheets, args.years, args.rows)
+        print(f"workbook {args.sheets} sheet x {args.years} ปี x {args.rows} แถว "
+              f"({os.path.getsize(path) / 1e6:.1f} MB)")
+
+        runs = [("read_excel + iterrows", with_read_excel, ())]
+        runs.append(("stream openpyxl", with_stream, ("openpyxl",)))
+        if excel_ingest.python_calamine is not None:
+            runs.append(("stream calamine", with_stream, ("calamine",)))
+
+        results = {}
+        for name, fn, extra in runs:
+            started = time.perf_counter()
+            count = fn(path, *extra)
+            seconds = time.perf_counter() - started
+            results[name] = (count, seconds)
+            memory = f"  peak {peak_memory(fn, path, *extra) / 1e6:6.1f} MB" if args.memory else ""
+            print(f"  {name:<22} {count:>8} แถว  {seconds:6.2f} s  {count / seconds:>9.0f} แถว/s{memory}")
+
+    baseline = results["read_excel + iterrows"]
+    for name, (count, seconds) in results.items():
+        if name != "read_excel + iterrows":
+            print(f"{name}: เร็วกว่า read_excel {baseline[1] / seconds:.1f} เท่า")
+    if len({count for count, _ in results.values()}) != 1:
+        print("จำนวนแถวไม่ตรงกัน")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+ตรวจความถูกต้องและวัดเวลา kernel ใน indicators.py เทียบกับสูตรเดียวกันที่เขียนด้วย pandas
+
+ข้อมูลจำลองทั้งตลาด (default 50 หุ้น x 20 ปี) มีหุ้นที่เข้าตลาดทีหลัง (NaN ช่วงต้น) ปนอยู่
+ผลต้องต่างจาก pandas ไม่เกิน TOLERANCE ไม่งั้นจบด้วย exit code 1
+
+ตัวอย่าง:
+    python bench_indicators.py
+    python bench_indicators.py --symbols 400 --years 20 --repeat 5
+"""
+import sys
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+
+import indicators
+
+TOLERANCE = 1e-8
+
+
+def synth_market(symbols, years, seed=0):
+    rng = np.random.default_rng(seed)
+    rows = years * 252
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.015, (rows, symbols)), axis=0))
+    spread = np.abs(rng.normal(0, 0.01, (rows, symbols))) * close
+    high, low = close + spread, close - spread
+    # หุ้นบางตัวเข้าตลาดทีหลัง
+    listed = rng.integers(0, rows // 2, symbols)
+    listed[: symbols // 2] = 0
+    for j, first in enumerate(listed):
+        close[:first, j] = high[:first, j] = low[:first, j] = np.nan
+    return high, low, close
+
+
+def _wilder_pandas(df, n):
+    """Wilder แบบ pandas: ค่าเฉลี่ย n ค่าแรกเป็นจุดเริ่ม แล้ว ewm(alpha=1/n, adjust=False)"""
+    out = {}
+    for column in df:
+        s = df[column]
+        first = s.first_valid_index()
+        if first is None or first + n > len(s):
+            out[column] = s * np.nan
+            continue
+        seeded = s.copy()
+        seeded.iloc[: first + n] = np.nan
+        seeded.iloc[first + n - 1] = s.iloc[first: first + n].mean()
+        out[column] = seeded.ewm(alpha=1 / n, adjust=False).mean()
+    return pd.DataFrame(out)
+
+
+def pandas_reference(high, low, close):
+    c, h, l = pd.DataFrame(close), pd.DataFrame(high), pd.DataFrame(low)
+    delta = c.diff()
+    avg_gain = _wilder_pandas(delta.clip(lower=0), 14)
+    avg_loss = _wilder_pandas(-delta.clip(upper=0), 14)
+    rsi = 100 - 100 / (1 + avg_gain / avg_loss)
+    rsi = rsi.mask((avg_loss == 0) & avg_gain.notna(), 100.0)
+
+    prev_close = c.shift()
+    tr = pd.concat([h - l, (h - prev_close).abs(), (l - prev_close).abs()]).groupby(level=0).max()
+    macd = c.ewm(span=12, adjust=False).mean() - c.ewm(span=26, adjust=False).mean()
+    signal = macd.ewm(span=9, adjust=False).mean()
+    return {
+        "ema_12": c.ewm(span=12, adjust=False).mean(),
+        "ema_50": c.ewm(span=50, adjust=False).mean(),
+        "ema_200": c.ewm(span=200, adjust=False).mean(),
+        "rsi_14": rsi,
+        "atr_14": _wilder_pandas(tr, 14),
+        "macd": macd,
+        "macd_signal": signal,
+        "macd_hist": macd - signal,
+    }
+
+
+def kernel_set(high, low, close):
+    """ชุด indicator ~ 1 โหล ที่ใช้วัดเวลา"""
+    line, signal, hist = indicators.macd(close)
+    return {
+        "ema_12": indicators.ema(close, 12),
+        "ema_20": indicators.ema(close, 20),
+        "ema_50": indicators.ema(close, 50),
+        "ema_100": indicators.ema(close, 100),
+        "ema_200": indicators.ema(close, 200),
+        "rsi_7": indicators.rsi(close, 7),
+        "rsi_14": indicators.rsi(close, 14),
+        "rsi_21": indicators.rsi(close, 21),
+        "atr_14": indicators.atr(high, low, close, 14),
+        "macd": line,
+        "macd_signal": signal,
+        "macd_hist": hist,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ตรวจและวัดเวลา kernel indicator เทียบ pandas")
+    parser.add_argument("--symbols", type=int, default=50)
+    parser.add_argument("--years", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    high, low, close = synth_market(args.symbols, args.years)
+    print(f"ข้อมูล {args.symbols} หุ้น x {close.shape[0]} วัน (numba: {'ใช้' if indicators.USE_NUMBA else 'ไม่มี'})")
+
+    kernels = kernel_set(high, low, close)   # รอบแรกรวมเวลา compile ของ numba
+    started = time.perf_counter()
+    reference = pandas_reference(high, low, close)
+    pandas_seconds = time.perf_counter() - started
+
+    failed = False
+    for name, expected in reference.items():
+        expected = expected.to_numpy()
+        got = kernels[name]
+        same_nan = np.array_equal(np.isnan(expected), np.isnan(got))
+        diff = np.nanmax(np.abs(expected - got))
+        ok = same_nan and diff <= TOLERANCE * max(1.0, np.nanmax(np.abs(expected)))
+        failed |= not ok
+        print(f"  {name:<12} max diff {diff:.2e}  {'ok' if ok else 'ไม่ตรง'}{'' if same_nan else ' (ตำแหน่ง NaN ต่างกัน)'}")
+
+    timings = []
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        kernel_set(high, low, close)
+        timings.append(time.perf_counter() - started)
+    print(f"\nkernel {len(kernels)} indicator: {min(timings) * 1000:.0f} ms (ดีที่สุดจาก {args.repeat} รอบ)")
+    print(f"pandas {len(reference)} indicator: {pandas_seconds * 1000:.0f} ms")
+
+    started = time.perf_counter()
+    for j in range(close.shape[1]):
+        kernel_set(high[:, j], low[:, j], close[:, j])
+    print(f"kernel ทีละหุ้น (แบบ pipeline): {(time.perf_counter() - started) * 1000:.0f} ms")
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+วัดความเร็วให้คะแนน sentiment ของ news_sentiment.py (CPU เดียว ไม่ต่อเน็ต)
+
+สร้างข่าวจำลอง (หัวข้อ + สรุป ปนคำใน lexicon กับคำทั่วไป ไทย/อังกฤษ) ลง index ชั่วคราว แล้ววัด
+- score_batch: ให้คะแนนข้อความล้วน
+- score_pending รอบแรก: อ่าน index + hash + ให้คะแนน + เขียน cache ทีละ batch
+- score_pending รอบสอง: ข่าวชุดเดิม upsert ซ้ำจากอีกแหล่ง (ต้องมาจาก cache ทั้งหมด ไม่ให้คะแนนซ้ำ)
+
+ตัวอย่าง:
+    python bench_sentiment.py
+    python bench_sentiment.py --articles 50000
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+
+import news_index
+import news_sentiment
+
+FILLER = ["บริษัท", "ประกาศ", "หุ้น", "ตลาดหลักทรัพย์", "นักลงทุน", "ไตรมาส", "ล้านบาท", "ผู้บริหาร",
+          "the company", "announces", "shares", "quarter", "investors", "market"]
+
+
+def synth_articles(count, seed=0):
+    rng = random.Random(seed)
+    words = list(news_sentiment.LEXICON)
+    articles = []
+    for i in range(count):
+        title = " ".join(rng.choice(FILLER if rng.random() < 0.7 else words) for _ in range(8))
+        summary = " ".join(rng.choice(FILLER if rng.random() < 0.8 else words) for _ in range(40))
+        articles.append({"symbol": f"S{i % 50:02d}", "news_date": f"2025-{1 + i % 12:02d}-{1 + i % 28:02d}",
+                         "title": f"{title} {i}", "summary": summary, "source": "bench", "url": f"https://bench/{i}"})
+    return articles
+
+
+def main():
+    parser = argparse.ArgumentParser(description="วัดความเร็วให้คะแนน sentiment ข่าวแบบ offline")
+    parser.add_argument("--articles", type=int, default=10000)
+    args = parser.parse_args()
+
+    articles = synth_articles(args.articles)
+    texts = [f"{a['title']} {a['summary']}" for a in articles]
+    started = time.perf_counter()
+    news_sentiment.score_batch(texts)
+    seconds = time.perf_counter() - started
+    print(f"score_batch        {len(texts):>7} ข่าว  {seconds:6.2f} s  {len(texts) / seconds * 60:>10,.0f} ข่าว/นาที")
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "bench_news.db")
+        conn = news_sentiment.connect(path)
+        news_index.add_articles(conn, articles, "stock_news")
+        runs = [("score_pending", None)]
+        runs.append(("score_pending ซ้ำ", [dict(a, url=a["url"] + "?copy") for a in articles]))
+        for name, copies in runs:
+            if copies:
+                news_index.add_articles(conn, copies, "news_set")
+            started = time.perf_counter()
+            count, scored = news_sentiment.score_pending(conn)
+            seconds = time.perf_counter() - started
+            print(f"{name:<18} {count:>7} ข่าว  {seconds:6.2f} s  {count / seconds * 60:>10,.0f} ข่าว/นาที"
+                  f"  (ให้คะแนนจริง {scored})")
+        conn.close()
+
+    if scored:
+        print("ข่าวซ้ำถูกให้คะแนนซ้ำ (cache ไม่ทำงาน)")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
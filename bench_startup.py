@@ -0,0 +1,105 @@
+"""
+วัดเวลา cold start ของสคริปต์ entry point (import เปล่า ๆ และ --help) ใน process ใหม่ทุกครั้ง
+
+ตัวอย่าง:
+    python bench_startup.py
+    python bench_startup.py --repeat 10 --importtime   # แสดง module ที่ import ช้าที่สุดด้วย
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+import subprocess
+
+# สคริปต์ที่ถูกเรียกจาก cron / GitHub Actions
+ENTRY_POINTS = [
+    "teamg_data_pipeline",
+    "save_secure_to_supabase",
+    "save_stock_to_supabase",
+    "save_bec_to_supabase",
+    "save_SET50_to_supabase",
+    "update_set50_news_daily",
+    "save_1Y_to_supabase",
+    "multi_news_scraper",
+    "get_secure_factsheet",
+    "save_manage_supabase",
+    "save_news_set_to_supabase",
+    "import_data",
+    "EPS16YEAR12",
+]
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def _run(args):
+    # บังคับใช้ LocalClient กันพลาดไปเขียน Supabase จริง และตัดที่ 60 วินาทีกันสคริปต์ค้าง
+    env = dict(os.environ, TEAMG_STORAGE="memory")
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable] + args, cwd=HERE, capture_output=True, text=True, env=env, timeout=60)
+    return time.perf_counter() - started, result
+
+
+def measure(args, repeat):
+    """รัน repeat รอบ คืน (min, median) วินาที หรือ None ถ้ารันไม่ผ่าน"""
+    timings = []
+    for _ in range(repeat):
+        try:
+            seconds, result = _run(args)
+        except subprocess.TimeoutExpired:
+            return None, ["timeout"]
+        if result.returncode != 0:
+            return None, result.stderr.strip().splitlines()[-1:] or ["exit code %d" % result.returncode]
+        timings.append(seconds)
+    return (min(timings), statistics.median(timings)), None
+
+
+def slowest_imports(module, top=5):
+    """
+    อ่านผล python -X importtime แล้วคืน module ที่สคริปต์ import ตรง ๆ เรียงตามเวลารวม (cumulative)
+    importtime พิมพ์ module ลูกก่อนตัวแม่ และเยื้องเพิ่มทีละ 2 ช่องตามระดับ
+    """
+    _, result = _run(["-X", "importtime", "-c", f"import {module}"])
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        entries.append((depth, int(cumulative_us), name.strip()))
+
+    children = []
+    for i, (depth, _, name) in enumerate(entries):
+        if depth == 0 and name == module:
+            for child_depth, cumulative_us, child in reversed(entries[:i]):
+                if child_depth == 0:
+                    break
+                if child_depth == 1:
+                    children.append((cumulative_us, child))
+    return sorted(children, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="วัดเวลา cold start ของสคริปต์ entry point")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--importtime", action="store_true", help="แสดง package ที่ import ช้าที่สุดของแต่ละสคริปต์")
+    args = parser.parse_args()
+
+    baseline, _ = measure(["-c", "pass"], args.repeat)
+    print(f"python เปล่า: {baseline[0] * 1000:.0f} ms\n")
+    print(f"{'script':<28} {'import (min/med ms)':>22} {'--help (min/med ms)':>22}")
+
+    for module in ENTRY_POINTS:
+        cells = []
+        for cmd in (["-c", f"import {module}"], [f"{module}.py", "--help"]):
+            timing, error = measure(cmd, args.repeat)
+            cells.append(f"{timing[0] * 1000:>8.0f} / {timing[1] * 1000:<8.0f}" if timing else f"{'error':>22}")
+        print(f"{module:<28} {cells[0]:>22} {cells[1]:>22}")
+
+        if args.importtime:
+            for us, name in slowest_imports(module):
+                print(f"    {us / 1000:>8.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Benchmark ฝั่งเขียนข้อมูล: replay payload ของทุก writer ผ่าน storage backend แล้ววัด rows/s, จำนวน request และไบต์
+
+ใช้ payload ที่อัดไว้ด้วย TEAMG_RECORD_DIR (ไฟล์ <table>.jsonl) ถ้ามี
+ไม่มีก็สร้าง payload จำลองที่หน้าตาเหมือนของจริงของแต่ละสคริปต์
+
+ตัวอย่าง:
+    python bench_writers.py                                  # LocalClient ใน memory
+    python bench_writers.py --storage sqlite:///bench.db      # SQLite ไฟล์
+    python bench_writers.py --payloads recorded/ --repeat 3
+"""
+import os
+import json
+import time
+import random
+import argparse
+from datetime import date, timedelta
+
+from storage import get_client, payload_size
+
+# writer แต่ละตัว: table, วิธีเขียน, conflict key และขนาด batch ตามที่สคริปต์ใช้จริง
+WRITERS = [
+    {"name": "stock_prices", "table": "stock_prices", "op": "upsert",
+     "on_conflict": "symbol, date", "batch_size": 365, "source": "save_stock_to_supabase.py / save_bec / save_secure"},
+    {"name": "stock_news", "table": "stock_news", "op": "upsert",
+     "on_conflict": "symbol, news_date, title", "batch_size": 25, "source": "update_set50_news_daily.py / save_1Y"},
+    {"name": "stock_news (gapfocus)", "table": "stock_news", "op": "upsert",
+     "on_conflict": "url", "batch_size": 20, "source": "multi_news_scraper.py"},
+    {"name": "news_set", "table": "news_set", "op": "upsert",
+     "on_conflict": "url", "batch_size": 1, "source": "save_news_set_to_supabase.py"},
+    {"name": "stock_holders", "table": "stock_holders", "op": "insert",
+     "on_conflict": None, "batch_size": 100, "source": "import_data.py"},
+    {"name": "excel_stock_prices", "table": "excel_stock_prices", "op": "insert",
+     "on_conflict": None, "batch_size": 200, "source": "EPS16YEAR12.py"},
+    {"name": "companies", "table": "companies", "op": "upsert",
+     "on_conflict": "symbol", "batch_size": 1, "source": "get_secure_factsheet.py"},
+    {"name": "form_59_reports", "table": "form_59_reports", "op": "upsert",
+     "on_conflict": "company_name, executive_name, transaction_date, quantity, price", "batch_size": 50,
+     "source": "save_manage_supabase.py"},
+]
+
+SYMBOLS = ["AOT", "ADVANC", "BBL", "CPALL", "KBANK", "PTT", "SCB", "TEAMG", "SECURE", "JMT"]
+
+
+def _day(i):
+    return (date(2020, 1, 1) + timedelta(days=i)).isoformat()
+
+
+def synth_rows(writer, n, rng):
+    """สร้าง payload จำลองให้หน้าตาเหมือนแถวที่สคริปต์นั้นส่งจริง (key ไม่ซ้ำกัน)"""
+    name = writer["name"]
+    rows = []
+    for i in range(n):
+        symbol = SYMBOLS[i % len(SYMBOLS)]
+        if name == "stock_prices":
+            close = round(rng.uniform(1, 300), 2)
+            rows.append({"symbol": symbol, "date": _day(i // len(SYMBOLS)), "open": close, "high": close * 1.02,
+                         "low": close * 0.98, "close": close, "volume": rng.randint(1_000, 10_000_000)})
+        elif name == "stock_news":
+            rows.append({"symbol": symbol, "title": f"{symbol} ประกาศผลประกอบการไตรมาส {i}", "summary": "สรุปข่าว " * 20,
+                         "source": "Kaohoon", "url": f"https://www.kaohoon.com/news/{i}", "category": "หุ้น",
+                         "news_date": _day(i % 365)})
+        elif name == "stock_news (gapfocus)":
+            rows.append({"symbol": symbol, "title": f"{symbol} Opportunity Day ครั้งที่ {i}",
+                         "url": f"https://stock.gapfocus.com/news/{i}", "news_date": _day(i % 365),
+                         "summary": "รายละเอียด " * 10, "source": "Gapfocus"})
+        elif name == "news_set":
+            rows.append({"date_time": f"{_day(i % 365)} 17:30", "symbol": symbol,
+                         "title": f"แจ้งมติที่ประชุมคณะกรรมการบริษัท {i}", "url": f"https://www.set.or.th/news/{i}",
+                         "source": "SET", "scraped_at": "2026-01-01T00:00:00"})
+        elif name == "stock_holders":
+            rows.append({"symbol": symbol, "closing_date": "2026-01-01", "free_float_percent_header": 45.1,
+                         "price": 12.3, "pe_ratio": 15.2, "sector": "SERVICE", "shareholder_name": f"ผู้ถือหุ้น {i}",
+                         "share_count": rng.randint(1_000, 100_000_000), "share_percent": 1.23})
+        elif name == "excel_stock_prices":
+            close = round(rng.uniform(1, 30), 2)
+            rows.append({"stock_symbol": "TEAMG", "date": _day(i), "open_price": close, "high_price": close,
+                         "low_price": close, "close_price": close, "volume": rng.randint(0, 5_000_000), "eps": 0.448})
+        elif name == "companies":
+            rows.append({"symbol": f"{symbol}{i}", "name_th": "บริษัท ตัวอย่าง จำกัด (มหาชน)", "name_en": "Sample PCL",
+                         "sector": "TECH", "industry": "ICT", "market_cap": 1234.5, "website": "https://example.com"})
+        else:
+            rows.append({"company_name": f"บริษัท {symbol}", "executive_name": f"ผู้บริหาร {i}",
+                         "relationship": "ตนเอง", "security_type": "หุ้นสามัญ", "transaction_date": _day(i % 365),
+                         "quantity": float(rng.randint(100, 1_000_000)), "price": round(rng.uniform(1, 100), 2),
+                         "method": "ซื้อ", "remark_url": ""})
+    return rows
+
+
+def load_recorded(payload_dir, writer):
+    """อ่าน request ที่อัดไว้ของ writer นี้ (table + op + on_conflict ตรงกัน) เป็น list ของ batch"""
+    path = os.path.join(payload_dir, f"{writer['table']}.jsonl")
+    if not os.path.exists(path):
+        return None
+    batches = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            record = json.loads(line)
+            if record["op"] == writer["op"] and (record.get("on_conflict") or None) == writer["on_conflict"]:
+                rows = record["rows"]
+                batches.append([rows] if isinstance(rows, dict) else rows)
+    return batches or None
+
+
+def replay(client, writer, batches):
+    """ส่ง batch ตามลำดับแบบเดียวกับสคริปต์จริง คืน (requests, rows, bytes, seconds)"""
+    requests_sent = rows_sent = bytes_sent = 0
+    started = time.perf_counter()
+    for batch in batches:
+        query = client.table(writer["table"])
+        if writer["op"] == "insert":
+            query = query.insert(batch)
+        else:
+            query = query.upsert(batch, on_conflict=writer["on_conflict"])
+        query.execute()
+        requests_sent += 1
+        rows_sent += len(batch)
+        bytes_sent += payload_size(batch)
+    return requests_sent, rows_sent, bytes_sent, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark throughput ของ writer ทุกตัว")
+    parser.add_argument("--storage", default="memory", help="memory | sqlite:///path | supabase (ระวัง: เขียนจริง)")
+    parser.add_argument("--payloads", help="โฟลเดอร์ payload ที่อัดด้วย TEAMG_RECORD_DIR")
+    parser.add_argument("--rows", type=int, default=5000, help="จำนวนแถวจำลองต่อ writer (ถ้าไม่มี payload อัดไว้)")
+    parser.add_argument("--repeat", type=int, default=1, help="replay ซ้ำกี่รอบ (รอบถัดไปเป็น upsert ทับของเดิม)")
+    parser.add_argument("--only", nargs="*", help="เลือกเฉพาะ writer ตามชื่อ")
+    args = parser.parse_args()
+
+    client = get_client(args.storage)
+    rng = random.Random(42)
+
+    print(f"{'writer':<24} {'source':<8} {'rows':>8} {'requests':>9} {'KB':>10} {'sec':>8} {'rows/s':>10}")
+    for writer in WRITERS:
+        if args.only and writer["name"] not in args.only:
+            continue
+
+        batches = load_recorded(args.payloads, writer) if args.payloads else None
+        source = "recorded" if batches else "synth"
+        if not batches:
+            rows = synth_rows(writer, args.rows, rng)
+            size = writer["batch_size"]
+            batches = [rows[i:i + size] for i in range(0, len(rows), size)]
+
+        totals = [0, 0, 0, 0.0]
+        for _ in range(args.repeat):
+            for i, value in enumerate(replay(client, writer, batches)):
+                totals[i] += value
+        requests_sent, rows_sent, bytes_sent, seconds = totals
+        rate = rows_sent / seconds if seconds else float("inf")
+        print(f"{writer['name']:<24} {source:<8} {rows_sent:>8} {requests_sent:>9} "
+              f"{bytes_sent / 1024:>10.1f} {seconds:>8.3f} {rate:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
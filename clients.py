@@ -0,0 +1,51 @@
+"""
+client ที่ใช้ร่วมกันทุกสคริปต์ สร้างแบบ lazy (ตอนใช้ครั้งแรก) และสร้างครั้งเดียวต่อ process
+
+- supabase        : storage client (Supabase จริงหรือ LocalClient ตาม TEAMG_STORAGE)
+- get_session()   : requests.Session ที่ pool connection ไว้ (อยู่ใน http_client.py)
+- get_driver()    : Chrome (Selenium) สร้างเมื่อมีสคริปต์ต้องใช้จริงเท่านั้น
+
+library หนัก ๆ (requests, selenium, webdriver_manager, supabase) ถูก import ในฟังก์ชัน
+import สคริปต์หรือสั่ง --help จึงเร็วและไม่ต้องต่อ network
+"""
+import threading
+
+import http_client
+from http_client import get_session  # noqa: F401 (re-export ให้สคริปต์เดิม)
+from storage import LazyClient
+
+supabase = LazyClient()
+
+_lock = threading.Lock()
+_driver = None
+
+
+def get_driver(headless=False):
+    """Chrome driver ตัวเดียวของ process สร้างครั้งแรกที่เรียก (ChromeDriverManager().install() ก็เรียกตอนนั้น)"""
+    global _driver
+    if _driver is None:
+        with _lock:
+            if _driver is None:
+                from selenium import webdriver
+                from selenium.webdriver.chrome.service import Service
+                from selenium.webdriver.chrome.options import Options
+                from webdriver_manager.chrome import ChromeDriverManager
+
+                options = Options()
+                if headless:
+                    options.add_argument("--headless=new")
+                options.add_argument("--no-sandbox")
+                options.add_argument("--disable-dev-shm-usage")
+                options.add_argument("--disable-blink-features=AutomationControlled")
+                _driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
+    return _driver
+
+
+def close_all():
+    """ปิด driver / session ที่เปิดไว้ (เรียกตอนจบโปรแกรม)"""
+    global _driver
+    with _lock:
+        if _driver is not None:
+            _driver.quit()
+            _driver = None
+    http_client.close()
@@ -0,0 +1,121 @@
+"""
+กราฟราคาของ dashboard แบบไม่สร้างใหม่ทั้งรูปทุกครั้งที่ cache หมดอายุ
+
+- data_version()  : key ราคาถูกของชุดข้อมูล (จำนวนแถว + วันแรก/วันสุดท้าย + ราคาปิดล่าสุด)
+- PriceChart      : figure ของ 1 session ถ้า version เดิมคืน figure เดิมทันที
+                    ถ้ามีแค่แท่งใหม่ต่อท้าย (หรือแท่งล่าสุดเปลี่ยน) จะแก้เฉพาะปลาย trace แทนการสร้างใหม่
+- เส้น EMA ใช้ Scattergl (วาดด้วย WebGL) ไม่เพิ่มภาระ SVG ของกราฟแท่งเทียน
+
+ข้อจำกัด: การต่อท้ายช่วยแค่ฝั่ง Python (ไม่ต้องสร้าง figure ใหม่) st.plotly_chart ยัง serialize และส่ง
+figure ทั้งรูปไป browser ทุก rerun ขนาด payload จึงเท่าเดิม (ส่งเฉพาะ delta ต้องใช้ component ที่เรียก
+Plotly.extendTraces ฝั่ง browser ซึ่งยังไม่มี) ลด payload ได้จากการลดจำนวนแท่ง (ohlc_pyramid.py) เท่านั้น
+"""
+import plotly.graph_objects as go
+
+# คอลัมน์ overlay -> สีเส้น
+OVERLAYS = {
+    "ema_50": "#f5a623",
+    "ema_200": "#4a90e2",
+}
+
+LAYOUT = dict(height=600, template="plotly_dark", xaxis_rangeslider_visible=False)
+
+
+def data_version(df, date_column="date"):
+    """key ของข้อมูลชุดนี้ (ไม่ต้อง hash ทั้ง DataFrame)"""
+    if df.empty:
+        return (0,)
+    dates = df[date_column]
+    return len(df), str(dates.min()), str(dates.max()), float(df.loc[dates.idxmax(), "close"])
+
+
+def _candle_traces(bars, name):
+    traces = [go.Candlestick(x=bars.index, open=bars["open"], high=bars["high"],
+                             low=bars["low"], close=bars["close"], name=name)]
+    for column, color in OVERLAYS.items():
+        if column in bars.columns:
+            traces.append(go.Scattergl(x=bars.index, y=bars[column], mode="lines", name=column.upper(),
+                                       line=dict(color=color, width=1.5)))
+    return traces
+
+
+def _trace_columns(trace):
+    """ชื่อ field ของ trace ที่ต้องต่อท้ายพร้อม x และคอลัมน์ใน bars ที่ตรงกัน"""
+    if trace.type == "candlestick":
+        return {field: field for field in ("open", "high", "low", "close")}
+    return {"y": trace.name.lower()}
+
+
+class PriceChart:
+    """
+    figure แท่งเทียน + overlay ของ 1 session (เก็บใน st.session_state)
+    ประหยัดเวลาสร้าง figure เท่านั้น ไม่ลดข้อมูลที่ส่งไป browser (ดูข้อจำกัดด้านบน)
+    """
+
+    def __init__(self):
+        self.fig = None
+        self.key = None
+        self.version = None
+        self.rebuilds = 0
+        self.appends = 0
+
+    def render(self, bars, key, version, title, name="TEAMG"):
+        """
+        key: ค่าที่ถ้าเปลี่ยนต้องสร้างใหม่ (ช่วงเวลา, ระดับแท่ง) / version: data_version ของข้อมูล
+        """
+        if self.fig is not None and key == self.key:
+            if version == self.version:
+                return self.fig
+            if self._append(bars):
+                self.version = version
+                self.fig.update_layout(title=title)
+                self.appends += 1
+                return self.fig
+
+        self.fig = go.Figure(_candle_traces(bars, name))
+        self.fig.update_layout(title=title, **LAYOUT)
+        self.key, self.version = key, version
+        self.rebuilds += 1
+        return self.fig
+
+    def _append(self, bars):
+        """
+        แก้เฉพาะปลายกราฟ: ตัดแท่งหัวที่หลุดช่วง, ตัดแท่งสุดท้ายเดิม (อาจยังไม่ปิด) แล้วต่อแท่งใหม่
+        ถ้าแท่งกลาง ๆ ไม่ตรงกับของเดิม (ข้อมูลย้อนหลังถูกแก้) คืน False ให้สร้างใหม่
+        """
+        if bars.empty:
+            return False
+        old_x = list(self.fig.data[0].x)
+        if not old_x:
+            return False
+        first_new, last_old = bars.index[0], old_x[-1]
+
+        kept = [x for x in old_x[:-1] if x >= first_new]
+        head_drop = len(old_x) - 1 - len(kept)
+        if list(bars.index[:len(kept)]) != kept:
+            return False
+        tail = bars.iloc[len(kept):]
+        if tail.empty or tail.index[0] < last_old:
+            return False
+
+        if any(column not in bars.columns for trace in self.fig.data for column in _trace_columns(trace).values()):
+            return False
+
+        with self.fig.batch_update():
+            for trace in self.fig.data:
+                columns = _trace_columns(trace)
+                trace.x = tuple(old_x[head_drop:-1]) + tuple(tail.index)
+                for field, column in columns.items():
+                    values = list(getattr(trace, field))[head_drop:-1]
+                    setattr(trace, field, tuple(values) + tuple(tail[column]))
+        return True
+
+
+def line_figure(line, overlays, title, name="TEAMG"):
+    """กราฟเส้นราคาปิด (ลดจุดแล้ว) + overlay ทั้งหมดเป็น Scattergl"""
+    fig = go.Figure([go.Scattergl(x=line.index, y=line.values, mode="lines", name=name)])
+    for column, series in overlays.items():
+        fig.add_trace(go.Scattergl(x=series.index, y=series.values, mode="lines", name=column.upper(),
+                                   line=dict(color=OVERLAYS.get(column), width=1.5)))
+    fig.update_layout(title=title, **LAYOUT)
+    return fig
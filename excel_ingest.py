@@ -0,0 +1,218 @@
+"""
+นำเข้า workbook Excel ขนาดใหญ่แบบ stream: อ่านทีละแถว แปลงตาม config แล้วส่งเป็น batch ให้ storage.write_batches
+
+ไม่โหลดทั้ง sheet เข้า DataFrame (pd.read_excel) หน่วยความจำจึงคงที่ไม่ว่าไฟล์จะมีกี่ sheet/กี่ปี
+- มี python-calamine: อ่านด้วย calamine (Rust) เร็วกว่ามาก (ตั้ง TEAMG_EXCEL_ENGINE=openpyxl เพื่อปิด)
+- ไม่มี: openpyxl แบบ read_only (อ่านทีละแถวจาก XML โดยไม่สร้าง cell ทั้งไฟล์)
+
+sheet หนึ่งมีได้หลายตาราง (เช่น MyAllYear.xlsx มีตารางละปีต่อกันลงมา) แถวที่มีชื่อคอลัมน์ key
+(เช่น "SYMBOL") คือ header ของตารางถัดไป ช่อง header ที่เว้นว่างใช้ชื่อเดิมของคอลัมน์นั้น
+แถวที่ช่อง key ว่าง (บรรทัดสรุป/บรรทัดว่าง) ถูกข้าม
+
+แต่ละ source ใน SOURCES บอกไฟล์, sheet, table ปลายทาง และการ map คอลัมน์ -> (ชื่อ field, ตัวแปลงค่า)
+
+    python excel_ingest.py my_all_year
+    python excel_ingest.py my_all_year --file other.xlsx --dry-run
+
+holder_data.xlsx (ผู้ถือหุ้น + แถวเมตา) ใช้ iter_records ของไฟล์นี้ใน import_data.py
+
+ต้องสร้างตารางใน Supabase ก่อนใช้:
+    create table if not exists holder_portfolio (
+        portfolio text, symbol text, closing_date date, shareholder_name text,
+        share_count bigint, share_percent double precision, free_float_percent double precision,
+        price double precision, market_value double precision, dps double precision,
+        dividend_total double precision, pe_ratio double precision,
+        primary key (portfolio, symbol, closing_date, shareholder_name));
+"""
+import os
+import argparse
+from datetime import date, datetime
+from itertools import islice
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+try:
+    import python_calamine
+except ImportError:
+    python_calamine = None
+
+ENGINE = os.environ.get("TEAMG_EXCEL_ENGINE", "calamine" if python_calamine else "openpyxl")
+
+BATCH_SIZE = 500
+
+# รูปแบบวันที่ที่เป็นข้อความในไฟล์ (วันที่ที่เป็น date ของ Excel อยู่แล้วไม่ต้อง parse)
+DATE_FORMATS = ("%A, %B %d, %Y", "%Y/%m/%d", "%Y-%m-%d", "%d/%m/%Y")
+
+# ค่าที่หมายถึง "ไม่มีข้อมูล"
+BLANKS = {"", "-", "*", "#N/A"}
+
+
+def to_text(value):
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def to_float(value):
+    """ตัวเลขหรือข้อความตัวเลข ("1,234", "12.5%") -> float อ่านไม่ได้เป็น None"""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    value = to_text(value)
+    if value is None or value in BLANKS:
+        return None
+    try:
+        return float(value.replace(",", "").replace("%", ""))
+    except ValueError:
+        return None
+
+
+def to_int(value):
+    value = to_float(value)
+    return None if value is None else int(value)
+
+
+def to_date(value):
+    """date ของ Excel หรือข้อความวันที่ (มี "XD" นำหน้าได้) -> YYYY-MM-DD"""
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    value = to_text(value)
+    if value is None or value in BLANKS:
+        return None
+    value = value.split("XD")[-1].strip()
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).date().isoformat()
+        except ValueError:
+            pass
+    return None
+
+
+SOURCES = {
+    # พอร์ตของผู้ถือหุ้นใหญ่ 1 sheet ต่อ 1 ตระกูล ตารางละปีต่อกันใน sheet
+    "my_all_year": {
+        "file": "MyAllYear.xlsx",
+        "sheets": None,                 # None = ทุก sheet
+        "sheet_field": "portfolio",     # ชื่อ sheet ใส่ใน field นี้
+        "key": "SYMBOL",
+        "table": "holder_portfolio",
+        "on_conflict": "portfolio, symbol, closing_date, shareholder_name",
+        "columns": {
+            "SYMBOL": ("symbol", to_text),
+            "วันปิดสมุด": ("closing_date", to_date),
+            "ผู้ถือหุ้นรายใหญ่": ("shareholder_name", to_text),
+            "จำนวนหุ้น": ("share_count", to_int),
+            "%": ("share_percent", to_float),
+            "%Free": ("free_float_percent", to_float),
+            "ราคา": ("price", to_float),
+            "รวมมูลค่า": ("market_value", to_float),
+            "DPS": ("dps", to_float),
+            "รวมปันผล": ("dividend_total", to_float),
+            "P/E": ("pe_ratio", to_float),
+        },
+    },
+}
+
+
+def iter_sheet_rows(path, sheets=None, engine=None):
+    """
+    (ชื่อ sheet, tuple ของค่าในแถว) ทีละแถวตามลำดับในไฟล์ ช่องว่างเป็น None ทั้งสอง engine
+    sheets: list ชื่อ sheet ที่ต้องการ (None = ทุก sheet)
+    """
+    engine = engine or ENGINE
+    if engine == "calamine":
+        if python_calamine is None:
+            raise ValueError("ไม่ได้ติดตั้ง python-calamine (pip install python-calamine หรือใช้ engine openpyxl)")
+        workbook = python_calamine.CalamineWorkbook.from_path(path)
+        for name in workbook.sheet_names:
+            if sheets is None or name in sheets:
+                for row in workbook.get_sheet_by_name(name).iter_rows():
+                    yield name, tuple(None if value == "" else value for value in row)
+        return
+
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        for sheet in workbook.worksheets:
+            if sheets is None or sheet.title in sheets:
+                for row in sheet.iter_rows(values_only=True):
+                    yield sheet.title, row
+    finally:
+        workbook.close()
+
+
+def iter_records(path, key, sheets=None, engine=None):
+    """
+    (ชื่อ sheet, dict ชื่อคอลัมน์ -> ค่า) ของทุกแถวข้อมูล
+    แถวที่มี key เป็นค่าในช่องใดช่องหนึ่งคือ header ใหม่ (ชื่อที่เว้นว่างใช้ของ header ก่อนหน้า)
+    ชื่อคอลัมน์ซ้ำใช้คอลัมน์แรก (เหมือน pd.read_excel เดิม)
+    """
+    header, key_at, current_sheet = [], None, None
+    for sheet, row in iter_sheet_rows(path, sheets, engine):
+        if sheet != current_sheet:
+            header, key_at, current_sheet = [], None, sheet
+        labels = [to_text(value) for value in row]
+        if key in labels:
+            header = [label or (header[i] if i < len(header) else None) for i, label in enumerate(labels)]
+            key_at = labels.index(key)
+            continue
+        if key_at is None or key_at >= len(row) or to_text(row[key_at]) is None:
+            continue
+        record = {}
+        for label, value in zip(header, row):
+            if label and label not in record:
+                record[label] = value
+        yield sheet, record
+
+
+def iter_source(source, path=None, engine=None):
+    """แถวที่แปลงตาม SOURCES[source] แล้ว พร้อมส่งเข้า table"""
+    config = SOURCES[source]
+    columns = config["columns"]
+    for sheet, record in iter_records(path or config["file"], config["key"], config["sheets"], engine):
+        row = {field: convert(record.get(label)) for label, (field, convert) in columns.items()}
+        if config.get("sheet_field"):
+            row[config["sheet_field"]] = sheet
+        yield row
+
+
+def batched(rows, size=BATCH_SIZE):
+    rows = iter(rows)
+    while batch := list(islice(rows, size)):
+        yield batch
+
+
+def ingest(source, path=None, client=None, batch_size=BATCH_SIZE, engine=None, dry_run=False):
+    """stream ทั้งไฟล์เข้า table ของ source ทีละ batch (ถือไว้ในหน่วยความจำแค่ batch เดียว) คืนจำนวนแถว"""
+    from storage import write_batches
+
+    config = SOURCES[source]
+    if client is None and not dry_run:
+        from clients import supabase as client
+
+    total = 0
+    for batch in batched(iter_source(source, path, engine), batch_size):
+        if not dry_run:
+            write_batches(client, config["table"], batch, on_conflict=config.get("on_conflict"),
+                          batch_size=batch_size)
+        total += len(batch)
+    return total
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="นำเข้า workbook Excel แบบ stream ตาม SOURCES")
+    parser.add_argument("source", choices=sorted(SOURCES))
+    parser.add_argument("--file", help="แทนไฟล์ใน config")
+    parser.add_argument("--engine", choices=["calamine", "openpyxl"], default=ENGINE)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--dry-run", action="store_true", help="อ่านและแปลงอย่างเดียว ไม่เขียนลงตาราง")
+    args = parser.parse_args()
+
+    count = ingest(args.source, args.file, batch_size=args.batch_size, engine=args.engine, dry_run=args.dry_run)
+    table = SOURCES[args.source]["table"]
+    print(f"{'อ่าน' if args.dry_run else '✅ นำเข้า'} {count} แถว -> {table} (engine {args.engine})")
@@ -0,0 +1,153 @@
+"""
+factor ทางเทคนิคของ teamg_master_analysis คำนวณรอบเดียวต่อ series
+
+- ผลรวมสะสม (cumsum) ของ x และ x² ชุดเดียวให้ mean/std ได้ทุก window (RollingSums)
+  ราคาปิด: z_score + Bollinger width (20) / log return: ความผันผวน 20 และ 60 วัน / volume: volume_z (20)
+- indicator แบบ recursive (EMA, Wilder RSI, ATR, MACD) มาจาก indicators.py
+- สูง/ต่ำสุด 52 สัปดาห์ (252 วันทำการ) จาก sliding window ของ high/low
+
+changed_rows() คัดเฉพาะแถวที่ใหม่หรือค่าเปลี่ยนจากที่อยู่ใน DB เพื่อไม่ต้องเขียนทับทั้งประวัติทุกวัน
+
+คอลัมน์ใหม่ที่ต้องเพิ่มใน Supabase ก่อนใช้:
+    alter table teamg_master_analysis
+        add column if not exists atr_14 double precision,
+        add column if not exists bb_width double precision,
+        add column if not exists macd double precision,
+        add column if not exists macd_signal double precision,
+        add column if not exists macd_hist double precision,
+        add column if not exists obv double precision,
+        add column if not exists vol_20 double precision,
+        add column if not exists vol_60 double precision,
+        add column if not exists pct_from_high_52w double precision,
+        add column if not exists pct_from_low_52w double precision,
+        add column if not exists volume_z double precision;
+"""
+import math
+
+import numpy as np
+
+import indicators
+
+FACTOR_COLUMNS = [
+    "ema_50", "ema_200", "rsi", "z_score",
+    "atr_14", "bb_width", "macd", "macd_signal", "macd_hist", "obv",
+    "vol_20", "vol_60", "pct_from_high_52w", "pct_from_low_52w", "volume_z",
+]
+
+WEEKS_52 = 252
+BARS_PER_YEAR = 252
+
+# ทศนิยมที่ใช้เทียบว่าค่า "เปลี่ยน" (ต่างกันแค่เศษจากการปัดของ DB ไม่นับ)
+COMPARE_DIGITS = 6
+
+
+class RollingSums:
+    """
+    ผลรวมสะสมของ x และ x² ของ series เดียว ใช้ซ้ำได้ทุก window
+    ลบค่าเฉลี่ยทั้ง series ออกก่อนสะสม ลดการหักล้างของตัวเลขใหญ่ตอนคำนวณ variance
+    """
+
+    def __init__(self, x):
+        x = np.asarray(x, dtype=np.float64)
+        valid = ~np.isnan(x)
+        self.center = float(x[valid].mean()) if valid.any() else 0.0
+        d = np.where(valid, x - self.center, 0.0)
+        self.s1 = np.concatenate([[0.0], np.cumsum(d)])
+        self.s2 = np.concatenate([[0.0], np.cumsum(d * d)])
+        self.count = np.concatenate([[0], np.cumsum(valid)])
+        self.n = len(x)
+
+    def moments(self, window):
+        """(mean, std แบบ ddof=1) ของ window ย้อนหลัง แถวที่ window ยังไม่เต็มหรือมี NaN เป็น NaN"""
+        mean = np.full(self.n, np.nan)
+        std = np.full(self.n, np.nan)
+        if self.n < window:
+            return mean, std
+        s1 = self.s1[window:] - self.s1[:-window]
+        s2 = self.s2[window:] - self.s2[:-window]
+        full = (self.count[window:] - self.count[:-window]) == window
+        var = np.maximum((s2 - s1 * s1 / window) / (window - 1), 0.0)
+        mean[window - 1:] = np.where(full, s1 / window + self.center, np.nan)
+        std[window - 1:] = np.where(full, np.sqrt(var), np.nan)
+        return mean, std
+
+
+def _rolling_extreme(x, window, reducer):
+    """สูง/ต่ำสุดย้อนหลัง window แถว (ช่วงต้นที่ยังไม่ครบใช้เท่าที่มี) ข้าม NaN"""
+    out = reducer.accumulate(x)
+    if len(x) >= window:
+        out[window - 1:] = reducer.reduce(np.lib.stride_tricks.sliding_window_view(x, window), axis=1)
+    return out
+
+
+def compute_factors(high, low, close, volume):
+    """คืน dict ชื่อคอลัมน์ -> array (ยาวเท่าข้อมูล) ของทุก factor ใน FACTOR_COLUMNS"""
+    high, low, close, volume = (np.asarray(a, dtype=np.float64) for a in (high, low, close, volume))
+    out = {}
+
+    out["ema_50"] = indicators.ema(close, 50)
+    out["ema_200"] = indicators.ema(close, 200)
+    out["rsi"] = indicators.rsi(close, 14)
+    out["atr_14"] = indicators.atr(high, low, close, 14)
+    out["macd"], out["macd_signal"], out["macd_hist"] = indicators.macd(close)
+
+    # ราคาปิด 20 วัน: ผลรวมชุดเดียวใช้ทั้ง Z-score และ Bollinger (กว้าง 2 SD ต่อข้าง)
+    mean20, std20 = RollingSums(close).moments(20)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out["z_score"] = (close - mean20) / std20
+        out["bb_width"] = 4 * std20 / mean20
+
+    # ความผันผวนจริง (annualized) จาก log return
+    with np.errstate(divide="ignore", invalid="ignore"):
+        log_return = np.concatenate([[np.nan], np.diff(np.log(close))])
+    returns = RollingSums(log_return)
+    out["vol_20"] = returns.moments(20)[1] * math.sqrt(BARS_PER_YEAR)
+    out["vol_60"] = returns.moments(60)[1] * math.sqrt(BARS_PER_YEAR)
+
+    volume_mean, volume_std = RollingSums(volume).moments(20)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out["volume_z"] = (volume - volume_mean) / volume_std
+
+    # OBV: บวก volume วันที่ปิดขึ้น ลบวันที่ปิดลง
+    direction = np.sign(np.nan_to_num(np.diff(close, prepend=close[:1])))
+    out["obv"] = np.cumsum(direction * np.nan_to_num(volume))
+
+    high_52w = _rolling_extreme(high, WEEKS_52, np.fmax)
+    low_52w = _rolling_extreme(low, WEEKS_52, np.fmin)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out["pct_from_high_52w"] = (close / high_52w - 1) * 100
+        out["pct_from_low_52w"] = (close / low_52w - 1) * 100
+
+    for name, values in out.items():
+        out[name] = np.where(np.isfinite(values), values, np.nan)
+    return out
+
+
+def add_factors(df):
+    """เพิ่มคอลัมน์ factor ให้ DataFrame ที่มี high, low, close, volume (เรียงตามวันที่)"""
+    values = compute_factors(df["high"], df["low"], df["close"], df["volume"])
+    return df.assign(**values)
+
+
+def _normalize(value):
+    if value is None:
+        return None
+    if isinstance(value, (int, float, np.number)):
+        value = float(value)
+        return None if math.isnan(value) else round(value, COMPARE_DIGITS)
+    return str(value)
+
+
+def changed_rows(records, existing, keys=("symbol", "date")):
+    """
+    records: แถวที่คำนวณรอบนี้ / existing: แถวเดิมใน DB (มีคอลัมน์ keys + คอลัมน์ที่เทียบ)
+    คืนเฉพาะแถวที่ยังไม่มีใน DB หรือมีคอลัมน์ใดค่าไม่ตรงกับของเดิม
+    """
+    current = {tuple(str(row[k]) for k in keys): row for row in existing}
+    changed = []
+    for record in records:
+        old = current.get(tuple(str(record[k]) for k in keys))
+        if old is None or any(_normalize(value) != _normalize(old.get(column))
+                              for column, value in record.items() if column not in keys):
+            changed.append(record)
+    return changed
@@ -0,0 +1,209 @@
+"""
+ค่า valuation รายวัน (P/E, P/BV, อัตราปันผล) จากงบใน EPS16YEAR12.csv เทียบกับราคาใน stock_prices
+
+EPS16YEAR12.csv ไม่มี header แถวเดียว: ตารางรายหุ้นอยู่ใต้แถวที่มี "SYMBOL" และคอลัมน์ย้ายได้เมื่อไฟล์ถูกแก้
+จึงหาคอลัมน์จากชื่อ (SNAPSHOT_FIELDS / YEARLY_FIELDS) ไม่ใช้เลข index ตายตัว
+
+งบที่ใช้ต่อหุ้น:
+- รายปี: EPS<ปี>, ROE<ปี>, D/P%<ปี> ของปีบัญชีที่ปิดก่อนงวดล่าสุด ใช้ได้ตั้งแต่ 1 มี.ค. ปีถัดไป
+  มูลค่าทางบัญชีต่อหุ้นของปีนั้น = EPS / ROE และเงินปันผลต่อหุ้น = D/P% x ราคาปิดสิ้นปี
+- งวดล่าสุด (งวดบัญชี): EPSn (4 ไตรมาสล่าสุด), BV, DPSn, %ROE ใช้ได้หลังปิดงวด QUARTER_LAG_DAYS วัน
+ทุกวันซื้อขายจับคู่กับงบล่าสุดที่ประกาศแล้ว ณ วันนั้นด้วย merge_asof ทีเดียวทั้งตาราง (ไม่วนทีละแถว)
+
+ต้องสร้างตารางใน Supabase ก่อนใช้:
+    create table if not exists fundamentals (
+        symbol text, date date,
+        close double precision, eps double precision, bvps double precision, dps double precision,
+        roe double precision, pe double precision, pbv double precision, dividend_yield double precision,
+        primary key (symbol, date));
+
+    python fundamentals.py --since 2020-01-01
+    python fundamentals.py --symbols TEAMG,PTT --source cache --dry-run
+"""
+import re
+import argparse
+
+import numpy as np
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+SOURCE_FILE = "EPS16YEAR12.csv"
+TABLE = "fundamentals"
+
+# ชื่อคอลัมน์ในไฟล์ -> ชื่อใน DataFrame (งวดล่าสุดของแต่ละหุ้น)
+SNAPSHOT_FIELDS = {
+    "SYMBOL": "symbol",
+    "LAST": "last",
+    "EPSn": "eps",
+    "BV": "bvps",
+    "DPSn": "dps",
+    "%ROE": "roe",
+    "งวดบัญชี": "period",
+}
+
+# คอลัมน์รายปี ชื่อ + ปี ค.ศ.
+YEARLY_FIELDS = {
+    "eps": re.compile(r"^EPS(\d{4})$"),
+    "roe": re.compile(r"^ROE(\d{4})$"),
+    "dp_pct": re.compile(r"^D/P%(\d{4})$"),
+}
+
+# จำนวนแถวบนสุดที่ใช้หา header
+HEADER_SCAN_ROWS = 10
+
+# งบปีประกาศภายในสิ้น ก.พ. / งบไตรมาสภายใน 45 วันหลังปิดงวด
+ANNUAL_AVAILABLE = "03-01"
+QUARTER_LAG_DAYS = 45
+
+OUTPUT_COLUMNS = ["symbol", "date", "close", "eps", "bvps", "dps", "roe", "pe", "pbv", "dividend_yield"]
+
+
+def read_sheet(path=SOURCE_FILE):
+    """อ่านทั้งไฟล์เป็นข้อความ (ไม่มี header) ให้ locate_columns หา field เอง"""
+    import pandas as pd
+
+    return pd.read_csv(path, header=None, dtype=str, encoding="utf-8-sig", keep_default_na=False)
+
+
+def locate_columns(raw, labels, scan_rows=HEADER_SCAN_ROWS):
+    """
+    หาแถว header ที่มีทุกชื่อใน labels (ภายใน scan_rows แถวแรก)
+    คืน (เลขแถว header, {ชื่อ: เลขคอลัมน์}) ชื่อซ้ำในแถวเดียวกันใช้คอลัมน์แรก
+    """
+    top = raw.iloc[:scan_rows].apply(lambda column: column.str.strip())
+    for row in range(len(top)):
+        cells = top.iloc[row].tolist()
+        if all(label in cells for label in labels):
+            return row, {label: cells.index(label) for label in labels}
+    raise ValueError(f"ไม่พบแถว header ที่มี {', '.join(labels)} ใน {scan_rows} แถวแรก")
+
+
+def to_number(values):
+    """ข้อความตัวเลขแบบในไฟล์ ("2,535.50", "#N/A", "#DIV/0!", "-") -> float (อ่านไม่ได้เป็น NaN)"""
+    import pandas as pd
+
+    return pd.to_numeric(values.str.replace(",", "", regex=False).str.strip(), errors="coerce")
+
+
+def extract_statements(raw):
+    """
+    งบต่อหุ้นแบบยาว: symbol, fiscal_year (None = งวดล่าสุด), available (วันที่ประกาศแล้ว),
+    eps, bvps, roe, dps หรือ dp_pct (ปันผลรายปีเป็น % ต้องคูณราคาปิดสิ้นปีใน valuation())
+    """
+    import pandas as pd
+
+    header_row, columns = locate_columns(raw, list(SNAPSHOT_FIELDS))
+    header = raw.iloc[header_row].str.strip()
+    body = raw.iloc[header_row + 1:]
+    body = body[body[columns["SYMBOL"]].str.strip() != ""]
+    symbols = body[columns["SYMBOL"]].str.strip().to_numpy()
+
+    snapshot = pd.DataFrame({name: body[columns[label]] for label, name in SNAPSHOT_FIELDS.items()})
+    snapshot["symbol"] = symbols
+    for name in ("last", "eps", "bvps", "dps", "roe"):
+        snapshot[name] = to_number(snapshot[name])
+    period = pd.to_datetime(snapshot["period"].str.strip(), format="%d-%m-%y", errors="coerce")
+    snapshot["available"] = period + pd.Timedelta(days=QUARTER_LAG_DAYS)
+    snapshot["fiscal_year"] = np.nan
+
+    # รายปี: ตาราง (หุ้น x ปี) ต่อ field -> แถวยาว (หุ้น, ปี)
+    yearly = {}
+    for name, pattern in YEARLY_FIELDS.items():
+        matched = {int(m.group(1)): col for col, label in header.items() if (m := pattern.match(label))}
+        wide = pd.DataFrame({year: to_number(body[col]) for year, col in matched.items()})
+        wide.index = symbols
+        yearly[name] = wide.stack()
+    annual = pd.DataFrame(yearly).rename_axis(["symbol", "fiscal_year"]).reset_index()
+
+    # เอาเฉพาะปีที่ปิดบัญชีแล้วก่อนงวดล่าสุด (ปีปัจจุบันในไฟล์คือค่าประมาณ/ซ้ำกับงวดล่าสุด) และปีที่เข้าตลาดแล้ว
+    closed_before = annual["symbol"].map(dict(zip(snapshot["symbol"], period.dt.year)))
+    annual = annual[(annual["fiscal_year"] < closed_before) & annual["eps"].notna() & (annual["eps"] != 0)].copy()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        annual["bvps"] = np.where(annual["roe"] > 0, annual["eps"] / (annual["roe"] / 100), np.nan)
+    annual["available"] = pd.to_datetime((annual["fiscal_year"] + 1).astype(int).astype(str) + "-" + ANNUAL_AVAILABLE)
+
+    columns = ["symbol", "fiscal_year", "available", "eps", "bvps", "roe"]
+    return pd.concat([annual[columns + ["dp_pct"]], snapshot.dropna(subset=["available"])[columns + ["dps"]]],
+                     ignore_index=True)
+
+
+def price_frame(symbols=None, since=None, source="storage"):
+    """ราคาปิดแบบยาว (symbol, date, close) จาก stock_prices หรือ price cache"""
+    import pandas as pd
+    from backtest import load_panel
+
+    panel = load_panel(symbols, since, source=source)
+    close = pd.DataFrame(panel.fields["close"], index=pd.to_datetime(panel.dates), columns=panel.symbols)
+    prices = close.rename_axis(index="date", columns="symbol").stack().rename("close").reset_index()
+    return prices[prices["close"] > 0]
+
+
+def valuation(prices, statements):
+    """
+    จับคู่ทุกแถวราคากับงบล่าสุดที่ประกาศแล้วของหุ้นเดียวกัน แล้วคำนวณ P/E, P/BV, อัตราปันผล (%)
+    P/E และ P/BV เป็น NaN เมื่อกำไร/มูลค่าทางบัญชีไม่เป็นบวก
+    """
+    import pandas as pd
+
+    prices = prices.assign(date=pd.to_datetime(prices["date"]))
+    statements = statements[statements["symbol"].isin(prices["symbol"].unique())].copy()
+
+    # ปันผลต่อหุ้นรายปี = D/P% x ราคาปิดวันสุดท้ายของปีนั้น
+    year_end = (prices.assign(fiscal_year=prices["date"].dt.year)
+                .sort_values("date").groupby(["symbol", "fiscal_year"])["close"].last()
+                .rename("year_close").reset_index())
+    statements = statements.merge(year_end, on=["symbol", "fiscal_year"], how="left")
+    statements["dps"] = statements["dps"].fillna(statements["dp_pct"] / 100 * statements["year_close"])
+
+    merged = pd.merge_asof(
+        prices.sort_values("date"),
+        statements.sort_values("available")[["symbol", "available", "eps", "bvps", "dps", "roe"]],
+        left_on="date", right_on="available", by="symbol", direction="backward")
+
+    close = merged["close"]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        merged["pe"] = (close / merged["eps"]).where(merged["eps"] > 0)
+        merged["pbv"] = (close / merged["bvps"]).where(merged["bvps"] > 0)
+        merged["dividend_yield"] = merged["dps"] / close * 100
+    merged["date"] = merged["date"].dt.strftime("%Y-%m-%d")
+    return merged[OUTPUT_COLUMNS].sort_values(["symbol", "date"]).reset_index(drop=True)
+
+
+def load(rows):
+    """bulk upsert ลงตาราง fundamentals คืนจำนวนแถวที่เขียน"""
+    from clients import supabase
+    from storage import write_batches
+
+    return write_batches(supabase, TABLE, rows, on_conflict="symbol, date")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="คำนวณ P/E, P/BV, อัตราปันผลรายวันจาก EPS16YEAR12.csv")
+    parser.add_argument("--file", default=SOURCE_FILE)
+    parser.add_argument("--symbols", help="คั่นด้วย , (default ทุกหุ้นที่มีทั้งงบและราคา)")
+    parser.add_argument("--since", help="วันเริ่ม YYYY-MM-DD")
+    parser.add_argument("--source", choices=["storage", "cache"], default="storage",
+                        help="cache = อ่านราคาจาก price_cache.py (memmap) แทน query")
+    parser.add_argument("--dry-run", action="store_true", help="คำนวณและแสดงตัวอย่าง ไม่เขียนลงตาราง")
+    args = parser.parse_args()
+
+    statements = extract_statements(read_sheet(args.file))
+    print(f"งบจาก {args.file}: {statements['symbol'].nunique()} หุ้น {len(statements)} งวด")
+
+    symbols = args.symbols.split(",") if args.symbols else None
+    prices = price_frame(symbols, args.since, args.source)
+    result = valuation(prices, statements)
+    records = result.replace({np.nan: None}).to_dict(orient="records")
+    print(f"ค่า valuation {len(records)} แถว ({result['symbol'].nunique()} หุ้น)")
+
+    if args.dry_run:
+        print(result.groupby("symbol").tail(1).to_string(index=False))
+        return
+    written = load(records)
+    print(f"✅ เขียนตาราง {TABLE} {written} แถว")
+
+
+if __name__ == "__main__":
+    main()
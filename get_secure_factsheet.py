@@ -1,22 +1,12 @@
-import os
+import argparse
 import requests
 from bs4 import BeautifulSoup
-import pandas as pd
 from datetime import datetime
-from supabase import create_client, Client
+from clients import supabase, get_session
 from dotenv import load_dotenv
 
 load_dotenv()
 
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-
-if not SUPABASE_URL or not SUPABASE_KEY:
-    print("Error: ไม่พบ SUPABASE_URL หรือ SUPABASE_KEY ใน .env")
-    exit(1)
-
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-
 def scrape_secure_factsheet():
     url = "https://www.set.or.th/th/market/product/stock/quote/secure/factsheet"
     headers = {
@@ -24,7 +14,7 @@ def scrape_secure_factsheet():
     }
 
     try:
-        response = requests.get(url, headers=headers, timeout=15)
+        response = get_session().get(url, headers=headers, timeout=15)
         response.raise_for_status()
     except requests.exceptions.RequestException as e:
         print(f"Error ดึงหน้าเว็บ: {e}")
@@ -101,11 +91,20 @@ def upsert_to_supabase(facts):
     except Exception as e:
         print(f"Error upsert ไป Supabase: {e}")
 
+def update_factsheet():
+    """scrape แล้ว upsert ในขั้นเดียว (ใช้จาก orchestrator.py)"""
+    facts = scrape_secure_factsheet()
+    upsert_to_supabase(facts)
+    return facts
+
 if __name__ == "__main__":
+    argparse.ArgumentParser(description="Scrape factsheet ของ SECURE จาก set.or.th แล้ว upsert ลง companies").parse_args()
+
     facts = scrape_secure_factsheet()
     if facts:
         upsert_to_supabase(facts)
 
+        import pandas as pd
         df = pd.DataFrame(list(facts.items()), columns=['รายการ', 'ข้อมูล'])
         df.to_csv('secure_factsheet.csv', index=False, encoding='utf-8-sig')
         print("บันทึกไฟล์ secure_factsheet.csv สำเร็จ!")
\ No newline at end of file
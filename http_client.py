@@ -0,0 +1,188 @@
+"""
+HTTP client กลางของทุก scraper และทุก feed
+
+- get_session()  : requests.Session ตัวเดียวของ process, pool connection แยกต่อ host (keep-alive),
+                   ขอ gzip/deflate (+ br ถ้ามี brotli) และใส่ timeout ให้ทุก request ที่ไม่ได้ระบุ
+- fetch_feed()   : ดึง RSS ผ่าน connection pool แล้วส่ง bytes ให้ feedparser (แทน feedparser.parse(url)
+                   ที่เปิด urllib connection ใหม่ทุกครั้ง) feed เดียวกันใน FEED_TTL วินาทีใช้ของเดิม
+                   และรอบถัดไปส่ง ETag / Last-Modified ไปถามก่อน (304 = ไม่ต้องโหลดใหม่)
+- parse_feed() / get_json() : fetch_feed / GET JSON ภายใต้ retry + circuit breaker ของ host (resilience.call)
+- HTTP/2         : ตั้ง TEAMG_HTTP2=1 แล้ว fetch_feed จะใช้ httpx (ต้องมี h2) ถ้าไม่มีก็ใช้ requests ตามปกติ
+
+library (requests, httpx, feedparser) ถูก import ตอนใช้ครั้งแรก
+"""
+import os
+import time
+import threading
+from urllib.parse import urlsplit
+
+from run_metrics import metrics
+from resilience import call
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+}
+
+# จำนวน host ที่เก็บ pool ไว้ และจำนวน connection ต่อ host
+POOL_CONNECTIONS = 20
+POOL_MAXSIZE = 10
+
+# (connect, read) วินาที ใช้เมื่อผู้เรียกไม่ได้ส่ง timeout มาเอง
+DEFAULT_TIMEOUT = (5, 20)
+
+# feed เดียวกันภายในช่วงนี้ใช้ผลเดิม (เช่น SET/Investing/Manager ที่ทุกหุ้นอ่าน feed เดียวกัน)
+FEED_TTL = 600
+
+USE_HTTP2 = os.environ.get("TEAMG_HTTP2") == "1"
+
+_lock = threading.Lock()
+_session = None
+_http2_client = None
+_feed_cache = {}
+
+
+def _accept_encoding():
+    """ขอ br เฉพาะเมื่อมี brotli ให้ urllib3 ถอดได้ ไม่งั้นได้ bytes ที่อ่านไม่ออก"""
+    for module in ("brotli", "brotlicffi"):
+        try:
+            __import__(module)
+            return "gzip, deflate, br"
+        except ImportError:
+            continue
+    return "gzip, deflate"
+
+
+def _record_response(response, *args, **kwargs):
+    """hook ของ session: เวลาและไบต์ต่อ host ลง run_metrics"""
+    host = urlsplit(response.url).hostname or "-"
+    metrics.observe("fetch_seconds", response.elapsed.total_seconds(), host=host)
+    metrics.inc("fetch_requests", host=host, status=response.status_code)
+    metrics.inc("bytes_received", len(response.content), host=host)
+
+
+def get_session():
+    """requests.Session ตัวเดียวของ process (keep-alive + connection pool ต่อ host + timeout ค่าเริ่มต้น)"""
+    global _session
+    if _session is None:
+        with _lock:
+            if _session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+
+                class _Session(requests.Session):
+                    def request(self, method, url, **kwargs):
+                        kwargs.setdefault("timeout", DEFAULT_TIMEOUT)
+                        return super().request(method, url, **kwargs)
+
+                session = _Session()
+                adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                session.headers.update(DEFAULT_HEADERS)
+                session.headers["Accept-Encoding"] = _accept_encoding()
+                session.hooks["response"].append(_record_response)
+                _session = session
+    return _session
+
+
+def _get_http2_client():
+    """httpx.Client แบบ HTTP/2 หรือ None ถ้าไม่ได้เปิดหรือไม่มี httpx/h2"""
+    global _http2_client
+    if not USE_HTTP2:
+        return None
+    if _http2_client is None:
+        with _lock:
+            if _http2_client is None:
+                try:
+                    import h2  # noqa: F401
+                    import httpx
+                except ImportError:
+                    return None
+                headers = dict(DEFAULT_HEADERS, **{"Accept-Encoding": _accept_encoding()})
+                timeout = httpx.Timeout(DEFAULT_TIMEOUT[1], connect=DEFAULT_TIMEOUT[0])
+                _http2_client = httpx.Client(http2=True, headers=headers, timeout=timeout, follow_redirects=True)
+    return _http2_client
+
+
+def _get(url, headers):
+    client = _get_http2_client()
+    if client is None:
+        return get_session().get(url, headers=headers)
+
+    host = urlsplit(url).hostname or "-"
+    started = time.perf_counter()
+    response = client.get(url, headers=headers)
+    metrics.observe("fetch_seconds", time.perf_counter() - started, host=host)
+    metrics.inc("fetch_requests", host=host, status=response.status_code)
+    metrics.inc("bytes_received", len(response.content), host=host)
+    return response
+
+
+def fetch_feed(url, ttl=FEED_TTL):
+    """
+    คืนผล feedparser ของ url ผ่าน connection pool
+    HTTP 429 / 5xx / ต่อไม่ได้ จะ raise ออกไป (ให้ resilience.call ตัดสินใจ retry)
+    """
+    import feedparser
+
+    with _lock:
+        cached = _feed_cache.get(url)
+    if cached and time.monotonic() - cached["fetched"] < ttl:
+        metrics.inc("feed_cache_hits", host=urlsplit(url).hostname)
+        return cached["feed"]
+
+    headers = {}
+    if cached:
+        if cached["etag"]:
+            headers["If-None-Match"] = cached["etag"]
+        if cached["modified"]:
+            headers["If-Modified-Since"] = cached["modified"]
+
+    response = _get(url, headers)
+    if response.status_code == 304 and cached:
+        cached["fetched"] = time.monotonic()
+        metrics.inc("feed_not_modified", host=urlsplit(url).hostname)
+        return cached["feed"]
+    response.raise_for_status()
+
+    response_headers = {k.lower(): v for k, v in response.headers.items()}
+    response_headers.setdefault("content-location", url)
+    feed = feedparser.parse(response.content, response_headers=response_headers)
+
+    with _lock:
+        _feed_cache[url] = {
+            "feed": feed,
+            "fetched": time.monotonic(),
+            "etag": response.headers.get("ETag"),
+            "modified": response.headers.get("Last-Modified"),
+        }
+    return feed
+
+
+def parse_feed(url):
+    """fetch_feed ภายใต้ retry + circuit breaker ของ host"""
+    return call(urlsplit(url).hostname, fetch_feed, url)
+
+
+def _get_json(url, timeout):
+    response = get_session().get(url, timeout=timeout)
+    response.raise_for_status()
+    return response.json()
+
+
+def get_json(url, timeout=20):
+    """GET แล้วคืน JSON ภายใต้ retry + circuit breaker ของ host (429 / 5xx ถูก retry)"""
+    return call(urlsplit(url).hostname, _get_json, url, timeout)
+
+
+def close():
+    """ปิด session / HTTP/2 client และล้าง cache feed"""
+    global _session, _http2_client
+    with _lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+        if _http2_client is not None:
+            _http2_client.close()
+            _http2_client = None
+        _feed_cache.clear()
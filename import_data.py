@@ -1,19 +1,22 @@
-import pandas as pd
 import os
+import argparse
+import pandas as pd
 import re
 import numpy as np
-from supabase import create_client, Client
+from itertools import groupby
+from clients import supabase
+from storage import write_batches
+from excel_ingest import iter_records, batched
 from dotenv import load_dotenv
-from datetime import datetime
+from datetime import date, datetime
 
 # โหลดค่า Config จากไฟล์ .env
 load_dotenv()
 
 # --- การตั้งค่า ---
-SUPABASE_URL: str = os.getenv("SUPABASE_URL")
-SUPABASE_KEY: str = os.getenv("SUPABASE_KEY")
 EXCEL_FILE_PATH: str = "holder_data.xlsx"
 TABLE_NAME: str = "stock_holders"
+SHEET_NAME: str = "holder"
 
 # คำที่ใช้ตรวจสอบว่าเป็นแถวข้อมูลเมตาหรือไม่
 METADATA_KEYWORDS = [
@@ -64,6 +67,9 @@ def parse_date(date_input):
 
     if isinstance(date_input, (datetime, pd.Timestamp)):
         return date_input.date().isoformat()
+    if isinstance(date_input, date):
+        # calamine คืนวันที่ของ Excel เป็น date
+        return date_input.isoformat()
 
     date_str = str(date_input)
     
@@ -82,84 +88,136 @@ def parse_date(date_input):
     
     return None
 
-def main():
-    """ฟังก์ชันหลัก (Final Correct Version)"""
-    if not SUPABASE_URL or not SUPABASE_KEY:
-        print("Error: กรุณาตั้งค่า SUPABASE_URL และ SUPABASE_KEY ในไฟล์ .env")
-        return
-
-    supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-    print("เชื่อมต่อ Supabase สำเร็จ")
-
-    try:
-        df = pd.read_excel(EXCEL_FILE_PATH, sheet_name="holder")
-        print(f"อ่านไฟล์ Excel สำเร็จ: {EXCEL_FILE_PATH}")
-    except FileNotFoundError:
-        print(f"Error: ไม่พบไฟล์ {EXCEL_FILE_PATH}")
-        return
-
-    final_records = []
-    df = df.dropna(subset=['SYMBOL'])
-
-    for symbol, group in df.groupby('SYMBOL'):
+def split_symbols(symbols):
+    """หุ้นที่แถวไม่อยู่ติดกัน (โผล่มากกว่า 1 ช่วง) ใน sequence ของ SYMBOL ตามลำดับในไฟล์"""
+    seen, split = set(), []
+    for symbol, _ in groupby(symbols):
+        if symbol is None:
+            continue
+        if symbol in seen and symbol not in split:
+            split.append(symbol)
+        seen.add(symbol)
+    return split
+
+def is_metadata_row(row):
+    return any(keyword in str(row.get('ผู้ถือหุ้นรายใหญ่')) for keyword in METADATA_KEYWORDS)
+
+def read_metadata(metadata, row):
+    """เก็บค่าจากแถวเมตา (Free float, วันที่ขึ้น XD ฯลฯ) ลง dict metadata ของหุ้นนั้น"""
+    key = str(row.get('ผู้ถือหุ้นรายใหญ่'))
+    if 'จำนวนผู้ถือหุ้นรายย่อย' in key:
+        metadata['free_float_count'] = clean_integer_value(row.get('จำนวนหุ้น'))
+    elif '%การถือหุ้นของผู้ถือหุ้นรายย่อย' in key:
+        metadata['free_float_percentage'] = clean_numeric_value(row.get('%'))
+    elif 'วันที่ขึ้น:' in key:
+        metadata['xd_date'] = parse_date(row.get('%Free'))
+    elif '%การถือหุ้นแบบไร้ใบหุ้น:' in key:
+        metadata['non_cert_share_percent'] = clean_numeric_value(row.get('%'))
+    elif 'ผู้ถือหุ้นรายย่อย ณ วันที่:' in key:
+        metadata['minor_shareholder_date'] = parse_date(row.get('จำนวนหุ้น'))
+    elif 'จำนวนผู้ถือหุ้นทั้งหมด:' in key:
+        metadata['total_shareholders'] = clean_integer_value(row.get('จำนวนหุ้น'))
+
+def common_data(symbol, first, metadata):
+    """ค่าที่ทุกแถวของหุ้นเดียวกันใช้ร่วมกัน: จากแถวแรกของหุ้น + แถวเมตา"""
+    data = {
+        'symbol': clean_general_value(symbol),
+        'closing_date': parse_date(first.get('วันปิดสมุด')),
+        'free_float_percent_header': clean_numeric_value(first.get('%Free')),
+        'price': clean_numeric_value(first.get('ราคา')),
+        'pe_ratio': clean_numeric_value(first.get('P/E')),
+        'sector': clean_general_value(first.get('หมวด')),
+    }
+    data.update(metadata)
+    return data
+
+def shareholder_record(common, row):
+    record = common.copy()
+    record.update({
+        'shareholder_name': clean_general_value(row.get('ผู้ถือหุ้นรายใหญ่')),
+        'share_count': clean_integer_value(row.get('จำนวนหุ้น')),
+        'share_percent': clean_numeric_value(row.get('%')),
+    })
+    return record
+
+def build_records(rows):
+    """
+    rows: dict ของแต่ละแถวใน sheet (ชื่อคอลัมน์ตาม header) เรียงตาม SYMBOL แบบที่ export มา
+    ประมวลผลทีละหุ้น (ถือไว้แค่แถวของหุ้นเดียว) คืนแถวของ stock_holders ทีละแถว
+    แถวของหุ้นเดียวกันต้องอยู่ติดกัน ถ้าเจอหุ้นเดิมอีกช่วงจะ raise ValueError
+    (ไฟล์ที่ไม่ได้เรียงใช้ build_records_two_pass แทน)
+    แถวที่ไม่มี SYMBOL ถูกข้ามเหมือน groupby ของ pandas
+    """
+    seen = set()
+    for symbol, group in groupby(rows, key=lambda row: row.get('SYMBOL')):
+        if symbol is None:
+            continue
+        if symbol in seen:
+            raise ValueError(f"แถวของหุ้น {symbol} ไม่อยู่ติดกันใน sheet (ใช้ build_records_two_pass)")
+        seen.add(symbol)
         print(f"กำลังประมวลผลข้อมูลสำหรับหุ้น: {symbol}")
-        
+        group = list(group)
+
         metadata = {}
         shareholder_rows = []
-
-        for index, row in group.iterrows():
-            shareholder_name = str(row['ผู้ถือหุ้นรายใหญ่'])
-            is_metadata_row = any(keyword in shareholder_name for keyword in METADATA_KEYWORDS)
-            
-            if is_metadata_row:
-                key = shareholder_name
-                if 'จำนวนผู้ถือหุ้นรายย่อย' in key:
-                    metadata['free_float_count'] = clean_integer_value(row['จำนวนหุ้น'])
-                elif '%การถือหุ้นของผู้ถือหุ้นรายย่อย' in key:
-                    metadata['free_float_percentage'] = clean_numeric_value(row['%'])
-                elif 'วันที่ขึ้น:' in key:
-                    metadata['xd_date'] = parse_date(row['%Free'])
-                elif '%การถือหุ้นแบบไร้ใบหุ้น:' in key:
-                    metadata['non_cert_share_percent'] = clean_numeric_value(row['%'])
-                elif 'ผู้ถือหุ้นรายย่อย ณ วันที่:' in key:
-                    metadata['minor_shareholder_date'] = parse_date(row['จำนวนหุ้น'])
-                elif 'จำนวนผู้ถือหุ้นทั้งหมด:' in key:
-                    metadata['total_shareholders'] = clean_integer_value(row['จำนวนหุ้น'])
+        for row in group:
+            if is_metadata_row(row):
+                read_metadata(metadata, row)
             else:
-                # *** แก้ไขตรงนี้: ถ้าไม่ใช่แถวเมตา ให้เพิ่มเข้าไปเลย ไม่ต้องตรวจสอบอะไรเพิ่ม ***
                 shareholder_rows.append(row)
 
-        common_data = {
-            'symbol': clean_general_value(symbol),
-            'closing_date': parse_date(group['วันปิดสมุด'].iloc[0]),
-            'free_float_percent_header': clean_numeric_value(group['%Free'].iloc[0]),
-            'price': clean_numeric_value(group['ราคา'].iloc[0]),
-            'pe_ratio': clean_numeric_value(group['P/E'].iloc[0]),
-            'sector': clean_general_value(group['หมวด'].iloc[0]),
-        }
-        common_data.update(metadata)
-
+        common = common_data(symbol, group[0], metadata)
         for row in shareholder_rows:
-            record = common_data.copy()
-            record.update({
-                'shareholder_name': clean_general_value(row['ผู้ถือหุ้นรายใหญ่']),
-                'share_count': clean_integer_value(row['จำนวนหุ้น']),
-                'share_percent': clean_numeric_value(row['%']),
-            })
-            final_records.append(record)
-
-    print(f"ประมวลผลข้อมูลทั้งหมดสำเร็จ {len(final_records)} รายการ")
-
-    if final_records:
-        print("กำลังนำเข้าข้อมูลลง Supabase...")
-        try:
-            for i in range(0, len(final_records), 100):
-                batch = final_records[i:i+100]
-                result = supabase.table(TABLE_NAME).insert(batch).execute()
-                print(f"นำเข้าข้อมูลสำเร็จช่วงที่ {i//100 + 1} ({len(batch)} รายการ)")
-            print("นำเข้าข้อมูลลง Supabase สำเร็จทั้งหมด!")
-        except Exception as e:
-            print(f"เกิดข้อผิดพลาดในการนำเข้าข้อมูล: {e}")
+            yield shareholder_record(common, row)
+
+def build_records_two_pass(read_rows):
+    """
+    สำหรับ sheet ที่แถวของหุ้นเดียวกันไม่อยู่ติดกัน (ผลเหมือน df.groupby('SYMBOL') เดิม)
+    read_rows: ฟังก์ชันที่คืน iterator ของแถวใหม่ทุกครั้ง
+    รอบแรกเก็บแค่แถวแรก + เมตาของแต่ละหุ้น รอบสองสร้างแถวผู้ถือหุ้นตามลำดับในไฟล์
+    """
+    firsts, metadata = {}, {}
+    for row in read_rows():
+        symbol = row.get('SYMBOL')
+        if symbol is None:
+            continue
+        firsts.setdefault(symbol, row)
+        if is_metadata_row(row):
+            read_metadata(metadata.setdefault(symbol, {}), row)
+
+    common = {symbol: common_data(symbol, first, metadata.get(symbol, {})) for symbol, first in firsts.items()}
+    for row in read_rows():
+        symbol = row.get('SYMBOL')
+        if symbol is not None and not is_metadata_row(row):
+            yield shareholder_record(common[symbol], row)
+
+def main():
+    """ฟังก์ชันหลัก: อ่าน sheet แบบ stream แล้วนำเข้าทีละ batch (ไม่โหลดทั้งไฟล์เข้า DataFrame)"""
+    if not os.path.exists(EXCEL_FILE_PATH):
+        print(f"Error: ไม่พบไฟล์ {EXCEL_FILE_PATH}")
+        return
+
+    def read_rows():
+        return (row for _, row in iter_records(EXCEL_FILE_PATH, "SYMBOL", sheets=[SHEET_NAME]))
+
+    # ตรวจก่อนเขียนแถวแรก (อ่านแค่ SYMBOL อีกรอบ): แถวของหุ้นเดียวกันไม่อยู่ติดกัน -> อ่านสองรอบแทน
+    split = split_symbols(row.get('SYMBOL') for row in read_rows())
+    if split:
+        print(f"แถวของหุ้น {', '.join(map(str, split))} ไม่อยู่ติดกันใน sheet {SHEET_NAME} อ่านไฟล์สองรอบ")
+        records = build_records_two_pass(read_rows)
+    else:
+        records = build_records(read_rows())
+    total = 0
+    print(f"กำลังอ่าน {EXCEL_FILE_PATH} และนำเข้าข้อมูลลง Supabase...")
+    try:
+        for number, batch in enumerate(batched(records, 100), start=1):
+            write_batches(supabase, TABLE_NAME, batch, op="insert", batch_size=100)
+            total += len(batch)
+            print(f"นำเข้าข้อมูลสำเร็จช่วงที่ {number} ({len(batch)} รายการ)")
+        print(f"นำเข้าข้อมูลลง Supabase สำเร็จทั้งหมด {total} รายการ!")
+    except Exception as e:
+        print(f"เกิดข้อผิดพลาดในการนำเข้าข้อมูล: {e}")
 
 if __name__ == "__main__":
+    argparse.ArgumentParser(description=f"นำเข้าข้อมูลผู้ถือหุ้นจาก {EXCEL_FILE_PATH} ลง {TABLE_NAME}").parse_args()
     main()
\ No newline at end of file
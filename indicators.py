@@ -0,0 +1,185 @@
+"""
+kernel ของ indicator แบบ recursive (EMA, Wilder RSI, ATR, MACD) บน array ต่อเนื่อง
+
+รับ array 1 มิติ (หุ้นเดียว) หรือ 2 มิติ (วัน x หุ้น) คืน float64 ขนาดเดียวกัน
+- มี numba: loop ถูก compile (ตั้ง TEAMG_NUMBA=0 เพื่อปิด)
+- ไม่มี numba: คำนวณแบบปิดทีละ block ของเวลาด้วย NumPy (ทุกหุ้นพร้อมกัน)
+ผลเท่ากับสูตร recursive (ตรวจเทียบกับ pandas ได้ด้วย bench_indicators.py)
+
+ค่า NaN ช่วงต้น (ก่อนหุ้นเข้าตลาด) ถูกข้าม เริ่มนับจากค่าแรกที่มี NaN ระหว่างทางใช้ค่าเดิมต่อ
+"""
+import os
+import warnings
+
+import numpy as np
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+USE_NUMBA = numba is not None and os.environ.get("TEAMG_NUMBA", "1") != "0"
+
+# ไม่มี numba: คำนวณทีละ block ของเวลาแบบปิด (closed form) ความยาว block ให้ (1 - alpha)^-L ไม่เกินค่านี้
+# (ยิ่งใหญ่ block ยิ่งยาว/เร็ว แต่ error จากการปัดเศษโตตาม)
+BLOCK_GROWTH = 1e4
+
+
+def _recursive_loop(x, alpha, seed_len, out):
+    """
+    y[t] = alpha * x[t] + (1 - alpha) * y[t-1] แยกทีละคอลัมน์
+    ค่าเริ่มต้นคือค่าเฉลี่ยของ seed_len ค่าแรก (seed_len=1 คือค่าแรก แบบ ewm(adjust=False))
+    """
+    rows, cols = x.shape
+    for j in range(cols):
+        first = rows
+        for i in range(rows):
+            if not np.isnan(x[i, j]):
+                first = i
+                break
+        start = first + seed_len - 1
+        if start >= rows:
+            continue
+        total = 0.0
+        count = 0
+        for i in range(first, start + 1):
+            if not np.isnan(x[i, j]):
+                total += x[i, j]
+                count += 1
+        prev = total / count
+        out[start, j] = prev
+        for i in range(start + 1, rows):
+            value = x[i, j]
+            if not np.isnan(value):
+                prev = alpha * value + (1.0 - alpha) * prev
+            out[i, j] = prev
+
+
+if USE_NUMBA:
+    _recursive_loop = numba.njit(cache=True, nogil=True)(_recursive_loop)
+
+
+def _blocked_filter(drive, alpha, out):
+    """
+    y[t] = alpha * drive[t] + (1 - alpha) * y[t-1] (y[-1] = 0) ทั้งเมทริกซ์
+    ใน block ที่เริ่มที่ s: y[s+k] = b^k * (b * y[s-1] + alpha * sum(b^-i * drive[s+i], i <= k)) โดย b = 1 - alpha
+    วน Python แค่จำนวน block ที่เหลือเป็น cumsum ของ NumPy
+    """
+    rows = drive.shape[0]
+    decay = 1.0 - alpha
+    if decay <= 0.0:
+        out[:] = drive
+        return
+    length = max(1, int(np.log(BLOCK_GROWTH) / -np.log(decay))) if decay < 1.0 else rows
+    steps = np.arange(min(length, rows))
+    powers = decay ** steps
+    inverse = decay ** -steps
+    prev = np.zeros(drive.shape[1])
+    for s in range(0, rows, length):
+        chunk = drive[s:s + length]
+        k = len(chunk)
+        acc = np.cumsum(chunk * inverse[:k, None], axis=0)
+        out[s:s + k] = powers[:k, None] * (decay * prev + alpha * acc)
+        prev = out[s + k - 1]
+
+
+def _recursive_numpy(x, alpha, seed_len, out):
+    """
+    ผลเดียวกับ _recursive_loop โดยไม่ต้อง compile
+    จุดเริ่ม (seed) ต่างกันได้ในแต่ละคอลัมน์: ฉีด seed / alpha ที่ตำแหน่งเริ่มแล้วให้ก่อนหน้าเป็น 0
+    คอลัมน์ที่มี NaN ระหว่างทาง (หยุดซื้อขาย) ส่งไป _recursive_loop ทีละคอลัมน์ให้ตรงตามนิยาม
+    """
+    rows, cols = x.shape
+    valid = ~np.isnan(x)
+    first = np.where(valid.any(axis=0), valid.argmax(axis=0), rows)
+    start = first + seed_len - 1
+    row_index = np.arange(rows)[:, None]
+
+    gaps = (~valid & (row_index >= first[None, :])).any(axis=0)
+    if gaps.any():
+        columns = np.flatnonzero(gaps)
+        sub = np.full((rows, len(columns)), np.nan)
+        _recursive_loop(np.ascontiguousarray(x[:, columns]), alpha, seed_len, sub)
+        out[:, columns] = sub
+
+    columns = np.flatnonzero(~gaps & (start < rows))
+    if not len(columns):
+        return
+    filled = np.where(valid[:, columns], x[:, columns], 0.0)
+    begin = start[columns]
+    picked = np.arange(len(columns))
+    if seed_len == 1:
+        seed = filled[begin, picked]
+    else:
+        seed = np.cumsum(filled, axis=0)[begin, picked] / seed_len
+
+    drive = np.where(row_index > begin[None, :], filled, 0.0)
+    drive[begin, picked] = seed / alpha
+    y = np.empty_like(drive)
+    _blocked_filter(drive, alpha, y)
+    y[row_index < begin[None, :]] = np.nan
+    out[:, columns] = y
+
+
+def recursive(x, alpha, seed_len=1):
+    """ตัวกรอง recursive ทั่วไปที่ทุก indicator ในไฟล์นี้ใช้"""
+    x = np.asarray(x, dtype=np.float64)
+    one_dim = x.ndim == 1
+    x2 = np.ascontiguousarray(x.reshape(-1, 1) if one_dim else x)
+    out = np.full(x2.shape, np.nan)
+    if USE_NUMBA:
+        _recursive_loop(x2, float(alpha), int(seed_len), out)
+    else:
+        _recursive_numpy(x2, float(alpha), int(seed_len), out)
+    return out[:, 0] if one_dim else out
+
+
+def ema(close, span):
+    """EMA แบบ pandas ewm(span, adjust=False): alpha = 2 / (span + 1) เริ่มจากค่าแรก"""
+    return recursive(close, 2.0 / (span + 1))
+
+
+def wilder(x, n):
+    """Wilder smoothing (RMA): เริ่มด้วยค่าเฉลี่ย n ค่าแรก แล้ว alpha = 1 / n"""
+    return recursive(x, 1.0 / n, seed_len=n)
+
+
+def _shift(x):
+    out = np.empty_like(x)
+    out[0] = np.nan
+    out[1:] = x[:-1]
+    return out
+
+
+def rsi(close, n=14):
+    """Wilder RSI: ค่าเฉลี่ยกำไร/ขาดทุนแบบ Wilder ของผลต่างราคาปิด (ไม่มีขาดทุนเลย = 100)"""
+    close = np.asarray(close, dtype=np.float64)
+    delta = close - _shift(close)
+    gain = np.where(delta > 0, delta, np.where(np.isnan(delta), np.nan, 0.0))
+    loss = np.where(delta < 0, -delta, np.where(np.isnan(delta), np.nan, 0.0))
+    avg_gain, avg_loss = wilder(gain, n), wilder(loss, n)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out = 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+    return np.where((avg_loss == 0) & ~np.isnan(avg_gain), 100.0, out)
+
+
+def true_range(high, low, close):
+    """max(high - low, |high - ปิดก่อนหน้า|, |low - ปิดก่อนหน้า|) แท่งแรกใช้ high - low"""
+    high, low, close = (np.asarray(a, dtype=np.float64) for a in (high, low, close))
+    prev_close = _shift(close)
+    ranges = np.stack([high - low, np.abs(high - prev_close), np.abs(low - prev_close)])
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        return np.nanmax(ranges, axis=0)
+
+
+def atr(high, low, close, n=14):
+    """Average True Range แบบ Wilder"""
+    return wilder(true_range(high, low, close), n)
+
+
+def macd(close, fast=12, slow=26, signal=9):
+    """คืน (macd, signal, histogram) ใช้ EMA แบบเดียวกับ ema()"""
+    line = ema(close, fast) - ema(close, slow)
+    signal_line = ema(line, signal)
+    return line, signal_line, line - signal_line
@@ -0,0 +1,188 @@
+"""
+ราคาระหว่างวัน (แท่ง 1 นาที) สำหรับ dashboard
+
+worker ตัวเดียวต่อ process ดึงแท่งจาก Yahoo (หรือไฟล์ replay) ทุก POLL_SECONDS ลง ring buffer
+session ของ dashboard จำ cursor ของตัวเองแล้วขอเฉพาะแท่งที่ใหม่/เปลี่ยนตั้งแต่ cursor นั้น (delta)
+ไม่ว่าจะเปิดกี่ session ก็ยิง backend แค่ worker เดียว
+
+    feed = IntradayFeed("TEAMG.BK")
+    feed.start()
+    cursor, bars, reset = feed.buffer.since(0)
+
+นอกเวลาตลาด (ดู trading_calendar + SESSIONS) worker ไม่ยิง Yahoo
+ทดสอบนอกเวลาตลาด: ตั้ง TEAMG_INTRADAY_REPLAY=ไฟล์.csv (คอลัมน์ time, open, high, low, close, volume)
+worker จะปล่อยทีละแถวต่อรอบเหมือนแท่งใหม่เข้ามา
+"""
+import os
+import csv
+import threading
+from collections import deque
+from datetime import datetime, time as dtime
+from zoneinfo import ZoneInfo
+
+from run_metrics import metrics
+from resilience import call
+from trading_calendar import is_trading_day
+
+SYMBOL = "TEAMG.BK"
+POLL_SECONDS = 30
+
+# แท่ง 1 นาทีทั้งวันของ SET ~ 270 แท่ง เผื่อไว้
+BUFFER_SIZE = 400
+
+BANGKOK = ZoneInfo("Asia/Bangkok")
+
+# ช่วงซื้อขาย (รวมช่วง pre-open / ปิดตลาด) เวลากรุงเทพ
+SESSIONS = [
+    (dtime(9, 55), dtime(12, 35)),
+    (dtime(14, 25), dtime(16, 40)),
+]
+
+REPLAY_FILE = os.environ.get("TEAMG_INTRADAY_REPLAY")
+
+BAR_FIELDS = ("open", "high", "low", "close", "volume")
+
+
+def market_open(now=None):
+    """ตอนนี้อยู่ในช่วงซื้อขายของ SET หรือไม่"""
+    now = now or datetime.now(BANGKOK)
+    if not is_trading_day(now.date()):
+        return False
+    return any(start <= now.time() <= end for start, end in SESSIONS)
+
+
+class RingBuffer:
+    """
+    แท่งล่าสุด size แท่ง แต่ละแท่งมีเลขลำดับ (seq) ที่เพิ่มทุกครั้งที่แท่งนั้นถูกเพิ่มหรือแก้
+    แท่งสุดท้ายที่ยังไม่ปิด (เวลาเดียวกันแต่ราคาเปลี่ยน) ได้ seq ใหม่ ผู้อ่านจึงได้ค่าล่าสุดใน delta
+    """
+
+    def __init__(self, size=BUFFER_SIZE):
+        self._entries = deque(maxlen=size)   # [seq, bar]
+        self._cond = threading.Condition()
+        self.seq = 0
+
+    def publish(self, bars):
+        """bars: list ของ dict ที่มี key time (เรียงตามเวลา) คืนจำนวนแท่งที่ใหม่หรือเปลี่ยน"""
+        changed = 0
+        with self._cond:
+            for bar in bars:
+                last = self._entries[-1][1] if self._entries else None
+                if last is not None and bar["time"] < last["time"]:
+                    continue
+                if last is not None and bar["time"] == last["time"]:
+                    if bar == last:
+                        continue
+                    self._entries.pop()
+                self.seq += 1
+                self._entries.append([self.seq, bar])
+                changed += 1
+            if changed:
+                self._cond.notify_all()
+        return changed
+
+    def since(self, cursor):
+        """
+        คืน (cursor ใหม่, แท่งที่ seq > cursor, reset)
+        reset=True เมื่อ cursor เก่ากว่าที่ buffer เก็บไว้ (ผู้อ่านต้องทิ้งของเดิมแล้วใช้ชุดที่ได้แทน)
+        """
+        with self._cond:
+            oldest = self._entries[0][0] if self._entries else self.seq + 1
+            reset = cursor < oldest - 1 or cursor > self.seq
+            if reset:
+                return self.seq, [bar for _, bar in self._entries], True
+            return self.seq, [bar for seq, bar in self._entries if seq > cursor], False
+
+    def wait(self, cursor, timeout=None):
+        """รอจนมีแท่งใหม่หลัง cursor (หรือหมดเวลา) แล้วคืนแบบเดียวกับ since()"""
+        with self._cond:
+            self._cond.wait_for(lambda: self.seq != cursor, timeout=timeout)
+        return self.since(cursor)
+
+
+def yahoo_source(symbol):
+    """แท่ง 1 นาทีของวันนี้จาก Yahoo"""
+    def fetch():
+        import yfinance as yf
+
+        with metrics.timer("fetch_seconds", host="yahoo"):
+            df = call("yahoo", yf.Ticker(symbol).history, period="1d", interval="1m")
+        if df.empty:
+            return []
+        df = df.reset_index()
+        df.columns = [c.lower() for c in df.columns]
+        times = df[df.columns[0]].dt.tz_convert(BANGKOK).dt.strftime("%Y-%m-%d %H:%M")
+        values = df[list(BAR_FIELDS)].astype(float).to_dict(orient="records")
+        return [{"time": t, **row} for t, row in zip(times, values)]
+    return fetch
+
+
+def replay_source(path):
+    """ตัวแทน feed จริง: อ่าน CSV ครั้งเดียวแล้วปล่อยเพิ่มรอบละ 1 แท่ง"""
+    with open(path, encoding="utf-8") as f:
+        rows = [{"time": row["time"], **{field: float(row[field]) for field in BAR_FIELDS}}
+                for row in csv.DictReader(f)]
+    position = 0
+
+    def fetch():
+        nonlocal position
+        position = min(position + 1, len(rows))
+        return rows[:position]
+    return fetch
+
+
+class IntradayFeed:
+    """worker ดึงแท่งตาม poll_seconds แล้ว publish ลง buffer (thread แบบ daemon ตัวเดียว)"""
+
+    def __init__(self, symbol=SYMBOL, source=None, poll_seconds=POLL_SECONDS, buffer_size=BUFFER_SIZE):
+        self.symbol = symbol
+        self.replay = source is None and bool(REPLAY_FILE)
+        self.source = source or (replay_source(REPLAY_FILE) if self.replay else yahoo_source(symbol))
+        self.poll_seconds = poll_seconds
+        self.buffer = RingBuffer(buffer_size)
+        self.last_poll = None
+        self.last_error = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def poll_once(self):
+        bars = self.source()
+        changed = self.buffer.publish(bars)
+        self.last_poll = datetime.now(BANGKOK)
+        self.last_error = None
+        metrics.inc("intraday_polls", symbol=self.symbol)
+        metrics.inc("intraday_bars", changed, symbol=self.symbol)
+        return changed
+
+    def _run(self):
+        while not self._stop.is_set():
+            if self.replay or market_open():
+                try:
+                    self.poll_once()
+                except Exception as e:
+                    self.last_error = str(e)
+                    print(f"[intraday] {self.symbol}: {e}")
+            self._stop.wait(self.poll_seconds)
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name=f"intraday-{self.symbol}", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+
+if __name__ == "__main__":
+    feed = IntradayFeed(poll_seconds=5 if REPLAY_FILE else POLL_SECONDS).start()
+    cursor = 0
+    print(f"ติดตาม {feed.symbol} (ตลาด{'เปิด' if market_open() else 'ปิด'}{', replay' if feed.replay else ''}) Ctrl+C เพื่อหยุด")
+    try:
+        while True:
+            cursor, bars, reset = feed.buffer.wait(cursor, timeout=60)
+            for bar in bars:
+                print(f"{bar['time']}  O {bar['open']:.2f}  H {bar['high']:.2f}  L {bar['low']:.2f}  C {bar['close']:.2f}  V {bar['volume']:.0f}")
+    except KeyboardInterrupt:
+        feed.stop()
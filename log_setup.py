@@ -0,0 +1,116 @@
+"""
+ตั้งค่า logging ของงานข่าว: เขียนผ่านคิว (ไม่บล็อก loop หลัก), หมุนไฟล์ตามขนาดหรือเวลา, บีบอัดไฟล์เก่าเป็น .gz
+และเขียนไฟล์เป็น JSON lines ที่มี field แยก (symbol, source, count, duration) ให้ query ได้
+
+ตัวอย่าง:
+    from log_setup import setup_logging
+    setup_logging()
+    logging.info("Kaohoon: พบ 3 ข่าว", extra={"symbol": "PTT", "source": "Kaohoon", "count": 3})
+
+อ่านย้อนหลัง:
+    zcat -f set50_news_log.jsonl* | jq 'select(.source == "Kaohoon" and .count == 0)'
+"""
+import os
+import gzip
+import json
+import queue
+import atexit
+import shutil
+import logging
+import logging.handlers
+from datetime import datetime
+
+LOG_FILE = "set50_news_log.jsonl"
+
+# หมุนไฟล์เมื่อเกิน 5 MB เก็บไว้ 10 ไฟล์ (ไฟล์เก่าบีบอัดเหลือราว 1/10)
+MAX_BYTES = 5 * 1024 * 1024
+BACKUP_COUNT = 10
+
+CONSOLE_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+# field ที่ส่งผ่าน extra= แล้วอยากให้อยู่ใน JSON
+EXTRA_FIELDS = ("symbol", "source", "count", "duration", "url", "job")
+
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    """1 record = 1 บรรทัด JSON"""
+
+    def format(self, record):
+        data = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for field in EXTRA_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                data[field] = value
+        if record.exc_info:
+            data["exc"] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+def _gzip_namer(name):
+    return name + ".gz"
+
+
+def _gzip_rotator(source, dest):
+    """บีบอัดไฟล์ที่หมุนออกแล้วลบต้นฉบับ (ทำใน thread ของ listener ไม่กระทบงานหลัก)"""
+    with open(source, "rb") as src, gzip.open(dest, "wb") as dst:
+        shutil.copyfileobj(src, dst)
+    os.remove(source)
+
+
+def _file_handler(log_file, when=None):
+    if when:
+        handler = logging.handlers.TimedRotatingFileHandler(
+            log_file, when=when, backupCount=BACKUP_COUNT, encoding="utf-8")
+    else:
+        handler = logging.handlers.RotatingFileHandler(
+            log_file, maxBytes=MAX_BYTES, backupCount=BACKUP_COUNT, encoding="utf-8")
+    handler.namer = _gzip_namer
+    handler.rotator = _gzip_rotator
+    handler.setFormatter(JsonFormatter())
+    return handler
+
+
+def setup_logging(log_file=LOG_FILE, level=logging.INFO, when=None, console=True):
+    """
+    ผูก root logger กับ QueueHandler แล้วให้ QueueListener (thread แยก) เขียนไฟล์/console
+    when=None หมุนตามขนาด (MAX_BYTES) หรือส่ง 'midnight' / 'H' ให้หมุนตามเวลา
+    เรียกซ้ำได้ (ครั้งถัดไปไม่ทำอะไร)
+    """
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    handlers = [_file_handler(log_file, when)]
+    if console:
+        stream = logging.StreamHandler()
+        stream.setFormatter(logging.Formatter(CONSOLE_FORMAT))
+        handlers.append(stream)
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+    return _listener
+
+
+def stop_logging():
+    """flush คิวที่ค้างแล้วปิดไฟล์ (atexit เรียกให้เอง)"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
@@ -0,0 +1,109 @@
+"""
+สรุปภาพรวม SET50 รายวัน (รันหลังงานราคา + ข่าว) เก็บไว้ในตาราง market_summary 1 แถวต่อหุ้น
+
+คอลัมน์: symbol, as_of, close, change_pct, rsi, z_score, high_52w, low_52w, pct_from_high,
+        volume_ratio (volume วันล่าสุด / เฉลี่ย 20 วัน),
+        news_7d (จำนวนข่าว 7 วันล่าสุด นับข่าวเดียวกันจากหลายแหล่งเป็นข่าวเดียว ดู news_dedup.py)
+
+หน้า overview ใน dashboard อ่านแค่ตารางนี้ (~50 แถว) query เดียว ไม่ต้องดึงประวัติราคาทั้งตลาด
+"""
+import argparse
+from datetime import date, timedelta
+
+from clients import supabase
+from storage import fetch_all
+import indicators
+import news_dedup
+from save_bec_to_supabase import set50_symbols
+from save_stock_to_supabase import set50_symbols as own_symbols
+
+SUMMARY_TABLE = "market_summary"
+
+# หุ้นในภาพรวม: SET50 + หุ้นที่ติดตามเอง (TEAMG, SECURE)
+UNIVERSE = sorted({s.replace(".BK", "") for s in set50_symbols + own_symbols})
+
+# ย้อนหลังพอสำหรับ 52 สัปดาห์ (ปฏิทิน) + เผื่อวันหยุด
+LOOKBACK_DAYS = 380
+NEWS_DAYS = 7
+
+
+def load_prices(symbols, since, until):
+    return fetch_all(lambda: supabase.table("stock_prices")
+                     .select("symbol, date, high, low, close, volume")
+                     .in_("symbol", symbols)
+                     .gte("date", since.isoformat())
+                     .lte("date", until.isoformat())
+                     .order("symbol")
+                     .order("date"))
+
+
+def load_news_counts(symbols, since, until):
+    rows = fetch_all(lambda: supabase.table("stock_news")
+                     .select("symbol, news_date, title, summary")
+                     .in_("symbol", symbols)
+                     .gte("news_date", since.isoformat())
+                     .lte("news_date", until.isoformat())
+                     .order("symbol")
+                     .order("news_date"))
+    return news_dedup.count_stories(rows)
+
+
+def compute_summary(prices, news_counts):
+    """แปลงราคาย้อนหลังเป็น snapshot ล่าสุดต่อหุ้น (คำนวณทั้งตารางด้วย groupby ทีเดียว)"""
+    import numpy as np
+    import pandas as pd
+
+    df = pd.DataFrame(prices)
+    if df.empty:
+        return []
+    df = df.sort_values(["symbol", "date"])
+    g = df.groupby("symbol", sort=False)
+
+    df["change_pct"] = g["close"].pct_change() * 100
+
+    # RSI 14 วันแบบ Wilder เหมือน teamg_data_pipeline.py
+    df["rsi"] = g["close"].transform(lambda close: indicators.rsi(close.to_numpy(dtype=float), 14))
+
+    mean20 = g["close"].rolling(20).mean().reset_index(level=0, drop=True)
+    std20 = g["close"].rolling(20).std().reset_index(level=0, drop=True)
+    df["z_score"] = (df["close"] - mean20) / std20
+
+    avg_volume20 = g["volume"].rolling(20).mean().reset_index(level=0, drop=True)
+    df["volume_ratio"] = df["volume"] / avg_volume20.replace(0, np.nan)
+
+    # 52 สัปดาห์ ≈ 252 วันทำการ
+    df["high_52w"] = g["high"].rolling(252, min_periods=1).max().reset_index(level=0, drop=True)
+    df["low_52w"] = g["low"].rolling(252, min_periods=1).min().reset_index(level=0, drop=True)
+
+    latest = df.groupby("symbol", sort=False).tail(1).copy()
+    latest["pct_from_high"] = (latest["close"] / latest["high_52w"] - 1) * 100
+    latest["news_7d"] = latest["symbol"].map(news_counts).fillna(0).astype(int)
+    latest = latest.rename(columns={"date": "as_of"})
+
+    columns = ["symbol", "as_of", "close", "change_pct", "rsi", "z_score", "high_52w", "low_52w",
+               "pct_from_high", "volume_ratio", "news_7d"]
+    latest = latest[columns].round({"change_pct": 2, "rsi": 2, "z_score": 3, "pct_from_high": 2, "volume_ratio": 2})
+    return latest.replace({np.nan: None, np.inf: None, -np.inf: None}).to_dict(orient="records")
+
+
+def update_market_summary(as_of=None):
+    """คำนวณ snapshot ของทุกหุ้นใน UNIVERSE แล้ว upsert ลง market_summary คืนจำนวนแถว"""
+    as_of = as_of or date.today()
+    # ตัดข้อมูลหลัง as_of ออก ให้ --as-of ย้อนหลังได้ภาพ ณ วันนั้นจริง
+    prices = load_prices(UNIVERSE, as_of - timedelta(days=LOOKBACK_DAYS), as_of)
+    news_counts = load_news_counts(UNIVERSE, as_of - timedelta(days=NEWS_DAYS), as_of)
+    rows = compute_summary(prices, news_counts)
+    if not rows:
+        print("ไม่มีข้อมูลราคาสำหรับสรุปภาพรวม")
+        return 0
+
+    supabase.table(SUMMARY_TABLE).upsert(rows, on_conflict="symbol").execute()
+    print(f"อัพเดต {SUMMARY_TABLE} {len(rows)} หุ้น (ข้อมูลราคา {len(prices)} แถว)")
+    return len(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="สรุปภาพรวม SET50 รายวันลงตาราง market_summary")
+    parser.add_argument("--as-of", help="วันที่อ้างอิง (YYYY-MM-DD, default วันนี้)")
+    args = parser.parse_args()
+    update_market_summary(date.fromisoformat(args.as_of) if args.as_of else None)
@@ -1,23 +1,16 @@
-import os
 import re
 import time
-import requests
-from bs4 import BeautifulSoup
+import hashlib
+import argparse
+from bs4 import BeautifulSoup, SoupStrainer
 from datetime import datetime, timedelta
-from supabase import create_client, Client
+from clients import supabase, get_session
 from dotenv import load_dotenv
+from news_dates import parse_news_date, to_iso
+from run_metrics import metrics, run_record
 
 load_dotenv()
 
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-
-if not SUPABASE_URL or not SUPABASE_KEY:
-    print("Error: ไม่พบ SUPABASE_URL หรือ SUPABASE_KEY")
-    exit(1)
-
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
-
 TARGET_SYMBOLS = ["SECURE", "TEAMG"]
 ONE_YEAR_AGO = (datetime.now() - timedelta(days=365)).date()
 
@@ -25,144 +18,160 @@ HEADERS = {
     'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
 }
 
-MONTH_TH_TO_NUM = {
-    'ม.ค.': 1, 'ก.พ.': 2, 'มี.ค.': 3, 'เม.ย.': 4, 'พ.ค.': 5, 'มิ.ย.': 6,
-    'ก.ค.': 7, 'ส.ค.': 8, 'ก.ย.': 9, 'ต.ค.': 10, 'พ.ย.': 11, 'ธ.ค.': 12,
-    'Jan': 1, 'Feb': 2, 'Mar': 3, 'Apr': 4, 'May': 5, 'Jun': 6,
-    'Jul': 7, 'Aug': 8, 'Sep': 9, 'Oct': 10, 'Nov': 11, 'Dec': 12
-}
-
 def parse_date(date_str):
-    """Parse วันที่แบบไทย/อังกฤษ เช่น '13 Nov', '15 13 Jan', '24 13 พ.ย.' """
-    date_str = date_str.strip().lower()
-    try:
-        # ลอง pattern ทั่วไป: digit + month (อาจมีปี พ.ศ.)
-        match = re.search(r'(\d{1,2})\s*(\w{3,})\s*(\d{4})?', date_str)
-        if match:
-            day = int(match.group(1))
-            month_str = match.group(2).capitalize()
-            year_str = match.group(3)
-            month = MONTH_TH_TO_NUM.get(month_str, None)
-            if not month:
-                month = MONTH_TH_TO_NUM.get(month_str[:3], None)
-            if month:
-                year = int(year_str) - 543 if year_str else datetime.now().year
-                return datetime(year, month, day).date()
-        # fallback วันนี้
-        return datetime.now().date()
-    except:
-        return datetime.now().date()
+    """Parse วันที่แบบไทย/อังกฤษ เช่น '13 Nov', '15 13 Jan', '24 13 พ.ย.' (คืน None ถ้าไม่รู้วันที่)"""
+    return parse_news_date(date_str)
+
+
+# ---------- Gapfocus parser ----------
+# compile selector ครั้งเดียว แล้ว parse เฉพาะ element ที่เป็นกล่องข่าว (SoupStrainer) แทนการสร้าง tree ทั้งหน้า
+BLOCK_CLASS_RE = re.compile(r'(talk|news|item|schedule|post|entry)')
+TITLE_TEXT_RE = re.compile(r'.{10,}')
+DATE_TEXT_RE = re.compile(r'\d{1,2}\s*(?:[A-Za-z]{3}|[\u0E00-\u0E7F]{1,3}\.)|\d{1,2}\s*\d{1,2}')
+SUMMARY_CLASS_RE = re.compile(r'detail|desc|summary')
+TITLE_TAGS = ['a', 'h3', 'h4', 'strong', 'span']
+DATE_TAGS = ['time', 'span', 'small']
+GAPFOCUS_BASE_URL = 'https://stock.gapfocus.com'
+
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = 'lxml'
+except ImportError:
+    HTML_PARSER = 'html.parser'
+
+
+# selector ตามลำดับความสำคัญเดิม (ใช้ชุดแรกที่เจอ): div ที่ class เป็นกล่องข่าว > li > article > div ที่ข้อความเป็นหัวข้อ
+BLOCK_TEXT_RE = re.compile(r'(Views|ประเด็นข่าว|talk|pdf|youtube)', re.I)
+NEWS_BLOCK_SELECTORS = [
+    ('div', {'class_': BLOCK_CLASS_RE}),
+    ('li', {}),
+    ('article', {}),
+    ('div', {'string': BLOCK_TEXT_RE}),
+]
+
+# parse รอบเดียว เก็บเฉพาะ div / li / article (พร้อมลูกทั้งหมด) ทุก element ที่ selector ข้างบนหาได้จากทั้งหน้า
+# อยู่ใน tree นี้ครบ find_all (รวมกล่องที่ซ้อนกัน) จึงได้ผลเหมือน parse ทั้งหน้า
+NEWS_BLOCK_STRAINER = SoupStrainer(['div', 'li', 'article'])
+
+
+def _select_blocks(html):
+    """parse หน้าครั้งเดียวด้วย NEWS_BLOCK_STRAINER แล้วคืนกล่องข่าวของ selector แรกที่เจอ"""
+    soup = BeautifulSoup(html, HTML_PARSER, parse_only=NEWS_BLOCK_STRAINER)
+    for name, kwargs in NEWS_BLOCK_SELECTORS:
+        blocks = soup.find_all(name, **kwargs)
+        if blocks:
+            return blocks
+    return []
+
+
+def iter_gapfocus_news(html, symbol, page_url):
+    """
+    Generator: parse หน้า Gapfocus แล้ว yield ข่าวทีละรายการ
+    parse เฉพาะกล่องข่าว ไม่ต้องสร้าง DOM ทั้งหน้า ถ้าไม่เจอกล่องข่าวเลย (หน้าส่วนน้อย) จะ parse อีกรอบ
+    เพื่อ fallback ไปดูเฉพาะข้อความที่มีชื่อหุ้น (ไม่ใช่ get_text ทั้งหน้า)
+    ทุกรายการมี url ไม่ซ้ำกัน (conflict key ของ upsert): ข้อความ fallback ใช้ url หน้า + #hash ของข้อความ
+    """
+    blocks = _select_blocks(html)
 
+    if not blocks:
+        symbol_re = re.compile(re.escape(symbol), re.I)
+        texts = BeautifulSoup(html, HTML_PARSER, parse_only=SoupStrainer(string=symbol_re))
+        seen_lines = set()
+        for text in texts.find_all(string=True):
+            line = text.strip()
+            if len(line) > 20 and line not in seen_lines:
+                seen_lines.add(line)
+                line_key = hashlib.sha1(line.encode('utf-8')).hexdigest()[:12]
+                yield {'symbol': symbol, 'title': line, 'url': f"{page_url}#{line_key}", 'news_date': None,
+                       'summary': line[:300], 'source': 'Gapfocus'}
+        return
 
-def fetch_gapfocus_news(symbol):
-    url = f"https://stock.gapfocus.com/detail/{symbol}"
-    news_list = []
     seen_urls = set()
+    for block in blocks:
+        title_tag = block.find(TITLE_TAGS, string=TITLE_TEXT_RE)
+        title = title_tag.get_text(strip=True) if title_tag else block.get_text(strip=True)[:150]
+
+        if not title or len(title) < 15:
+            continue
+
+        news_url = title_tag.get('href') if title_tag else None
+        news_url = news_url or page_url
+        if not news_url.startswith('http'):
+            news_url = GAPFOCUS_BASE_URL + news_url
+        if news_url in seen_urls:
+            continue
+        seen_urls.add(news_url)
+
+        # หาวันที่
+        date_tag = block.find(DATE_TAGS, string=DATE_TEXT_RE)
+        news_date = parse_date(date_tag.get_text(strip=True)) if date_tag else None
+
+        # ไม่รู้วันที่ → เก็บเป็น NULL แทนการเดาเป็นวันนี้ (conflict key ของตารางนี้คือ url)
+        if news_date and news_date < ONE_YEAR_AGO:
+            continue
+
+        source = 'Gapfocus'
+        if 'SET' in title or 'Yuanta' in title:
+            source = 'SET/Yuanta'
+
+        summary_tag = block.find(['p', 'div'], class_=SUMMARY_CLASS_RE)
+        summary = summary_tag.get_text(strip=True) if summary_tag else title[:300]
+
+        yield {
+            'symbol': symbol,
+            'title': title,
+            'url': news_url,
+            'news_date': to_iso(news_date),
+            'summary': summary,
+            'source': source
+        }
+
+
+def fetch_gapfocus_news(symbol):
+    url = f"{GAPFOCUS_BASE_URL}/detail/{symbol}"
 
     try:
-        response = requests.get(url, headers=HEADERS, timeout=12)
+        response = get_session().get(url, headers=HEADERS, timeout=12)
         response.raise_for_status()
     except Exception as e:
         print(f"Error ดึง {symbol}: {e}")
         return []
 
-    soup = BeautifulSoup(response.text, 'html.parser')
-
-    # พยายามหา container ข่าวหลัก (หลาย selector)
-    possible_containers = [
-        soup.find_all('div', class_=re.compile(r'(talk|news|item|schedule|post|entry)')),
-        soup.find_all('li'),
-        soup.find_all('article'),
-        soup.find_all('div', string=re.compile(r'(Views|ประเด็นข่าว|talk|pdf|youtube)', re.I))
-    ]
-
-    blocks = []
-    for cont in possible_containers:
-        if cont:
-            blocks.extend(cont)
-            break
-
-    if not blocks:
-        # fallback: ดึง text ทั้งหน้า แล้ว split เป็นบรรทัด
-        full_text = soup.get_text(separator='\n', strip=True)
-        lines = [line.strip() for line in full_text.split('\n') if line.strip() and len(line) > 20]
-        # สมมติ pattern: symbol + date + title
-        current_news = None
-        for line in lines:
-            if symbol.upper() in line.upper():
-                if current_news:
-                    news_list.append(current_news)
-                current_news = {'title': line, 'url': url, 'source': 'Gapfocus'}
-            elif current_news:
-                current_news['summary'] = (current_news.get('summary', '') + ' ' + line).strip()
-        if current_news:
-            news_list.append(current_news)
-    else:
-        # parse จาก blocks
-        for block in blocks:
-            title_tag = block.find(['a', 'h3', 'h4', 'strong', 'span'], string=re.compile(r'.{10,}'))
-            title = title_tag.get_text(strip=True) if title_tag else block.get_text(strip=True)[:150]
-
-            if not title or len(title) < 15:
-                continue
-
-            news_url = title_tag['href'] if title_tag and 'href' in title_tag.attrs else url
-            if not news_url.startswith('http'):
-                news_url = 'https://stock.gapfocus.com' + news_url
-            if news_url in seen_urls:
-                continue
-            seen_urls.add(news_url)
-
-            # หาวันที่
-            date_tag = block.find(['time', 'span', 'small'], string=re.compile(r'\d{1,2}\s*(Jan|Feb|Nov|ม.ค.|พ.ย.)|\d{1,2}\s*\d{1,2}'))
-            date_text = date_tag.get_text(strip=True) if date_tag else ''
-            news_date = parse_date(date_text) if date_text else datetime.now().date()
-
-            if news_date < ONE_YEAR_AGO:
-                continue
-
-            source = 'Gapfocus'
-            if 'SET' in title or 'Yuanta' in title:
-                source = 'SET/Yuanta'
-
-            summary_tag = block.find(['p', 'div'], class_=re.compile(r'detail|desc|summary'))
-            summary = summary_tag.get_text(strip=True) if summary_tag else title[:300]
-
-            news = {
-                'symbol': symbol,
-                'title': title,
-                'url': news_url,
-                'news_date': news_date.isoformat(),
-                'summary': summary,
-                'source': source
-            }
-            news_list.append(news)
-
+    with metrics.timer("parse_seconds", source="Gapfocus"):
+        news_list = list(iter_gapfocus_news(response.text, symbol, url))
+    metrics.inc("rows_matched", len(news_list), source="Gapfocus")
     print(f"พบ {len(news_list)} ข่าวสำหรับ {symbol} (หลัง filter 1 ปี)")
     return news_list
 
 
-def upsert_gapfocus_news():
-    all_news = []
-    for symbol in TARGET_SYMBOLS:
+def upsert_gapfocus_news(symbols=None, delay=6):
+    """ดึงข่าวทีละหุ้นแล้ว upsert ทันที (ไม่ต้องสะสมข่าวทั้งตลาดไว้ใน memory)"""
+    symbols = symbols or TARGET_SYMBOLS
+    total = 0
+    for symbol in symbols:
         print(f"ดึง {symbol} จาก Gapfocus...")
         news = fetch_gapfocus_news(symbol)
-        all_news.extend(news)
-        time.sleep(6)  # ช้า ๆ ป้องกัน block
-
-    if all_news:
-        try:
-            supabase.table('stock_news').upsert(
-                all_news,
-                on_conflict='url'
-            ).execute()
-            print(f"นำเข้า {len(all_news)} ข่าวสำเร็จ")
-        except Exception as e:
-            print(f"Upsert error: {e}")
+        if news:
+            try:
+                supabase.table('stock_news').upsert(
+                    news,
+                    on_conflict='url'
+                ).execute()
+                total += len(news)
+            except Exception as e:
+                print(f"Upsert error {symbol}: {e}")
+        time.sleep(delay)  # ช้า ๆ ป้องกัน block
 
-    return all_news
+    print(f"นำเข้า {total} ข่าวสำเร็จ")
+    return total
 
 
 if __name__ == "__main__":
-    print("ดึงข่าว SECURE + TEAMG จาก stock.gapfocus.com ย้อนหลัง 1 ปี...")
-    upsert_gapfocus_news()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="ดึงข่าวจาก stock.gapfocus.com ย้อนหลัง 1 ปี แล้ว upsert ลง stock_news")
+    parser.add_argument("symbols", nargs="*", help=f"ชื่อหุ้น (default: {' '.join(TARGET_SYMBOLS)})")
+    args = parser.parse_args()
+
+    symbols = [s.upper() for s in args.symbols] or TARGET_SYMBOLS
+    print(f"ดึงข่าว {' + '.join(symbols)} จาก stock.gapfocus.com ย้อนหลัง 1 ปี...")
+    with run_record("news_gapfocus"):
+        upsert_gapfocus_news(symbols)
\ No newline at end of file
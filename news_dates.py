@@ -0,0 +1,162 @@
+import re
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+
+# ค่าที่คืนเมื่อแปลงวันที่ไม่ได้ (แทนการเดาเป็น "วันนี้" ซึ่งทำให้ news_date ใน conflict key เพี้ยน)
+UNKNOWN_DATE = None
+
+# ปี พ.ศ. = ค.ศ. + 543
+BUDDHIST_ERA_OFFSET = 543
+
+_MONTH_NAMES = {
+    1: ['ม.ค.', 'มกราคม', 'jan', 'january'],
+    2: ['ก.พ.', 'กุมภาพันธ์', 'feb', 'february'],
+    3: ['มี.ค.', 'มีนาคม', 'mar', 'march'],
+    4: ['เม.ย.', 'เมษายน', 'apr', 'april'],
+    5: ['พ.ค.', 'พฤษภาคม', 'may'],
+    6: ['มิ.ย.', 'มิถุนายน', 'jun', 'june'],
+    7: ['ก.ค.', 'กรกฎาคม', 'jul', 'july'],
+    8: ['ส.ค.', 'สิงหาคม', 'aug', 'august'],
+    9: ['ก.ย.', 'กันยายน', 'sep', 'sept', 'september'],
+    10: ['ต.ค.', 'ตุลาคม', 'oct', 'october'],
+    11: ['พ.ย.', 'พฤศจิกายน', 'nov', 'november'],
+    12: ['ธ.ค.', 'ธันวาคม', 'dec', 'december'],
+}
+
+
+def _month_key(text):
+    """ตัดจุด/ช่องว่างและทำเป็นตัวพิมพ์เล็ก เช่น 'ม.ค.' -> 'มค', 'Jan.' -> 'jan'"""
+    return text.replace('.', '').replace(' ', '').lower()
+
+
+MONTH_LOOKUP = {_month_key(name): num for num, names in _MONTH_NAMES.items() for name in names}
+
+def _month_pattern():
+    """ชื่อเดือนทุกแบบเป็น regex เดียว (จุดใส่หรือไม่ใส่ก็ได้ ชื่อยาวลองก่อน) คำที่ไม่ใช่เดือน เช่น 'น.' จึงไม่ถูกจับ"""
+    keys = sorted(MONTH_LOOKUP, key=len, reverse=True)
+    names = "|".join(r"\.?".join(re.escape(ch) for ch in key) + r"\.?" for key in keys)
+    return rf"(?:{names})(?![A-Za-z])"
+
+
+# compile ครั้งเดียวตอน import
+_ISO_RE = re.compile(r'(\d{4})-(\d{1,2})-(\d{1,2})')
+_NUMERIC_RE = re.compile(r'(\d{1,2})[/\-.](\d{1,2})[/\-.](\d{4}|\d{2})\b')
+# '13 ม.ค.', '24 พ.ย. 2568', '13 Jan 26' (ปี 2 หลักต้องไม่ใช่ชั่วโมง เช่น '13 ม.ค. 10:30')
+_DAY_MONTH_RE = re.compile(
+    rf'(?<!\d)(\d{{1,2}})\s*({_month_pattern()})\s*,?\s*(\d{{4}}(?!\d)|\d{{2}}(?![\d:]))?', re.IGNORECASE)
+# แบบเดือนขึ้นก่อน: 'Jan 13, 2026', 'Jan 13'
+_MONTH_DAY_RE = re.compile(
+    rf'({_month_pattern()})\s*(\d{{1,2}})(?![\d:])(?:\s*,?\s*(\d{{4}})(?!\d))?', re.IGNORECASE)
+
+# ตัวอย่างที่ต้องแปลงได้ (python news_dates.py ตรวจทั้งหมด) อ้างอิงวันนี้ = TODAY_FOR_EXAMPLES
+TODAY_FOR_EXAMPLES = date(2026, 1, 20)
+EXAMPLES = {
+    '13 Nov': date(2025, 11, 13),
+    '15 13 Jan': date(2026, 1, 13),
+    '24 พ.ย. 2568': date(2025, 11, 24),
+    '2026-01-22': date(2026, 1, 22),
+    '22/01/2569': date(2026, 1, 22),
+    '10:30 น. 13 ม.ค.': date(2026, 1, 13),
+    '13 ม.ค. 69 10:30 น.': date(2026, 1, 13),
+    '13 ม.ค. 10:30': date(2026, 1, 13),
+    'Jan 13, 2026': date(2026, 1, 13),
+    'Jan 13 2026 10:30': date(2026, 1, 13),
+    'Dec 28': date(2025, 12, 28),
+    'ไม่มีวันที่': UNKNOWN_DATE,
+}
+
+
+def _normalize_year(year):
+    """แปลงปี (พ.ศ./ค.ศ., 2 หรือ 4 หลัก) เป็น ค.ศ."""
+    if year < 100:
+        # ปีย่อ 2 หลัก: 40 ขึ้นไปถือเป็น พ.ศ. 25xx (เช่น 69 = 2569) นอกนั้นเป็น ค.ศ. 20xx
+        year = 2500 + year if year >= 40 else 2000 + year
+    if year > 2400:
+        year -= BUDDHIST_ERA_OFFSET
+    return year
+
+
+def _build_date(year, month, day):
+    try:
+        return date(year, month, day)
+    except ValueError:
+        return UNKNOWN_DATE
+
+
+@lru_cache(maxsize=65536)
+def _parse_cached(text, today_ordinal):
+    today = date.fromordinal(today_ordinal)
+
+    match = _ISO_RE.search(text)
+    if match:
+        year, month, day = (int(g) for g in match.groups())
+        return _build_date(_normalize_year(year), month, day)
+
+    match = _NUMERIC_RE.search(text)
+    if match:
+        day, month, year = (int(g) for g in match.groups())
+        return _build_date(_normalize_year(year), month, day)
+
+    match = _DAY_MONTH_RE.search(text)
+    if match:
+        day, month, year = match.group(1), match.group(2), match.group(3)
+    else:
+        match = _MONTH_DAY_RE.search(text)
+        if not match:
+            return UNKNOWN_DATE
+        month, day, year = match.groups()
+    month = MONTH_LOOKUP[_month_key(month)]
+    day = int(day)
+    if year:
+        return _build_date(_normalize_year(int(year)), month, day)
+    # ไม่มีปี: ใช้ปีปัจจุบัน ถ้าได้วันในอนาคตแปลว่าเป็นข่าวปีที่แล้ว (เช่น '28 ธ.ค.' ที่อ่านในเดือน ม.ค.)
+    parsed = _build_date(today.year, month, day)
+    if parsed and parsed > today + timedelta(days=1):
+        parsed = _build_date(today.year - 1, month, day)
+    return parsed
+
+
+def parse_news_date(date_str, today=None):
+    """
+    แปลงข้อความวันที่ข่าวเป็น date เช่น '13 Nov', '15 13 Jan', '24 พ.ย. 2568', '2026-01-22', '22/01/2569',
+    '10:30 น. 13 ม.ค.', 'Jan 13, 2026' (ดู EXAMPLES)
+    - รองรับเดือนไทยแบบย่อ/เต็ม (มีหรือไม่มีจุด) และเดือนอังกฤษ ไม่สนตัวพิมพ์เล็กใหญ่
+    - ปี พ.ศ. จะถูกแปลงเป็น ค.ศ. อัตโนมัติ
+    - ถ้าแปลงไม่ได้คืน UNKNOWN_DATE (None) แทนการเดาเป็นวันนี้
+    ผลลัพธ์ถูก cache ตามข้อความดิบ จึงเรียกซ้ำกับวันที่เดิมจำนวนมากได้เร็ว
+    """
+    if not date_str:
+        return UNKNOWN_DATE
+    today = today or datetime.now().date()
+    return _parse_cached(str(date_str).strip(), today.toordinal())
+
+
+def feed_entry_date(entry):
+    """
+    คืนวันที่ข่าวของ entry จาก feedparser เป็น date
+    ใช้ published_parsed/updated_parsed (struct_time แบบ UTC) โดยตรง ไม่ต้องผ่าน time.mktime
+    ถ้าไม่มีค่อยลอง parse จากข้อความ published
+    """
+    for key in ("published_parsed", "updated_parsed"):
+        parsed = entry.get(key)
+        if parsed:
+            result = _build_date(parsed.tm_year, parsed.tm_mon, parsed.tm_mday)
+            if result:
+                return result
+    return parse_news_date(entry.get("published") or entry.get("updated"))
+
+
+def to_iso(value):
+    """date -> 'YYYY-MM-DD' (None คงเป็น None)"""
+    return value.isoformat() if value else None
+
+
+if __name__ == "__main__":
+    import sys
+
+    failed = 0
+    for text, expected in EXAMPLES.items():
+        got = parse_news_date(text, today=TODAY_FOR_EXAMPLES)
+        failed += got != expected
+        print(f"{text!r:<24} -> {got}  {'ok' if got == expected else f'ต้องได้ {expected}'}")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,152 @@
+"""
+จับข่าวซ้ำ/เกือบซ้ำข้ามแหล่ง (Kaohoon, SET, Investing, Manager, Gapfocus) ด้วย MinHash + LSH
+
+- signature(): MinHash NUM_PERM ค่า ของ shingle 3 ตัวอักษรของ title + summary (ไม่ต้องตัดคำไทย)
+  สัดส่วนค่าที่ตรงกันของสองลายเซ็น ~ Jaccard ของชุด shingle
+  (ข่าวเดียวกันที่เติมชื่อบริษัท/ชื่อแหล่ง/วรรคตอน ได้ ~0.8 ขึ้นไป ข่าวคนละเรื่อง ~0.1)
+- LSH: แบ่งลายเซ็นเป็น BANDS ช่วง ช่วงละ ROWS ค่า ข่าวหุ้นเดียวกันที่มีช่วงใดตรงกันทั้งช่วงเท่านั้นที่ถูกเทียบกัน
+  (ความคล้าย 0.85 ถูกเทียบแน่นอน ~99%, 0.5 แค่ ~6%) ไม่ต้องเทียบทุกคู่
+- ข่าวเดียวกันต้องคล้ายกันอย่างน้อย SIMILARITY เป็นหุ้นเดียวกัน และวันที่ห่างกันไม่เกิน DATE_WINDOW_DAYS
+  (กันประกาศแบบฟอร์มเดิมที่ออกทุกไตรมาส เช่น "แจ้งมติที่ประชุมคณะกรรมการ" ถูกรวมข้ามไตรมาส)
+
+cluster id คือ key ของข่าวแรกใน cluster (ข่าวต้นฉบับ) ใช้ใน news_index.py, market_summary.py
+และ update_set50_news_daily.py (ตัดข่าวซ้ำก่อน upsert)
+"""
+import re
+import zlib
+import hashlib
+from datetime import date
+
+import numpy as np
+
+NUM_PERM = 128
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SIMILARITY = 0.7
+DATE_WINDOW_DAYS = 3
+SHINGLE_SIZE = 3
+
+# hash แบบ universal (a * x + b) mod p ชุดคงที่ (ลายเซ็นที่เก็บไว้ต้องเทียบกันได้ข้ามรอบ)
+_PRIME = np.uint64((1 << 31) - 1)
+_rng = np.random.default_rng(20260101)
+_A = _rng.integers(1, (1 << 31) - 1, NUM_PERM, dtype=np.uint64)
+_B = _rng.integers(0, (1 << 31) - 1, NUM_PERM, dtype=np.uint64)
+
+_TAG_RE = re.compile(r"<[^>]+>")
+_NOISE_RE = re.compile(r"[\W_]+", re.UNICODE)
+
+
+def normalize_text(text):
+    """ตัด HTML, วรรคตอน, ช่องว่าง และทำเป็นตัวพิมพ์เล็ก (สระ/วรรณยุกต์ไทยไม่ถูกตัด)"""
+    return _NOISE_RE.sub("", _TAG_RE.sub(" ", text or "")).lower()
+
+
+def signature(text):
+    """MinHash (array uint64 ยาว NUM_PERM) ของข้อความ ข้อความว่างได้ None (ไม่ถูกรวมกับข่าวใด)"""
+    text = normalize_text(text)
+    if not text:
+        return None
+    grams = {text[i:i + SHINGLE_SIZE] for i in range(max(1, len(text) - SHINGLE_SIZE + 1))}
+    hashes = np.fromiter((zlib.crc32(g.encode("utf-8")) for g in grams), dtype=np.uint64, count=len(grams))
+    hashes %= _PRIME
+    return ((hashes[:, None] * _A + _B) % _PRIME).min(axis=0)
+
+
+def article_text(article):
+    return f"{article.get('title') or ''} {article.get('summary') or ''}"
+
+
+def similarity(a, b):
+    """ประมาณ Jaccard จากสัดส่วนค่าที่ตรงกัน"""
+    return float(np.mean(a == b))
+
+
+def band_keys(sig, symbol=None):
+    """
+    hash (int64 เก็บลง SQLite ได้) ของแต่ละช่วง ใช้เป็น key ของ bucket
+    รวม symbol เข้าไปใน key ด้วย: ข่าวคนละหุ้นไม่มีทางเป็นข่าวเดียวกัน bucket จึงไม่โตตามข่าวทั้งตลาด
+    (ประกาศแบบฟอร์มเดียวกันของทุกหุ้นไม่กองอยู่ bucket เดียว)
+    """
+    scope = (symbol or "").upper().encode("utf-8")
+    return [int.from_bytes(hashlib.blake2b(bytes([i]) + scope + sig[i * ROWS:(i + 1) * ROWS].tobytes(),
+                                           digest_size=8).digest(), "little", signed=True)
+            for i in range(BANDS)]
+
+
+def _as_date(value):
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(str(value)[:10])
+    except ValueError:
+        return None
+
+
+def same_story(a, b, threshold=SIMILARITY):
+    """
+    a, b: dict ที่มี signature (+ symbol, news_date ถ้ามี)
+    คล้ายกันพอ และ symbol/วันที่ไม่ขัดกัน (ไม่รู้ค่าใดค่าหนึ่ง = ไม่ใช้เงื่อนไขนั้น)
+    """
+    if a["signature"] is None or b["signature"] is None or similarity(a["signature"], b["signature"]) < threshold:
+        return False
+    if a.get("symbol") and b.get("symbol") and a["symbol"].upper() != b["symbol"].upper():
+        return False
+    day_a, day_b = _as_date(a.get("news_date")), _as_date(b.get("news_date"))
+    return day_a is None or day_b is None or abs((day_a - day_b).days) <= DATE_WINDOW_DAYS
+
+
+def best_match(item, candidates, threshold=SIMILARITY):
+    """cluster ของข่าวใน candidates ที่คล้าย item ที่สุดและเข้าเงื่อนไข same_story หรือ None"""
+    best, best_score = None, threshold
+    for other in candidates:
+        if same_story(item, other, threshold):
+            score = similarity(item["signature"], other["signature"])
+            if score >= best_score:
+                best, best_score = other["cluster"], score
+    return best
+
+
+class StoryIndex:
+    """
+    LSH index ในหน่วยความจำ: add() ทีละข่าวแล้วได้ cluster id กลับมา
+    เทียบเฉพาะข่าวใน bucket เดียวกัน (เวลาต่อข่าวแทบคงที่ ไม่โตตามจำนวนข่าวทั้งหมด)
+    """
+
+    def __init__(self, threshold=SIMILARITY):
+        self.threshold = threshold
+        self.buckets = {}
+
+    def add(self, key, article):
+        """เพิ่มข่าว (dict ที่มี title/summary/symbol/news_date) คืน cluster id (key ของข่าวแรกใน cluster)"""
+        item = {"signature": signature(article_text(article)), "symbol": article.get("symbol"),
+                "news_date": article.get("news_date"), "cluster": key}
+        if item["signature"] is None:
+            return key
+        keys = band_keys(item["signature"], item["symbol"])
+        candidates = {id(other): other for band in keys for other in self.buckets.get(band, ())}
+        found = best_match(item, candidates.values(), self.threshold)
+        if found is not None:
+            item["cluster"] = found
+        for band in keys:
+            self.buckets.setdefault(band, []).append(item)
+        return item["cluster"]
+
+
+def cluster_ids(articles):
+    """cluster id (ลำดับของข่าวต้นฉบับใน list) ของแต่ละข่าว"""
+    index = StoryIndex()
+    return [index.add(i, article) for i, article in enumerate(articles)]
+
+
+def unique(articles):
+    """เก็บเฉพาะข่าวแรกของแต่ละ cluster (ลำดับเดิม)"""
+    return [article for i, (article, cluster) in enumerate(zip(articles, cluster_ids(articles))) if cluster == i]
+
+
+def count_stories(articles):
+    """จำนวน cluster (ข่าวที่ไม่ซ้ำกัน) ต่อ symbol"""
+    counts = {}
+    for i, (article, cluster) in enumerate(zip(articles, cluster_ids(articles))):
+        if cluster == i:
+            counts[article.get("symbol")] = counts.get(article.get("symbol"), 0) + 1
+    return counts
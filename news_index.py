@@ -0,0 +1,357 @@
+"""
+ดัชนีค้นหาข่าวแบบ local (SQLite FTS5) รวมข่าวจาก stock_news, news_set และ excel_stock_news
+
+- articles: 1 แถวต่อข่าว (key = url หรือ hash ของ symbol + วันที่ + หัวข้อ) มี index (symbol, news_date)
+- articles_fts: full-text index ของ title + summary ด้วย tokenizer trigram
+  ภาษาไทยไม่มีช่องว่างระหว่างคำ trigram จึงค้นคำกลางประโยคได้โดยไม่ต้องตัดคำ (ใช้ได้ทั้งไทยและอังกฤษ)
+  คำค้นที่สั้นกว่า 3 ตัวอักษรใช้ LIKE บนตารางหลักแทน
+- sync() ดึงเฉพาะแถวใหม่จากแต่ละตาราง (ตาม cursor ที่จำไว้ใน sync_state) แล้ว upsert เข้า index
+  cursor แบบวันที่ย้อน RESYNC_DAYS และดึงแถวที่ cursor เป็น NULL ซ้ำทุกรอบ / cursor แบบ id ดึงเฉพาะ id ที่ใหม่กว่า
+- ข่าวใหม่ทุกข่าวได้ cluster_id (id ของข่าวต้นฉบับ) จาก MinHash + LSH ใน news_dedup.py
+  bucket ของ LSH อยู่ในตาราง article_bands จึงหาข่าวที่อาจซ้ำได้ด้วย index ไม่ต้องเทียบทุกข่าว
+  search() รวมข่าวเดียวกันจากหลายแหล่งเป็นแถวเดียว (copies = จำนวนแหล่ง)
+
+dashboard (หน้า "ข่าว") ให้ SyncWorker sync ต่อจากไฟล์ index เดิม (เช่นของ orchestrator) เป็นเบื้องหลัง
+ทุก NEWS_SYNC_TTL วินาที request ของผู้ใช้แค่เปิดแบบอ่านอย่างเดียว ค้นได้ในระดับมิลลิวินาทีโดยไม่ยิง ilike ไป Supabase
+
+    python news_index.py                     # sync แบบ incremental
+    python news_index.py --rebuild           # ล้างแล้วดึงใหม่ทั้งหมด
+    python news_index.py --symbol TEAMG --query "ปันผล"
+"""
+import os
+import time
+import hashlib
+import sqlite3
+import argparse
+import threading
+
+import numpy as np
+from dotenv import load_dotenv
+
+import news_dedup
+from news_dates import parse_news_date, to_iso
+
+load_dotenv()
+
+INDEX_PATH = os.environ.get("TEAMG_NEWS_INDEX", "news_index.db")
+
+# trigram ต้องการคำค้นอย่างน้อย 3 ตัวอักษร
+MIN_MATCH_CHARS = 3
+
+# sync ย้อน cursor เท่านี้วัน เผื่อข่าวที่ถูกเขียนทีหลังแต่มีวันที่ย้อนหลัง (upsert ซ้ำได้ ไม่เกิดแถวซ้ำ)
+RESYNC_DAYS = 3
+
+# ตารางต้นทาง: คอลัมน์ใน Supabase -> คอลัมน์ใน index และคอลัมน์ที่ใช้เป็น cursor
+# cursor_kind: "date" (ค่าเริ่มต้น ย้อน RESYNC_DAYS) หรือ "id" (ตารางที่ insert อย่างเดียว ดึงเฉพาะ id ใหม่)
+SOURCES = {
+    "stock_news": {
+        "columns": {"symbol": "symbol", "news_date": "news_date", "title": "title", "summary": "summary",
+                    "source": "source", "url": "url"},
+        "cursor": "news_date",
+    },
+    "news_set": {
+        "columns": {"symbol": "symbol", "date_time": "news_date", "title": "title", "source": "source", "url": "url"},
+        "cursor": "scraped_at",
+    },
+    "excel_stock_news": {
+        "columns": {"stock_symbol": "symbol", "headline": "title", "source": "source", "link": "url"},
+        "cursor": "id",
+        "cursor_kind": "id",
+    },
+}
+
+FIELDS = ["symbol", "news_date", "title", "summary", "source", "url"]
+
+SCHEMA = """
+create table if not exists articles (
+    id integer primary key,
+    doc_key text not null unique,
+    origin text,
+    symbol text,
+    news_date text,
+    title text,
+    summary text,
+    source text,
+    url text,
+    signature blob,
+    cluster_id integer
+);
+create index if not exists articles_symbol_date on articles (symbol, news_date desc);
+create index if not exists articles_date on articles (news_date desc);
+create virtual table if not exists articles_fts using fts5(
+    title, summary, content='articles', content_rowid='id', tokenize='trigram'
+);
+create trigger if not exists articles_ai after insert on articles begin
+    insert into articles_fts (rowid, title, summary) values (new.id, new.title, new.summary);
+end;
+create trigger if not exists articles_ad after delete on articles begin
+    insert into articles_fts (articles_fts, rowid, title, summary) values ('delete', old.id, old.title, old.summary);
+end;
+create trigger if not exists articles_au after update on articles begin
+    insert into articles_fts (articles_fts, rowid, title, summary) values ('delete', old.id, old.title, old.summary);
+    insert into articles_fts (rowid, title, summary) values (new.id, new.title, new.summary);
+end;
+create table if not exists sync_state (origin text primary key, cursor text);
+create table if not exists article_bands (value integer, id integer);
+create index if not exists article_bands_value on article_bands (value);
+"""
+
+# คอลัมน์ที่เพิ่มทีหลัง (index ที่สร้างก่อนหน้านี้ได้คอลัมน์ครบด้วย alter table)
+ADDED_COLUMNS = {"signature": "blob", "cluster_id": "integer"}
+
+_write_lock = threading.Lock()
+
+
+def connect(path=INDEX_PATH, readonly=False):
+    """เปิด index (สร้าง schema ให้ถ้ายังไม่มี) readonly=True สำหรับ dashboard"""
+    if readonly:
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+    else:
+        conn = sqlite3.connect(path, check_same_thread=False)
+        conn.execute("pragma journal_mode=wal")
+        conn.executescript(SCHEMA)
+        existing = {row[1] for row in conn.execute("pragma table_info(articles)")}
+        for column, kind in ADDED_COLUMNS.items():
+            if column not in existing:
+                conn.execute(f"alter table articles add column {column} {kind}")
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def doc_key(article):
+    """url ถ้ามี ไม่งั้น hash ของ symbol + วันที่ + หัวข้อ (ข่าวเดียวกันจากหลายตารางรวมเป็นแถวเดียวเมื่อ url ตรงกัน)"""
+    if article.get("url"):
+        return article["url"]
+    text = "|".join(str(article.get(k) or "") for k in ("symbol", "news_date", "title"))
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def normalize(row, origin):
+    """แถวจากตารางต้นทาง -> แถวของ articles (วันที่เป็น YYYY-MM-DD, symbol ตัวพิมพ์ใหญ่)"""
+    article = {field: None for field in FIELDS}
+    for column, field in SOURCES[origin]["columns"].items():
+        value = row.get(column)
+        article[field] = value.strip() if isinstance(value, str) else value
+    if article["news_date"]:
+        raw = str(article["news_date"])
+        article["news_date"] = raw[:10] if raw[:4].isdigit() and raw[4:5] == "-" else to_iso(parse_news_date(raw))
+    if article["symbol"]:
+        article["symbol"] = str(article["symbol"]).upper()
+    return article
+
+
+def add_articles(conn, articles, origin):
+    """
+    upsert ข่าว (normalize แล้ว) เข้า index (trigger อัพเดต FTS ให้) แล้วจัด cluster ให้ข่าวที่ยังไม่มีลายเซ็น
+    ข่าวเดิมที่หัวข้อ/สรุปเปลี่ยนถูกล้างลายเซ็นให้จัด cluster ใหม่ คืนจำนวนแถว
+    """
+    rows = [(doc_key(a), origin, *(a[field] for field in FIELDS)) for a in articles if a.get("title")]
+    text_changed = " or ".join(f"coalesce(excluded.{f}, {f}) is not {f}" for f in ("title", "summary"))
+    with _write_lock, conn:
+        conn.executemany(
+            f"""insert into articles (doc_key, origin, {', '.join(FIELDS)}) values (?, ?, {', '.join('?' * len(FIELDS))})
+                on conflict (doc_key) do update set {', '.join(f'{f} = coalesce(excluded.{f}, {f})' for f in FIELDS)},
+                    signature = case when {text_changed} then null else signature end
+                where {' or '.join(f'excluded.{f} is not {f}' for f in FIELDS)}""",
+            rows)
+        assign_clusters(conn)
+    return len(rows)
+
+
+def _load_signature(blob):
+    return np.frombuffer(blob, dtype="<u4").astype(np.uint64)
+
+
+def assign_clusters(conn):
+    """
+    ข่าวที่ signature ยังว่าง: คำนวณ MinHash หา candidate จาก article_bands (bucket เดียวกัน
+    หุ้นเดียวกัน วันที่ห่างไม่เกิน DATE_WINDOW_DAYS)
+    เจอข่าวเดียวกัน -> ใช้ cluster_id ของข่าวนั้น ไม่เจอ -> เป็นต้นฉบับของ cluster ใหม่ (cluster_id = id ตัวเอง)
+    เรียกภายใน transaction ของผู้เรียก คืนจำนวนข่าวที่จัดรอบนี้
+    """
+    pending = conn.execute(
+        "select id, symbol, news_date, title, summary from articles where signature is null order by id").fetchall()
+    for row in pending:
+        sig = news_dedup.signature(news_dedup.article_text(dict(row)))
+        item = {"signature": sig, "symbol": row["symbol"], "news_date": row["news_date"], "cluster": row["id"]}
+        conn.execute("delete from article_bands where id = ?", (row["id"],))
+        if sig is None:
+            conn.execute("update articles set signature = x'', cluster_id = id where id = ?", (row["id"],))
+            continue
+        keys = news_dedup.band_keys(sig, row["symbol"])
+        candidates = [
+            {"signature": _load_signature(other["signature"]), "symbol": other["symbol"],
+             "news_date": other["news_date"], "cluster": other["cluster_id"]}
+            for other in conn.execute(
+                f"""select distinct a.signature, a.symbol, a.news_date, a.cluster_id from article_bands b
+                    join articles a on a.id = b.id
+                    where b.value in ({', '.join('?' * len(keys))}) and a.id != ?
+                      and (? is null or a.news_date is null
+                           or a.news_date between date(?, '-{news_dedup.DATE_WINDOW_DAYS} days')
+                                              and date(?, '+{news_dedup.DATE_WINDOW_DAYS} days'))""",
+                keys + [row["id"]] + [row["news_date"]] * 3)]
+        cluster = news_dedup.best_match(item, candidates)
+        conn.execute("update articles set signature = ?, cluster_id = ? where id = ?",
+                     (sig.astype("<u4").tobytes(), row["id"] if cluster is None else cluster, row["id"]))
+        conn.executemany("insert into article_bands values (?, ?)", [(value, row["id"]) for value in keys])
+    return len(pending)
+
+
+def _get_cursor(conn, origin):
+    row = conn.execute("select cursor from sync_state where origin = ?", (origin,)).fetchone()
+    return row["cursor"] if row else None
+
+
+def sync(client=None, path=INDEX_PATH, origins=None):
+    """ดึงข่าวใหม่จากแต่ละตารางเข้า index คืน {ตาราง: จำนวนแถวที่ดึงมา}"""
+    from datetime import date, timedelta
+    from storage import fetch_all
+
+    if client is None:
+        from clients import supabase as client
+
+    conn = connect(path)
+    counts = {}
+    try:
+        for origin in origins or SOURCES:
+            config = SOURCES[origin]
+            cursor_column = config["cursor"]
+            by_id = config.get("cursor_kind") == "id"
+            last = _get_cursor(conn, origin)
+            columns = list(config["columns"])
+            if cursor_column and cursor_column not in columns:
+                columns.append(cursor_column)
+
+            def build_query():
+                query = client.table(origin).select(", ".join(columns))
+                if cursor_column and last and by_id:
+                    query = query.gt(cursor_column, int(last))
+                elif cursor_column and last:
+                    since = date.fromisoformat(last[:10]) - timedelta(days=RESYNC_DAYS)
+                    query = query.gte(cursor_column, since.isoformat())
+                return query.order(cursor_column or columns[0])
+
+            def build_undated_query():
+                # แถวที่ cursor เป็น NULL (เช่น ข่าว Gapfocus ที่ไม่รู้วันที่) ไม่ผ่านเงื่อนไข gte จึงดึงแยกทุกรอบ
+                return client.table(origin).select(", ".join(columns)).is_(cursor_column, "null").order(columns[0])
+
+            try:
+                rows = fetch_all(build_query)
+                if cursor_column and last and not by_id:
+                    rows += fetch_all(build_undated_query)
+            except Exception as e:
+                print(f"ดึง {origin} ไม่สำเร็จ: {e}")
+                continue
+            counts[origin] = add_articles(conn, (normalize(row, origin) for row in rows), origin)
+            cursors = [row[cursor_column] for row in rows if cursor_column and row.get(cursor_column) is not None]
+            if cursors:
+                newest = max(int(c) for c in cursors + ([last] if last else [])) if by_id else \
+                    max([str(c) for c in cursors] + ([last] if last else []))
+                with _write_lock, conn:
+                    conn.execute("insert into sync_state values (?, ?) on conflict (origin) do update set cursor = excluded.cursor",
+                                 (origin, str(newest)))
+            print(f"index ข่าว {origin}: {counts[origin]} แถว")
+    finally:
+        conn.close()
+    return counts
+
+
+class SyncWorker:
+    """sync index เป็นเบื้องหลังทุก interval วินาที (thread แบบ daemon ตัวเดียว) version = เวลาที่ sync เสร็จล่าสุด"""
+
+    def __init__(self, client=None, path=INDEX_PATH, interval=600):
+        self.client = client
+        self.path = path
+        self.interval = interval
+        self.version = None
+        self.last_error = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                sync(self.client, self.path)
+                self.version = time.time()
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"[news_index] sync ไม่สำเร็จ: {e}")
+            self._stop.wait(self.interval)
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="news-index-sync", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+
+def _match_expression(terms):
+    # ครอบคำค้นด้วย "..." ให้ FTS5 มองเป็นข้อความธรรมดา (ไม่ตีความ AND/OR/NEAR/*)
+    return " ".join('"' + term.replace('"', '""') + '"' for term in terms)
+
+
+def search(conn, query="", symbol=None, since=None, limit=50, collapse=True):
+    """
+    ข่าวล่าสุด (ใหม่ก่อน) ที่มีทุกคำใน query (คั่นด้วยช่องว่าง) กรองตาม symbol / วันที่ได้
+    query ว่าง = ข่าวล่าสุดของ symbol
+    collapse: ข่าวเดียวกันหลายแหล่งเหลือแถวเดียว (ข่าวที่เข้ามาก่อน) พร้อม copies = จำนวนแหล่งที่ตรงเงื่อนไข
+    """
+    terms = query.split()
+    long_terms = [t for t in terms if len(t) >= MIN_MATCH_CHARS]
+    where, params = [], []
+    if long_terms:
+        where.append("a.id in (select rowid from articles_fts where articles_fts match ?)")
+        params.append(_match_expression(long_terms))
+    for term in terms:
+        if len(term) < MIN_MATCH_CHARS:
+            where.append("(a.title like ? or a.summary like ?)")
+            params += [f"%{term}%"] * 2
+    if symbol:
+        where.append("a.symbol = ?")
+        params.append(symbol.upper())
+    if since:
+        where.append("a.news_date >= ?")
+        params.append(str(since))
+    columns = "a.id, a.symbol, a.news_date, a.title, a.summary, a.source, a.url, a.origin, a.cluster_id"
+    filtered = f"select {columns} from articles a {'where ' + ' and '.join(where) if where else ''}"
+    if collapse:
+        filtered = (f"select * from (select *, count(*) over cluster as copies, "
+                    f"row_number() over (partition by coalesce(cluster_id, id) order by id) as rank "
+                    f"from ({filtered}) window cluster as (partition by coalesce(cluster_id, id))) where rank = 1")
+    sql = f"select * from ({filtered}) order by news_date desc nulls last, id desc limit ?"
+    return [dict(row) for row in conn.execute(sql, params + [limit])]
+
+
+def symbols(conn):
+    """symbol ที่มีข่าวใน index พร้อมจำนวนข่าวที่ไม่ซ้ำกัน (นับ cluster, มากไปน้อย)"""
+    return [(row["symbol"], row["n"]) for row in conn.execute(
+        "select symbol, count(distinct coalesce(cluster_id, id)) as n from articles "
+        "where symbol is not null group by symbol order by n desc")]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ดัชนีค้นหาข่าวแบบ local (SQLite FTS5)")
+    parser.add_argument("--rebuild", action="store_true", help="ลบ index เดิมแล้วดึงใหม่ทั้งหมด")
+    parser.add_argument("--symbol", help="ค้นเฉพาะหุ้นนี้ (ไม่ sync)")
+    parser.add_argument("--query", help="คำค้น (ไม่ sync)")
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    if args.symbol or args.query:
+        conn = connect()
+        started = time.perf_counter()
+        results = search(conn, args.query or "", args.symbol, limit=args.limit)
+        print(f"{len(results)} ข่าว ({(time.perf_counter() - started) * 1000:.1f} ms)")
+        for row in results:
+            print(f"{row['news_date'] or '-':<10} {row['symbol'] or '-':<8} {row['title']}")
+    else:
+        if args.rebuild:
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(INDEX_PATH + suffix):
+                    os.remove(INDEX_PATH + suffix)
+        sync()
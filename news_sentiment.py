@@ -0,0 +1,280 @@
+"""
+คะแนน sentiment ของข่าว (ไทย/อังกฤษ) แบบ offline จาก lexicon ไม่ต้องต่อเน็ตหรือโหลดโมเดล
+
+- score_text(): หาคำ/วลีใน LEXICON ด้วย regex ตัวเดียว (วลียาวก่อน เช่น "ขาดทุนลดลง" ก่อน "ขาดทุน")
+  ภาษาไทยไม่มีช่องว่างระหว่างคำจึงจับแบบ substring ส่วนคำอังกฤษต้องไม่ติดตัวอักษรอื่น ("gain" ไม่ใช่ "again")
+  มีคำปฏิเสธ (NEGATORS) นำหน้าติดกันกลับเครื่องหมาย ผลรวมน้ำหนักบีบเป็น -1..1 แบบ compound ของ VADER
+- score_pending(): ข่าวใน news_index.db ที่ยังไม่มีคะแนน ทีละ BATCH_SIZE ข่าว
+  cache คะแนนตาม hash ของข้อความ + LEXICON_VERSION ในตาราง sentiment_scores (ข่าวเดียวกันหลายแหล่ง/รันซ้ำไม่ให้คะแนนซ้ำ)
+  หัวข้อ/สรุปของข่าวเปลี่ยน -> trigger ลบการจับคู่ข่าวกับคะแนน ข่าวนั้นจึงถูกให้คะแนนใหม่ในรอบถัดไป
+- daily_sentiment(): คะแนนเฉลี่ยรายวันต่อหุ้น นับข่าวเดียวกันจากหลายแหล่ง (cluster ของ news_dedup.py) ครั้งเดียว
+  -> ตาราง news_sentiment
+- join_master(): ข่าววันที่ตลาดปิดนับรวมกับวันซื้อขายถัดไป แล้วเติมคอลัมน์ news_sentiment / news_stories
+  ของแถวที่มีอยู่แล้วใน teamg_master_analysis (เขียนเฉพาะแถวที่ค่าเปลี่ยน)
+
+ต้องสร้างตาราง/คอลัมน์ใน Supabase ก่อนใช้:
+    create table if not exists news_sentiment (
+        symbol text, date date, sentiment double precision, stories integer, scored integer,
+        primary key (symbol, date));
+    alter table teamg_master_analysis
+        add column if not exists news_sentiment double precision,
+        add column if not exists news_stories integer;
+
+    python news_sentiment.py                       # ให้คะแนนข่าวใหม่ + อัพเดตตาราง (ย้อนหลัง LOOKBACK_DAYS วัน)
+    python news_sentiment.py --since 2020-01-01    # เติมย้อนหลัง
+    python news_sentiment.py --text "TEAMG กำไรพุ่ง 30%"
+"""
+import re
+import math
+import time
+import hashlib
+import argparse
+from datetime import date, timedelta
+
+from dotenv import load_dotenv
+
+import news_index
+
+load_dotenv()
+
+# เปลี่ยน lexicon แล้วเพิ่มเลขนี้ ข่าวทั้งหมดจะถูกให้คะแนนใหม่ (hash ไม่ตรงกับ cache เดิม)
+LEXICON_VERSION = 1
+
+# คำ/วลี -> น้ำหนัก (บวก = ข่าวดี) คำอังกฤษเขียนตัวพิมพ์เล็ก
+LEXICON = {
+    # ไทย บวก
+    "กำไรเพิ่ม": 1.0, "กำไรโต": 1.0, "กำไรพุ่ง": 1.5, "กำไรสุทธิเพิ่ม": 1.0, "พลิกกำไร": 1.5,
+    "ขาดทุนลดลง": 0.5, "รายได้เพิ่ม": 1.0, "ยอดขายเพิ่ม": 1.0, "รายได้โต": 1.0, "ยอดขายโต": 1.0,
+    "เติบโต": 1.0, "ขยายตัว": 0.5, "ฟื้นตัว": 1.0, "แข็งแกร่ง": 1.0, "ดีกว่าคาด": 1.5, "สูงกว่าคาด": 1.0,
+    "เกินคาด": 1.0, "นิวไฮ": 1.0, "สูงสุดเป็นประวัติการณ์": 1.0, "พุ่ง": 1.0, "ทะยาน": 1.0, "บวก": 0.5,
+    "จ่ายปันผล": 1.0, "ปันผลสูง": 1.0, "ได้งาน": 1.0, "งานใหม่": 1.0, "ชนะประมูล": 1.5, "คว้างาน": 1.5,
+    "เซ็นสัญญา": 0.5, "สัญญาใหม่": 1.0, "ซื้อหุ้นคืน": 1.0, "แนะนำซื้อ": 1.5, "ปรับเพิ่มเป้า": 1.5,
+    "อัพเกรด": 1.0, "ได้รับอนุมัติ": 0.5, "ขยายธุรกิจ": 0.5, "ขยายกิจการ": 0.5, "ร่วมทุน": 0.5,
+    "ลดหนี้": 0.5, "หนุน": 0.5, "เพิ่มขึ้น": 0.5,
+    # ไทย ลบ
+    "ขาดทุน": -1.5, "ขาดทุนสุทธิ": -1.5, "กำไรลด": -1.0, "กำไรหด": -1.0, "กำไรร่วง": -1.5, "รายได้ลด": -1.0,
+    "ยอดขายลด": -1.0, "ร่วง": -1.0, "ดิ่ง": -1.0, "ทรุด": -1.0, "หดตัว": -1.0, "ชะลอตัว": -0.5,
+    "ต่ำกว่าคาด": -1.5, "แย่กว่าคาด": -1.5, "ผิดนัดชำระ": -2.0, "ผิดนัด": -1.5, "ถูกฟ้อง": -1.0,
+    "ฟ้องร้อง": -1.0, "ปรับลดเป้า": -1.5, "ลดเป้า": -1.0, "แนะนำขาย": -1.5, "ดาวน์เกรด": -1.0,
+    "ขึ้นเครื่องหมาย": -1.0, "ห้ามซื้อขาย": -1.5, "ขาดสภาพคล่อง": -1.5, "ล้มละลาย": -2.0,
+    "ฟื้นฟูกิจการ": -1.5, "ทุจริต": -2.0, "สอบสวน": -1.0, "งดจ่ายปันผล": -1.5, "งดปันผล": -1.5,
+    "หนี้เสีย": -1.0, "กดดัน": -0.5, "ลาออก": -0.5, "เพิ่มทุน": -0.5, "ปิดโรงงาน": -1.0, "ลดลง": -0.5,
+    # อังกฤษ บวก
+    "profit rises": 1.0, "profit up": 1.0, "record profit": 1.5, "beat": 1.0, "beats": 1.0, "surge": 1.0,
+    "surges": 1.0, "soar": 1.0, "soars": 1.0, "jump": 1.0, "jumps": 1.0, "rally": 1.0, "rebound": 1.0,
+    "growth": 0.5, "expand": 0.5, "expansion": 0.5, "upgrade": 1.0, "upgraded": 1.0, "outperform": 1.0,
+    "buy rating": 1.5, "raises target": 1.5, "dividend": 0.5, "buyback": 1.0, "wins contract": 1.5,
+    "strong": 0.5, "record high": 1.0, "gain": 0.5, "gains": 0.5, "approval": 0.5, "approved": 0.5,
+    # อังกฤษ ลบ
+    "loss": -1.0, "losses": -1.0, "net loss": -1.5, "profit falls": -1.0, "profit down": -1.0,
+    "miss": -1.0, "misses": -1.0, "plunge": -1.5, "plunges": -1.5, "slump": -1.0, "slumps": -1.0,
+    "drop": -1.0, "drops": -1.0, "fall": -0.5, "falls": -0.5, "decline": -0.5, "declines": -0.5,
+    "downgrade": -1.0, "downgraded": -1.0, "underperform": -1.0, "sell rating": -1.5, "cuts target": -1.5,
+    "default": -2.0, "lawsuit": -1.0, "fraud": -2.0, "investigation": -1.0, "bankruptcy": -2.0,
+    "delisted": -1.5, "weak": -0.5, "warning": -0.5, "suspended": -1.0,
+}
+
+# คำปฏิเสธที่อยู่ติดหน้าคำใน LEXICON กลับเครื่องหมาย ("ไม่ขาดทุน", "not weak")
+NEGATORS = ["ไม่ได้", "ไม่", "not ", "no ", "never "]
+
+# ค่าคงที่ของ compound score: score = s / sqrt(s² + ALPHA)
+ALPHA = 4.0
+
+BATCH_SIZE = 1000
+
+# ช่วงย้อนหลังที่คำนวณ/เขียนตารางรายวันทุกรอบ (ข่าวย้อนหลังที่เข้ามาทีหลังจะถูกนับ)
+LOOKBACK_DAYS = 30
+
+DAILY_TABLE = "news_sentiment"
+MASTER_TABLE = "teamg_master_analysis"
+
+# หุ้นใน teamg_master_analysis (ชื่อแบบ Yahoo เหมือน teamg_data_pipeline.py)
+MASTER_SYMBOLS = ["TEAMG.BK"]
+
+SCHEMA = """
+create table if not exists sentiment_scores (text_hash text primary key, score real, hits integer);
+create table if not exists article_sentiment (id integer primary key, text_hash text);
+create trigger if not exists article_sentiment_au after update of title, summary on articles
+when old.title is not new.title or old.summary is not new.summary begin
+    delete from article_sentiment where id = old.id;
+end;
+create trigger if not exists article_sentiment_ad after delete on articles begin
+    delete from article_sentiment where id = old.id;
+end;
+"""
+
+_TAG_RE = re.compile(r"<[^>]+>")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def _term_pattern(term):
+    escaped = re.escape(term)
+    return rf"(?<![a-z]){escaped}(?![a-z])" if term.isascii() else escaped
+
+
+_TERM_RE = re.compile(
+    f"(?P<neg>{'|'.join(map(re.escape, NEGATORS))})?"
+    f"(?P<term>{'|'.join(_term_pattern(t) for t in sorted(LEXICON, key=len, reverse=True))})")
+
+
+def normalize_text(text):
+    return _SPACE_RE.sub(" ", _TAG_RE.sub(" ", text or "")).lower()
+
+
+def score_text(text):
+    """(คะแนน -1..1, จำนวนคำที่เจอ) ไม่เจอคำใดเลยได้ (0.0, 0)"""
+    total, hits = 0.0, 0
+    for match in _TERM_RE.finditer(normalize_text(text)):
+        weight = LEXICON[match.group("term")]
+        total += -weight if match.group("neg") else weight
+        hits += 1
+    return (total / math.sqrt(total * total + ALPHA) if hits else 0.0), hits
+
+
+def score_batch(texts):
+    return [score_text(text) for text in texts]
+
+
+def text_hash(title, summary):
+    """key ของ cache: ข้อความเดียวกัน (ทุกแหล่ง) + lexicon รุ่นเดียวกัน ได้ hash เดียวกัน"""
+    text = f"{LEXICON_VERSION}\x00{title or ''}\x00{summary or ''}"
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def connect(path=news_index.INDEX_PATH):
+    conn = news_index.connect(path)
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def score_pending(conn, batch_size=BATCH_SIZE):
+    """ให้คะแนนข่าวใน index ที่ยังไม่มีคะแนน คืน (จำนวนข่าว, จำนวนข้อความที่ให้คะแนนจริง ไม่นับที่เจอใน cache)"""
+    articles = scored = 0
+    while True:
+        rows = conn.execute(
+            """select a.id, a.title, a.summary from articles a
+               where not exists (select 1 from article_sentiment s where s.id = a.id)
+               order by a.id limit ?""", (batch_size,)).fetchall()
+        if not rows:
+            return articles, scored
+        hashes = [text_hash(row["title"], row["summary"]) for row in rows]
+        cached = {row[0] for row in conn.execute(
+            f"select text_hash from sentiment_scores where text_hash in ({', '.join('?' * len(hashes))})", hashes)}
+        pending = {}
+        for row, key in zip(rows, hashes):
+            if key not in cached:
+                pending.setdefault(key, f"{row['title'] or ''} {row['summary'] or ''}")
+        results = score_batch(list(pending.values()))
+        with conn:
+            conn.executemany("insert or replace into sentiment_scores values (?, ?, ?)",
+                             [(key, score, hits) for key, (score, hits) in zip(pending, results)])
+            conn.executemany("insert or replace into article_sentiment values (?, ?)",
+                             [(row["id"], key) for row, key in zip(rows, hashes)])
+        articles += len(rows)
+        scored += len(pending)
+
+
+def daily_sentiment(conn, since=None):
+    """
+    แถวละ (symbol, date): sentiment = คะแนนเฉลี่ยของข่าวที่เจอคำใน lexicon (ไม่มีเลยเป็น None)
+    stories = จำนวนข่าว (ข่าวเดียวกันหลายแหล่งนับครั้งเดียว ใช้วันที่ของข่าวแรก), scored = ข่าวที่มีคะแนน
+    """
+    rows = conn.execute(
+        """with stories as (
+               select a.symbol, min(a.news_date) as news_date, avg(s.score) as score, max(s.hits) as hits
+               from articles a
+               join article_sentiment m on m.id = a.id
+               join sentiment_scores s on s.text_hash = m.text_hash
+               where a.symbol is not null and a.news_date is not null
+               group by a.symbol, coalesce(a.cluster_id, a.id))
+           select symbol, news_date, avg(case when hits > 0 then score end) as sentiment,
+                  count(*) as stories, sum(hits > 0) as scored
+           from stories where ? is null or news_date >= ?
+           group by symbol, news_date order by symbol, news_date""",
+        (since, since)).fetchall()
+    return [{"symbol": row["symbol"], "date": row["news_date"],
+             "sentiment": None if row["sentiment"] is None else round(row["sentiment"], 4),
+             "stories": row["stories"], "scored": row["scored"]} for row in rows]
+
+
+def master_rows(daily, dates, symbol):
+    """
+    คอลัมน์ news_sentiment / news_stories ของแถว (symbol, date) ใน teamg_master_analysis
+    ข่าวแต่ละวันนับรวมกับวันซื้อขายแรกที่ >= วันที่ข่าว (ข่าวเสาร์-อาทิตย์ไปอยู่วันจันทร์)
+    sentiment ถ่วงด้วยจำนวนข่าวที่มีคะแนน ข่าวหลังวันซื้อขายล่าสุดรอรอบถัดไป
+    """
+    import pandas as pd
+
+    if not dates:
+        return []
+    trading = pd.DataFrame({"trading_date": pd.to_datetime(sorted(dates))})
+    news = pd.DataFrame(daily, columns=["date", "sentiment", "stories", "scored"])
+    news["date"] = pd.to_datetime(news["date"])
+    news = pd.merge_asof(news.sort_values("date"), trading, left_on="date", right_on="trading_date",
+                         direction="forward").dropna(subset=["trading_date"])
+    news["weighted"] = news["sentiment"].fillna(0) * news["scored"]
+    totals = news.groupby("trading_date")[["weighted", "stories", "scored"]].sum()
+
+    rows = []
+    for day in trading["trading_date"]:
+        weighted, stories, scored = totals.loc[day] if day in totals.index else (0.0, 0, 0)
+        rows.append({"symbol": symbol, "date": day.strftime("%Y-%m-%d"),
+                     "news_sentiment": round(weighted / scored, 4) if scored else None,
+                     "news_stories": int(stories)})
+    return rows
+
+
+def join_master(client, daily, since=None, symbols=None):
+    """เติมคอลัมน์ข่าวของแถวที่มีอยู่แล้วใน teamg_master_analysis (ไม่สร้างแถวใหม่) คืนจำนวนแถวที่เขียน"""
+    import factors
+    from storage import fetch_all, write_batches
+
+    written = 0
+    for symbol in symbols or MASTER_SYMBOLS:
+        def build_query():
+            query = client.table(MASTER_TABLE).select("symbol, date, news_sentiment, news_stories").eq("symbol", symbol)
+            return (query.gte("date", since) if since else query).order("date")
+
+        existing = fetch_all(build_query)
+        plain = symbol.split(".")[0]
+        rows = master_rows([row for row in daily if row["symbol"] == plain], [row["date"] for row in existing], symbol)
+        changed = factors.changed_rows(rows, existing)
+        written += write_batches(client, MASTER_TABLE, changed, on_conflict="symbol, date")
+    return written
+
+
+def update_sentiment(client=None, path=news_index.INDEX_PATH, since=None):
+    """ให้คะแนนข่าวใหม่ใน index แล้วเขียน news_sentiment รายวันและคอลัมน์ข่าวใน teamg_master_analysis"""
+    from storage import write_batches
+
+    if client is None:
+        from clients import supabase as client
+    since = since or (date.today() - timedelta(days=LOOKBACK_DAYS)).isoformat()
+
+    conn = connect(path)
+    try:
+        started = time.perf_counter()
+        articles, scored = score_pending(conn)
+        seconds = time.perf_counter() - started
+        print(f"ข่าวใหม่ใน index {articles} ข่าว ให้คะแนนจริง {scored} ข้อความ (ที่เหลือใช้ cache) {seconds:.2f} s")
+        daily = daily_sentiment(conn, since)
+    finally:
+        conn.close()
+
+    write_batches(client, DAILY_TABLE, daily, on_conflict="symbol, date")
+    written = join_master(client, daily, since)
+    print(f"✅ {DAILY_TABLE} {len(daily)} แถว, {MASTER_TABLE} เปลี่ยน {written} แถว (ตั้งแต่ {since})")
+    return len(daily)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ให้คะแนน sentiment ข่าวแบบ offline แล้วรวมเป็นรายวันต่อหุ้น")
+    parser.add_argument("--since", help=f"วันเริ่ม YYYY-MM-DD (default ย้อนหลัง {LOOKBACK_DAYS} วัน)")
+    parser.add_argument("--text", help="ให้คะแนนข้อความนี้อย่างเดียว (ไม่แตะ index/ตาราง)")
+    args = parser.parse_args()
+
+    if args.text:
+        score, hits = score_text(args.text)
+        print(f"{score:+.3f} ({hits} คำ)")
+    else:
+        update_sentiment(since=args.since)
@@ -0,0 +1,94 @@
+"""
+ลดจำนวนแท่งที่ส่งไปกราฟตามช่วงที่มองเห็น
+
+- build_pyramid(df) : สร้าง OHLCV รายวัน / รายสัปดาห์ / รายเดือน ครั้งเดียวต่อชุดข้อมูล
+- choose_level()    : เลือกระดับที่ละเอียดที่สุดที่จำนวนแท่งในช่วงที่ดูไม่เกิน MAX_CANDLES
+- lttb()            : Largest-Triangle-Three-Buckets สำหรับกราฟเส้น (คงรูปทรงและจุดเด่นของกราฟไว้ ไม่ใช่แค่สุ่มทุก n จุด)
+
+ประวัติจะยาวแค่ไหน กราฟก็ส่งไม่เกินราว MAX_CANDLES แท่ง
+"""
+import numpy as np
+import pandas as pd
+
+# จำนวนแท่งสูงสุดที่ส่งไปกราฟ (กราฟแท่งเทียนยังอ่านออกและ payload เล็ก)
+MAX_CANDLES = 400
+
+# ระดับจากละเอียดไปหยาบ: ชื่อ -> pandas offset (None = ข้อมูลรายวันเดิม)
+LEVELS = [
+    ("รายวัน", None),
+    ("รายสัปดาห์", "W-FRI"),
+    ("รายเดือน", "MS"),
+]
+
+OHLCV_AGG = {"open": "first", "high": "max", "low": "min", "close": "last", "volume": "sum"}
+
+
+def resample_ohlc(df, rule):
+    """
+    รวมแท่งรายวันเป็นช่วง rule (index เป็นวันที่) รายสัปดาห์ลงวันที่วันศุกร์ รายเดือนลงวันที่ 1 ของเดือน
+    คอลัมน์อื่นที่ไม่ใช่ OHLCV (เช่น ema_50) ใช้ค่าสุดท้ายของช่วง
+    """
+    agg = {col: OHLCV_AGG.get(col, "last") for col in df.columns}
+    out = df.resample(rule).agg(agg)
+    return out.dropna(subset=["close"])
+
+
+def build_pyramid(df):
+    """
+    df: คอลัมน์ date, open, high, low, close (volume และคอลัมน์ตัวเลขอื่น เช่น ema_50 ถ้ามี)
+    คืน dict ชื่อระดับ -> DataFrame ที่ index เป็น DatetimeIndex เรียงตามวันที่
+    """
+    daily = df.assign(date=pd.to_datetime(df["date"])).set_index("date").sort_index()
+    pyramid = {}
+    for name, rule in LEVELS:
+        pyramid[name] = daily if rule is None else resample_ohlc(daily, rule)
+    return pyramid
+
+
+def choose_level(pyramid, start=None, end=None, max_points=MAX_CANDLES):
+    """เลือกระดับละเอียดที่สุดที่แท่งในช่วง [start, end] ไม่เกิน max_points คืน (ชื่อระดับ, DataFrame ในช่วง)"""
+    for name, _ in LEVELS:
+        visible = pyramid[name].loc[start:end]
+        if len(visible) <= max_points:
+            return name, visible
+    return name, visible
+
+
+def lttb(x, y, threshold):
+    """
+    Largest-Triangle-Three-Buckets: เลือก threshold จุดจาก (x, y) ที่รักษารูปทรงกราฟ
+    x ต้องเป็นตัวเลขเรียงจากน้อยไปมาก (เช่น วันที่แปลงเป็น int64) คืน index ของจุดที่เลือก
+    """
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+
+    # แบ่งจุดกลางเป็น threshold - 2 bucket
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        # จุดเฉลี่ยของ bucket ถัดไป (bucket สุดท้ายใช้จุดสุดท้าย)
+        next_start, next_end = end, edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+
+        # พื้นที่สามเหลี่ยม (a, จุดใน bucket, จุดเฉลี่ย) เลือกจุดที่พื้นที่มากสุด
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def downsample_line(series, max_points=MAX_CANDLES):
+    """ลดจุดของ Series ที่ index เป็นวันที่ด้วย LTTB (ค่า NaN ถูกตัดทิ้งก่อน)"""
+    series = series.dropna()
+    if len(series) <= max_points:
+        return series
+    x = series.index.asi8 if isinstance(series.index, pd.DatetimeIndex) else np.arange(len(series))
+    return series.iloc[lttb(x, series.to_numpy(), max_points)]
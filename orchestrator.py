@@ -0,0 +1,237 @@
+"""
+ตัวจัดการงานรายวันตัวเดียว (แทน schedule + time.sleep(60) ที่แต่ละสคริปต์เปิดค้างไว้เอง)
+
+- ลงทะเบียนงาน ราคา / indicator / ข่าว / factsheet / Form 59 พร้อม dependency (DAG)
+- งานที่ไม่ขึ้นต่อกันรันขนานกันบน thread pool และใช้ client ชุดเดียวกัน (clients.py)
+- งานที่ระบุ market_days_only จะข้ามวันที่ตลาดไม่เปิด (เสาร์-อาทิตย์และวันหยุดตาม trading_calendar.py)
+- โหมด daemon คำนวณเวลารอบถัดไปแล้ว sleep ยาวทีเดียว ไม่ต้องตื่นมาเช็คทุกนาที
+
+ตัวอย่าง:
+    python orchestrator.py --once              # รันรอบเดียวแล้วจบ (GitHub Actions / cron)
+    python orchestrator.py                     # เปิดค้างไว้ รันทุกวันตามเวลา CYCLE_TIME
+    python orchestrator.py --once --only news  # รันเฉพาะงานที่เลือก (พร้อม dependency ของมัน)
+"""
+import time
+import argparse
+import importlib
+import traceback
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime, date, timedelta
+
+from trading_calendar import is_trading_day
+from run_metrics import metrics, run_record, write_run_record
+
+# เวลาเริ่มรอบประจำวัน (หลังตลาดปิด 16:30 และราคาปิดเข้า Yahoo แล้ว)
+CYCLE_TIME = "17:30"
+
+# จำนวนงานที่รันพร้อมกันสูงสุด
+MAX_WORKERS = 4
+
+
+class Job:
+    """งาน 1 งานใน DAG: target เป็น 'module:function' (import ตอนรันจริง)"""
+
+    def __init__(self, name, target, deps=(), market_days_only=False, kwargs=None):
+        self.name = name
+        self.target = target
+        self.deps = list(deps)
+        self.market_days_only = market_days_only
+        self.kwargs = kwargs or {}
+
+    def resolve(self):
+        module_name, func_name = self.target.split(":")
+        return getattr(importlib.import_module(module_name), func_name)
+
+    def __repr__(self):
+        return f"Job({self.name!r})"
+
+
+JOBS = [
+    # ราคา: SET50 ย้อนหลัง 5 วัน + SECURE แบบ incremental
+    Job("prices", "save_bec_to_supabase:update_prices", market_days_only=True),
+    Job("prices_secure", "save_secure_to_supabase:update_stock_data", market_days_only=True),
+    # indicator ของ TEAMG (ดึงราคาเองจาก Yahoo จึงไม่ต้องรอ prices)
+    Job("indicators", "teamg_data_pipeline:run_pipeline", market_days_only=True),
+    # ข่าว (มีข่าวทุกวัน ไม่ต้องรอวันตลาดเปิด)
+    Job("news", "update_set50_news_daily:update_set50_news"),
+    Job("news_gapfocus", "multi_news_scraper:upsert_gapfocus_news"),
+    Job("factsheet", "get_secure_factsheet:update_factsheet"),
+    Job("form59", "save_manage_supabase:sync_form59_incremental"),
+    # ภาพรวม SET50 สำหรับ dashboard (หลังราคาและข่าวของวันเข้าแล้ว)
+    Job("summary", "market_summary:update_market_summary", deps=["prices", "news"]),
+    # index ค้นหาข่าวแบบ local ของ dashboard (หลังข่าวทุกแหล่งของวันเข้าแล้ว)
+    Job("news_index", "news_index:sync", deps=["news", "news_gapfocus"]),
+    # sentiment ข่าวรายวัน + เติมคอลัมน์ข่าวใน teamg_master_analysis (หลัง indicator เขียนแถวของวันแล้ว)
+    Job("news_sentiment", "news_sentiment:update_sentiment", deps=["news_index", "indicators"]),
+]
+
+
+def select_jobs(jobs, only=None):
+    """เลือกงานตามชื่อ พร้อม dependency ทั้งหมดของมัน"""
+    by_name = {job.name: job for job in jobs}
+    if not only:
+        return list(jobs)
+
+    selected = set()
+    stack = list(only)
+    while stack:
+        name = stack.pop()
+        if name not in by_name:
+            raise ValueError(f"ไม่มีงานชื่อ {name!r} (มี: {', '.join(by_name)})")
+        if name not in selected:
+            selected.add(name)
+            stack.extend(by_name[name].deps)
+    return [job for job in jobs if job.name in selected]
+
+
+def check_dag(jobs):
+    """ตรวจว่า dependency มีอยู่จริงและไม่วนลูป คืนลำดับแบบ topological"""
+    by_name = {job.name: job for job in jobs}
+    order, state = [], {}
+
+    def visit(job):
+        if state.get(job.name) == "done":
+            return
+        if state.get(job.name) == "visiting":
+            raise ValueError(f"dependency วนลูปที่งาน {job.name}")
+        state[job.name] = "visiting"
+        for dep in job.deps:
+            if dep not in by_name:
+                raise ValueError(f"งาน {job.name} ขึ้นกับ {dep} ที่ไม่ได้ลงทะเบียน")
+            visit(by_name[dep])
+        state[job.name] = "done"
+        order.append(job)
+
+    for job in jobs:
+        visit(job)
+    return order
+
+
+def _run_job(job):
+    started = time.perf_counter()
+    # งานรันขนานกันจึงเก็บแค่เวลา/สถานะต่องาน snapshot metric ไปอยู่ใน record ของทั้งรอบ
+    with run_record(job.name, include_metrics=False):
+        job.resolve()(**job.kwargs)
+    return time.perf_counter() - started
+
+
+def run_cycle(jobs=None, day=None, max_workers=MAX_WORKERS):
+    """
+    รันงานทั้งรอบตาม DAG: งานที่ dependency เสร็จแล้วถูกส่งเข้า pool ทันที
+    งานที่ dependency ล้มเหลวหรือถูกข้ามจะถูกข้ามด้วย คืน dict ชื่องาน -> (สถานะ, วินาที)
+    """
+    jobs = check_dag(jobs or JOBS)
+    day = day or date.today()
+    market_open = is_trading_day(day)
+    print(f"\n=== เริ่มรอบงานวันที่ {day} ({'ตลาดเปิด' if market_open else 'ตลาดปิด'}) ===")
+
+    results = {}
+    pending = {job.name: job for job in jobs}
+    running = {}
+    cycle_started = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while pending or running:
+            # ข้ามงานที่ไม่ต้องรันวันนี้ หรือ dependency ไม่สำเร็จ
+            for name, job in list(pending.items()):
+                if job.market_days_only and not market_open:
+                    results[name] = ("skipped", 0.0)
+                    print(f"[{name}] ข้าม (ตลาดปิด)")
+                    del pending[name]
+                elif any(results.get(dep, ("",))[0] in ("failed", "skipped") for dep in job.deps):
+                    results[name] = ("skipped", 0.0)
+                    print(f"[{name}] ข้าม (dependency ไม่สำเร็จ)")
+                    del pending[name]
+
+            for name, job in list(pending.items()):
+                if all(results.get(dep, ("",))[0] == "ok" for dep in job.deps):
+                    print(f"[{name}] เริ่ม")
+                    running[pool.submit(_run_job, job)] = job
+                    del pending[name]
+
+            if not running:
+                continue
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                job = running.pop(future)
+                try:
+                    seconds = future.result()
+                    results[job.name] = ("ok", seconds)
+                    print(f"[{job.name}] เสร็จใน {seconds:.1f} วินาที")
+                except Exception as e:
+                    results[job.name] = ("failed", 0.0)
+                    print(f"[{job.name}] ล้มเหลว: {e}")
+                    traceback.print_exc()
+
+    total = time.perf_counter() - cycle_started
+    write_run_record({
+        "job": "cycle",
+        "day": day.isoformat(),
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+        "seconds": round(total, 3),
+        "status": "failed" if any(status == "failed" for status, _ in results.values()) else "ok",
+        "jobs": {name: {"status": status, "seconds": round(seconds, 3)} for name, (status, seconds) in results.items()},
+        **metrics.snapshot(),
+    })
+    metrics.write_prometheus()
+    print(f"=== จบรอบใน {total:.1f} วินาที ===")
+    for name, (status, seconds) in results.items():
+        print(f"  {name:<16} {status:<8} {seconds:>8.1f}s")
+    return results
+
+
+def next_cycle_at(now, cycle_time=CYCLE_TIME):
+    """เวลาเริ่มรอบถัดไป (วันนี้ถ้ายังไม่ถึงเวลา ไม่งั้นพรุ่งนี้)"""
+    hour, minute = (int(x) for x in cycle_time.split(":"))
+    target = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if target <= now:
+        target += timedelta(days=1)
+    return target
+
+
+def run_forever(jobs=None, cycle_time=CYCLE_TIME, max_workers=MAX_WORKERS):
+    """เปิดค้างไว้: sleep จนถึงรอบถัดไปครั้งเดียว (ไม่ต้องวนเช็คทุกนาที) แล้วรันรอบ"""
+    while True:
+        target = next_cycle_at(datetime.now(), cycle_time)
+        print(f"รอบถัดไป {target:%Y-%m-%d %H:%M}")
+        while datetime.now() < target:
+            # sleep เป็นช่วงยาว แต่เช็คใหม่เผื่อเครื่อง suspend/นาฬิกาเปลี่ยน
+            time.sleep(min(3600, max(1.0, (target - datetime.now()).total_seconds())))
+        run_cycle(jobs, day=target.date(), max_workers=max_workers)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="รันงานรายวันทั้งหมด (ราคา, indicator, ข่าว, factsheet, Form 59) ตาม DAG")
+    parser.add_argument("--once", action="store_true", help="รันรอบเดียวแล้วจบ")
+    parser.add_argument("--only", nargs="*", help="เลือกเฉพาะงาน (dependency จะถูกรันด้วย)")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS)
+    parser.add_argument("--at", default=CYCLE_TIME, help="เวลาเริ่มรอบในโหมดเปิดค้าง (HH:MM)")
+    parser.add_argument("--list", action="store_true", help="แสดงงานทั้งหมดแล้วจบ")
+    args = parser.parse_args()
+
+    jobs = select_jobs(JOBS, args.only)
+    if args.list:
+        for job in check_dag(jobs):
+            deps = ", ".join(job.deps) or "-"
+            print(f"{job.name:<16} {job.target:<45} deps: {deps:<20} {'วันตลาดเปิด' if job.market_days_only else 'ทุกวัน'}")
+        return
+
+    # ตั้ง logging ครั้งเดียวที่นี่ (งานข่าวไม่ตั้งเองตอนถูก import)
+    from log_setup import setup_logging
+    setup_logging()
+
+    try:
+        if args.once:
+            results = run_cycle(jobs, max_workers=args.workers)
+            if any(status == "failed" for status, _ in results.values()):
+                raise SystemExit(1)
+        else:
+            run_forever(jobs, cycle_time=args.at, max_workers=args.workers)
+    finally:
+        from clients import close_all
+        close_all()
+
+
+if __name__ == "__main__":
+    main()
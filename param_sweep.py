@@ -0,0 +1,129 @@
+"""
+กวาดค่า window ของ indicator (EMA fast/slow, RSI, Z-score) ที่ teamg_data_pipeline.py ตั้งตายตัวไว้
+
+โหลดราคาครั้งเดียวลง multiprocessing.shared_memory (บล็อกเดียว ขนาด field x วัน x หุ้น)
+worker ทุกตัวผูก NumPy array เข้ากับบล็อกเดิม ไม่มีการ copy ราคาไปแต่ละ process
+(ส่งให้ worker แค่ชื่อบล็อก + shape) แล้วใช้ backtest.run_grid รันทุกชุดและจัดอันดับ
+
+    python param_sweep.py --since 2018-01-01
+    python param_sweep.py --grid fast=10:50:10 --grid slow=100:250:50 --rank-by cagr
+
+ค่า default ของ --entry / --exit ใช้ {fast} {slow} {rsi} {z} เป็น window
+"""
+import time
+import argparse
+from multiprocessing import shared_memory
+
+import numpy as np
+
+import backtest
+from backtest import Panel
+
+# ราคาที่ใส่ shared memory (indicator คำนวณใหม่ใน worker จากราคาเหล่านี้)
+SHARED_FIELDS = ("open", "high", "low", "close", "volume")
+
+DEFAULT_ENTRY = "ema_{fast} > ema_{slow} and z_{z} < -1 and rsi_{rsi} < 40"
+DEFAULT_EXIT = "z_{z} > 0 or rsi_{rsi} > 70"
+
+# window ที่ pipeline ใช้อยู่: EMA 50/200, RSI 14, Z 20
+DEFAULT_GRID = {
+    "fast": list(range(10, 101, 10)),
+    "slow": list(range(100, 251, 25)),
+    "rsi": [7, 10, 14, 21],
+    "z": [10, 20, 30, 40],
+}
+
+# บล็อกที่ worker ผูกไว้ (ต้องเก็บ reference ไม่งั้น buffer ถูกปิด)
+_attached = []
+
+
+class SharedPanel:
+    """
+    เจ้าของ shared memory ของราคา ใช้กับ with: ออกจาก block แล้วปิดและลบบล็อกให้
+    descriptor เป็น tuple เล็ก ๆ ที่ส่งให้ worker ไปเรียก attach()
+    """
+
+    def __init__(self, panel, fields=SHARED_FIELDS):
+        self.fields = [f for f in fields if f in panel.fields]
+        shape = (len(self.fields), len(panel.dates), len(panel.symbols))
+        self.shm = shared_memory.SharedMemory(create=True, size=max(int(np.prod(shape)) * 8, 1))
+        block = np.ndarray(shape, dtype=np.float64, buffer=self.shm.buf)
+        for i, field in enumerate(self.fields):
+            block[i] = panel.fields[field]
+        self.descriptor = (self.shm.name, shape, self.fields, panel.dates, panel.symbols)
+        self.panel = _panel_view(block, self.descriptor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.panel = None
+        self.shm.close()
+        self.shm.unlink()
+
+
+def _panel_view(block, descriptor):
+    _, _, fields, dates, symbols = descriptor
+    block.flags.writeable = False
+    return Panel(dates, symbols, {field: block[i] for i, field in enumerate(fields)})
+
+
+def attach(descriptor):
+    """Panel ที่ field เป็น view ของ shared memory (อ่านอย่างเดียว)"""
+    name, shape = descriptor[:2]
+    try:
+        shm = shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13 ไม่มี track= แต่ worker ของ pool ใช้ resource_tracker ตัวเดียวกับ process หลัก
+        # การลงทะเบียนซ้ำจึงไม่ทำให้บล็อกถูกลบก่อนเจ้าของ
+        shm = shared_memory.SharedMemory(name=name)
+    _attached.append(shm)
+    return _panel_view(np.ndarray(shape, dtype=np.float64, buffer=shm.buf), descriptor)
+
+
+def _init_shared_worker(descriptor):
+    backtest._init_worker(attach(descriptor))
+
+
+def sweep(panel, entry=DEFAULT_ENTRY, exit=DEFAULT_EXIT, grid=None, cost=backtest.COST, workers=None,
+          rank_by="sharpe"):
+    """รันทุกชุด window บน process pool โดยราคาอยู่ใน shared memory คืน DataFrame ที่จัดอันดับแล้ว"""
+    combos = backtest.parameter_grid(grid or DEFAULT_GRID)
+    # slow ต้องยาวกว่า fast ตัดชุดที่ไม่มีความหมายทิ้งก่อนรัน
+    combos = [p for p in combos if not ("fast" in p and "slow" in p) or p["fast"] < p["slow"]]
+    with SharedPanel(panel) as shared:
+        return backtest.run_grid(shared.panel, entry, exit, combos, cost, workers, rank_by,
+                                 initializer=_init_shared_worker, initargs=(shared.descriptor,))
+
+
+if __name__ == "__main__":
+    from save_bec_to_supabase import set50_symbols
+
+    parser = argparse.ArgumentParser(description="กวาดค่า window ของ EMA/RSI/Z-score บนราคาใน shared memory")
+    parser.add_argument("--entry", default=DEFAULT_ENTRY)
+    parser.add_argument("--exit", default=DEFAULT_EXIT)
+    parser.add_argument("--grid", action="append", help="แทนค่า default ทีละตัว เช่น fast=10:50:10 หรือ rsi=7,14")
+    parser.add_argument("--symbols", help="คั่นด้วย , (default SET50)")
+    parser.add_argument("--since", help="วันเริ่ม YYYY-MM-DD")
+    parser.add_argument("--source", choices=["storage", "cache"], default="storage",
+                        help="cache = อ่านจาก price_cache.py (memmap) แทน query")
+    parser.add_argument("--cost", type=float, default=backtest.COST)
+    parser.add_argument("--workers", type=int, help="จำนวน process (default ทุก core)")
+    parser.add_argument("--rank-by", default="sharpe")
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--output", help="บันทึกผลทั้งหมดเป็น CSV")
+    args = parser.parse_args()
+
+    symbols = args.symbols.split(",") if args.symbols else [s.replace(".BK", "") for s in set50_symbols]
+    started = time.perf_counter()
+    panel = backtest.load_panel(symbols, args.since, source=args.source)
+    print(f"โหลด {len(panel.symbols)} หุ้น x {len(panel.dates)} วัน ({time.perf_counter() - started:.1f} วินาที)")
+
+    grid = dict(DEFAULT_GRID, **backtest.parse_grid(args.grid))
+    started = time.perf_counter()
+    results = sweep(panel, args.entry, args.exit, grid, args.cost, args.workers, args.rank_by)
+    print(f"รัน {len(results)} ชุด window ใน {time.perf_counter() - started:.1f} วินาที")
+    print(results.head(args.top).to_string(index=False))
+    if args.output:
+        results.to_csv(args.output, index=False)
+        print(f"บันทึกผลที่ {args.output}")
@@ -0,0 +1,265 @@
+"""
+cache ราคาแบบไฟล์ binary + memory map (อ่านได้โดยไม่ต้องยิง Supabase/Yahoo หรือ parse CSV)
+
+โครงสร้างใน CACHE_DIR:
+    index.json          : {"generation", "symbols", "dates", "fields"} (ไฟล์เล็ก ๆ)
+    <generation>/close.bin, open.bin, ... : 1 ไฟล์ต่อ field เป็น array (หุ้น x วันทำการ)
+                          ราคา float32 (ไม่มีข้อมูล = NaN), volume int64 (ไม่มีข้อมูล = 0)
+
+เรียงแบบหุ้นก่อน (symbol-major) ประวัติของหุ้นหนึ่งตัวจึงอยู่ติดกันในไฟล์
+history() คืน view ของ memmap (ไม่ copy, ไม่ parse) หาตำแหน่งวันที่ด้วย searchsorted
+
+สร้างครั้งแรกด้วย --rebuild จากนั้นงานราคา (save_bec / save_stock / save_secure) อัพเดตต่อให้หลัง upsert
+update() เขียน generation ใหม่ทั้งชุดแล้วค่อยสลับ index.json ทีเดียว
+reader ที่เปิดไฟล์เก่าค้างไว้ยังอ่านได้ต่อ และ reader ใหม่ไม่มีทางเห็นไฟล์ครึ่ง ๆ กลาง ๆ
+
+    python price_cache.py --rebuild               # สร้างใหม่จาก stock_prices ทั้งตาราง
+    python price_cache.py --symbol TEAMG --start 2026-01-01
+"""
+import os
+import json
+import shutil
+import argparse
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+import numpy as np
+
+CACHE_DIR = os.environ.get("TEAMG_PRICE_CACHE", "price_cache")
+
+FIELDS = {
+    "open": "float32",
+    "high": "float32",
+    "low": "float32",
+    "close": "float32",
+    "volume": "int64",
+}
+
+# generation ที่เก็บไว้ (ปัจจุบัน + ก่อนหน้า เผื่อ reader ที่ยังเปิดอยู่)
+KEEP_GENERATIONS = 2
+
+_write_lock = threading.Lock()
+
+
+def _missing(dtype):
+    return np.nan if np.dtype(dtype).kind == "f" else 0
+
+
+@contextmanager
+def _locked(path):
+    """กันเขียนพร้อมกันทั้งใน process (thread ของ orchestrator) และข้าม process"""
+    os.makedirs(path, exist_ok=True)
+    with _write_lock, open(os.path.join(path, ".lock"), "w") as f:
+        try:
+            import fcntl
+            fcntl.flock(f, fcntl.LOCK_EX)
+        except ImportError:
+            pass
+        yield
+
+
+class PriceCache:
+    """reader ของ cache: เปิดครั้งเดียวแล้วอ่านเป็น slice ได้เรื่อย ๆ (reload() เมื่อมี generation ใหม่)"""
+
+    def __init__(self, path=CACHE_DIR):
+        self.path = path
+        self.generation = None
+        self.symbols = []
+        self.dates = np.array([], dtype="datetime64[D]")
+        self.arrays = {}
+        self._rows = {}
+        self.reload()
+
+    @property
+    def index_file(self):
+        return os.path.join(self.path, "index.json")
+
+    def exists(self):
+        return self.generation is not None
+
+    def reload(self):
+        """เปิด generation ล่าสุดตาม index.json คืน True ถ้าเปลี่ยนจากเดิม"""
+        if not os.path.exists(self.index_file):
+            return False
+        with open(self.index_file, encoding="utf-8") as f:
+            index = json.load(f)
+        if index["generation"] == self.generation:
+            return False
+
+        shape = (len(index["symbols"]), len(index["dates"]))
+        folder = os.path.join(self.path, index["generation"])
+        arrays = {}
+        for field, dtype in index["fields"].items():
+            if 0 in shape:
+                arrays[field] = np.empty(shape, dtype=dtype)
+            else:
+                arrays[field] = np.memmap(os.path.join(folder, f"{field}.bin"), dtype=dtype, mode="r", shape=shape)
+
+        self.generation = index["generation"]
+        self.symbols = index["symbols"]
+        self.dates = np.array(index["dates"], dtype="datetime64[D]")
+        self.arrays = arrays
+        self._rows = {symbol: i for i, symbol in enumerate(self.symbols)}
+        return True
+
+    def _columns(self, start=None, end=None):
+        """ช่วงคอลัมน์ของวันที่ [start, end] (รวมทั้งสองฝั่ง)"""
+        lo = 0 if start is None else int(np.searchsorted(self.dates, np.datetime64(str(start)[:10], "D"), "left"))
+        hi = len(self.dates) if end is None else int(np.searchsorted(self.dates, np.datetime64(str(end)[:10], "D"), "right"))
+        return slice(lo, hi)
+
+    def history(self, symbol, field="close", start=None, end=None):
+        """view ของ field ของหุ้นตัวเดียวในช่วงวันที่ (ไม่ copy) KeyError ถ้าไม่มีหุ้นนี้ใน cache"""
+        return self.arrays[field][self._rows[symbol], self._columns(start, end)]
+
+    def frame(self, symbol, start=None, end=None):
+        """DataFrame date + OHLCV ของหุ้นตัวเดียว (ตัดวันที่ไม่มีราคาทิ้ง) สำหรับผู้ใช้ที่ต้องการ pandas"""
+        import pandas as pd
+
+        columns = self._columns(start, end)
+        df = pd.DataFrame({field: self.arrays[field][self._rows[symbol], columns] for field in self.arrays})
+        df.insert(0, "date", self.dates[columns].astype(str))
+        return df.dropna(subset=["close"]).reset_index(drop=True)
+
+    def panel(self, symbols=None, start=None, end=None):
+        """backtest.Panel (วัน x หุ้น) ถ้าเลือกทุกหุ้นจะเป็น view ของ memmap (transpose) ไม่ copy"""
+        from backtest import Panel
+
+        columns = self._columns(start, end)
+        symbols = [s for s in (symbols or self.symbols) if s in self._rows]
+        if symbols == self.symbols:
+            fields = {field: array[:, columns].T for field, array in self.arrays.items()}
+        else:
+            rows = [self._rows[s] for s in symbols]
+            fields = {field: array[rows, columns].T for field, array in self.arrays.items()}
+        return Panel(self.dates[columns].astype(str), symbols, fields)
+
+    def rows(self, symbols=None, start=None, end=None):
+        """แถวแบบ stock_prices (list ของ dict) สำหรับโค้ดเดิมที่รับผล query"""
+        out = []
+        for symbol in symbols or self.symbols:
+            if symbol in self._rows:
+                df = self.frame(symbol, start, end)
+                df.insert(0, "symbol", symbol)
+                out.extend(df.to_dict(orient="records"))
+        return out
+
+
+def update(rows, path=CACHE_DIR, replace=None):
+    """
+    รวมแถวแบบ stock_prices (symbol, date, open, high, low, close, volume) เข้า cache
+    หุ้น/วันที่ใหม่ถูกเพิ่มให้ ค่าที่มีอยู่แล้วถูกทับ คืนจำนวนแถวที่รับเข้า
+    replace: True = ทิ้งข้อมูลเดิมทั้งหมด / list ของหุ้น = ทิ้งประวัติเดิมของหุ้นเหล่านั้น (แถวเก่าที่ผิดไม่ค้าง)
+    """
+    rows = [row for row in rows if row.get("symbol") and row.get("date")]
+    if not rows and not replace:
+        return 0
+
+    with _locked(path):
+        current = PriceCache(path)
+        if replace is True:
+            kept = []
+        else:
+            dropped = set(replace or ())
+            kept = [s for s in current.symbols if s not in dropped]
+        kept_dates = current.dates if kept else current.dates[:0]
+        new_symbols = sorted(set(kept) | {row["symbol"] for row in rows})
+        new_dates = np.unique(np.concatenate([
+            kept_dates, np.array([str(row["date"])[:10] for row in rows], dtype="datetime64[D]")]))
+
+        symbol_pos = {symbol: i for i, symbol in enumerate(new_symbols)}
+        old_rows = np.array([symbol_pos[s] for s in kept], dtype=np.int64)
+        old_source = [current._rows[s] for s in kept]
+        old_cols = np.searchsorted(new_dates, kept_dates)
+        row_idx = np.array([symbol_pos[row["symbol"]] for row in rows], dtype=np.int64)
+        col_idx = np.searchsorted(new_dates, np.array([str(row["date"])[:10] for row in rows], dtype="datetime64[D]"))
+
+        generation = datetime.now().strftime("g%Y%m%d%H%M%S%f")
+        folder = os.path.join(path, generation)
+        os.makedirs(folder)
+        shape = (len(new_symbols), len(new_dates))
+        for field, dtype in FIELDS.items():
+            out = np.memmap(os.path.join(folder, f"{field}.bin"), dtype=dtype, mode="w+", shape=shape)
+            out[:] = _missing(dtype)
+            if field in current.arrays and len(old_rows):
+                out[np.ix_(old_rows, old_cols)] = current.arrays[field][old_source]
+            values = np.array([_missing(dtype) if row.get(field) is None else row[field] for row in rows],
+                              dtype=np.float64)
+            if np.dtype(dtype).kind != "f":
+                values = np.nan_to_num(values, nan=0.0)
+            out[row_idx, col_idx] = values.astype(dtype)
+            out.flush()
+            del out
+
+        index = {
+            "generation": generation,
+            "symbols": new_symbols,
+            "dates": [str(d) for d in new_dates],
+            "fields": FIELDS,
+        }
+        tmp = os.path.join(path, "index.json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(index, f)
+        os.replace(tmp, os.path.join(path, "index.json"))
+
+        generations = sorted(d for d in os.listdir(path) if d.startswith("g") and os.path.isdir(os.path.join(path, d)))
+        for old in generations[:-KEEP_GENERATIONS]:
+            shutil.rmtree(os.path.join(path, old), ignore_errors=True)
+    return len(rows)
+
+
+def update_quietly(rows, path=CACHE_DIR):
+    """
+    สำหรับงานราคา: อัพเดต cache หลัง upsert ถ้าพลาดแค่แจ้ง ไม่ให้งานหลักล้ม
+    ทำเฉพาะเครื่องที่สร้าง cache ไว้แล้ว (--rebuild) กัน cache ที่มีแค่ราคาไม่กี่วันล่าสุด (เช่นบน GitHub Actions)
+    """
+    if not os.path.exists(os.path.join(path, "index.json")):
+        return
+    try:
+        count = update(rows, path)
+        if count:
+            print(f"อัพเดต price cache {count} แถว")
+    except Exception as e:
+        print(f"อัพเดต price cache ไม่สำเร็จ: {e}")
+
+
+def rebuild(symbols=None, path=CACHE_DIR):
+    """
+    สร้าง cache ใหม่จาก stock_prices ใน storage (Supabase หรือ TEAMG_STORAGE) ข้อมูลเดิมไม่ถูกรวม
+    ระบุ symbols = สร้างใหม่เฉพาะหุ้นเหล่านั้น หุ้นอื่นใน cache คงเดิม
+    """
+    from clients import supabase
+    from storage import fetch_all
+
+    def build_query():
+        query = supabase.table("stock_prices").select("symbol, date, open, high, low, close, volume")
+        if symbols:
+            query = query.in_("symbol", symbols)
+        return query.order("symbol").order("date")
+
+    return update(fetch_all(build_query), path, replace=symbols or True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="cache ราคาแบบ memory-mapped (สร้าง/ดูข้อมูล)")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="สร้าง cache ใหม่จาก stock_prices ใน storage (ทิ้งข้อมูลเดิมของหุ้นที่เลือก/ทั้งหมด)")
+    parser.add_argument("--symbols", help="คั่นด้วย , (ใช้กับ --rebuild)")
+    parser.add_argument("--symbol", help="แสดงประวัติของหุ้นนี้")
+    parser.add_argument("--start")
+    parser.add_argument("--end")
+    args = parser.parse_args()
+
+    if args.rebuild:
+        count = rebuild(args.symbols.split(",") if args.symbols else None)
+        print(f"ใส่ cache {count} แถว")
+
+    cache = PriceCache()
+    if not cache.exists():
+        print(f"ยังไม่มี cache ที่ {CACHE_DIR} (รัน --rebuild หรืองานราคาก่อน)")
+    elif args.symbol:
+        print(cache.frame(args.symbol, args.start, args.end).to_string(index=False))
+    else:
+        print(f"{cache.generation}: {len(cache.symbols)} หุ้น x {len(cache.dates)} วัน "
+              f"({cache.dates[0] if len(cache.dates) else '-'} ถึง {cache.dates[-1] if len(cache.dates) else '-'})")
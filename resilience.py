@@ -0,0 +1,211 @@
+"""
+ชั้นกันพังสำหรับเรียก Yahoo / RSS / Supabase
+
+- retry แบบ exponential backoff + full jitter เฉพาะ error ชั่วคราว (429, 5xx, timeout, connection)
+- circuit breaker ต่อ host: ล้มติดกันเกิน FAILURE_THRESHOLD ครั้งจะหยุดยิง host นั้น RESET_TIMEOUT วินาที
+  (หลังจากนั้นปล่อยให้ลอง 1 ครั้ง ถ้าผ่านก็กลับมาใช้ตามปกติ)
+- dead-letter queue: หน่วยงานที่ยังล้ม (เช่น symbol) ถูกจดลง dead_letters.json รอบถัดไปทำก่อน
+
+ตัวอย่าง:
+    from resilience import call, dead_letters
+
+    df = call("yahoo", ticker.history, period="5d")
+    supabase_response = call("supabase", query.execute)
+"""
+import os
+import json
+import time
+import random
+import threading
+from datetime import datetime
+
+from run_metrics import metrics
+
+MAX_ATTEMPTS = 4
+BACKOFF_BASE = 1.0     # วินาที
+BACKOFF_CAP = 30.0     # รอนานสุดต่อครั้ง
+
+FAILURE_THRESHOLD = 5
+RESET_TIMEOUT = 300    # วินาที
+
+DEAD_LETTER_FILE = os.environ.get("TEAMG_DEAD_LETTER_FILE", "dead_letters.json")
+
+
+class CircuitOpenError(Exception):
+    """host นี้ล้มติดกันจนวงจรเปิด ยังไม่ถึงเวลาลองใหม่"""
+
+
+def is_transient(exc):
+    """error ที่ลองใหม่แล้วมีโอกาสผ่าน (rate limit, 5xx, timeout, connection)"""
+    if isinstance(exc, CircuitOpenError):
+        return False
+    response = getattr(exc, "response", None)
+    status = getattr(response, "status_code", None) or getattr(exc, "status_code", None)
+    if isinstance(status, int):
+        return status == 429 or status >= 500
+    name = type(exc).__name__
+    if any(word in name for word in ("RateLimit", "Timeout", "Connect")):
+        return True
+    return isinstance(exc, (TimeoutError, ConnectionError))
+
+
+def backoff_delay(attempt, base=BACKOFF_BASE, cap=BACKOFF_CAP):
+    """full jitter: สุ่ม 0 ถึง min(cap, base * 2^attempt) กันทุก worker ยิงพร้อมกันอีกรอบ"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class CircuitBreaker:
+    """breaker ของ host เดียว (closed → open → half-open → closed)"""
+
+    def __init__(self, host, failure_threshold=FAILURE_THRESHOLD, reset_timeout=RESET_TIMEOUT):
+        self.host = host
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def before_call(self):
+        """
+        open: ปฏิเสธ / half-open: thread แรกได้เป็นตัวลอง (probe) thread อื่นถูกปฏิเสธจนกว่าผลจะออก
+        """
+        with self._lock:
+            state = self.state
+            if state == "half-open" and not self.probing:
+                self.probing = True
+                return
+            if state == "closed":
+                return
+        metrics.inc("circuit_rejected", host=self.host)
+        raise CircuitOpenError(f"{self.host}: circuit เปิดอยู่ (ล้มติดกัน {self.failures} ครั้ง)")
+
+    def release(self):
+        """probe จบโดยไม่รู้ผลของ host (error ถาวร) ให้ thread ถัดไปลองแทน"""
+        with self._lock:
+            self.probing = False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.probing = False
+            self.failures += 1
+            # half-open ล้มอีกครั้งเดียวก็เปิดใหม่
+            if self.failures >= self.failure_threshold or self.opened_at is not None:
+                if self.opened_at is None:
+                    print(f"[circuit] หยุดเรียก {self.host} {self.reset_timeout} วินาที หลังล้มติดกัน {self.failures} ครั้ง")
+                    metrics.inc("circuit_opened", host=self.host)
+                self.opened_at = time.monotonic()
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def breaker(host):
+    """breaker ของ host (สร้างครั้งแรกที่ถูกเรียก ใช้ร่วมกันทั้ง process)"""
+    with _breakers_lock:
+        if host not in _breakers:
+            _breakers[host] = CircuitBreaker(host)
+        return _breakers[host]
+
+
+def call(host, func, *args, attempts=MAX_ATTEMPTS, **kwargs):
+    """
+    เรียก func ผ่าน circuit breaker ของ host และ retry error ชั่วคราวแบบ backoff
+    error ถาวร (เช่น 400, ข้อมูลผิด) โยนต่อทันทีและไม่นับเป็นความล้มเหลวของ host
+    """
+    circuit = breaker(host)
+    for attempt in range(attempts):
+        circuit.before_call()
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            if not is_transient(e):
+                circuit.release()
+                raise
+            circuit.record_failure()
+            if attempt == attempts - 1 or circuit.state == "open":
+                raise
+            delay = backoff_delay(attempt)
+            metrics.inc("retries", host=host)
+            print(f"[retry] {host}: {e} → ลองใหม่ใน {delay:.1f} วินาที ({attempt + 1}/{attempts - 1})")
+            time.sleep(delay)
+        else:
+            circuit.record_success()
+            return result
+
+
+class DeadLetterQueue:
+    """
+    หน่วยงานที่ล้มแยกตามงาน เก็บเป็น JSON {job: {unit: {"error", "failed_at", "attempts"}}}
+    unit เป็น string (เช่น symbol) เพื่อให้ทำซ้ำได้ตรงตัว
+    """
+
+    def __init__(self, path=DEAD_LETTER_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._data = None
+
+    def _load(self):
+        if self._data is None:
+            if os.path.exists(self.path):
+                with open(self.path, encoding="utf-8") as f:
+                    self._data = json.load(f)
+            else:
+                self._data = {}
+        return self._data
+
+    def pending(self, job):
+        """unit ที่ค้างของงานนี้ เรียงจากที่ล้มก่อน"""
+        with self._lock:
+            entries = self._load().get(job, {})
+            return sorted(entries, key=lambda unit: entries[unit]["failed_at"])
+
+    def add(self, job, unit, error):
+        with self._lock:
+            entries = self._load().setdefault(job, {})
+            previous = entries.get(unit, {})
+            entries[unit] = {
+                "error": str(error)[:500],
+                "failed_at": previous.get("failed_at", datetime.now().isoformat(timespec="seconds")),
+                "attempts": previous.get("attempts", 0) + 1,
+            }
+        metrics.inc("dead_letters", job=job)
+
+    def remove(self, job, unit):
+        with self._lock:
+            entries = self._load().get(job, {})
+            entries.pop(unit, None)
+
+    def save(self):
+        with self._lock:
+            data = {job: entries for job, entries in self._load().items() if entries}
+            tmp = f"{self.path}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=1)
+            os.replace(tmp, self.path)
+
+
+dead_letters = DeadLetterQueue()
+
+
+def prioritize(job, units):
+    """เอา unit ที่ค้างใน dead-letter (ที่อยู่ใน units) ขึ้นก่อน ที่เหลือตามลำดับเดิม"""
+    retry_first = [unit for unit in dead_letters.pending(job) if unit in units]
+    if retry_first:
+        print(f"[dead-letter] {job}: ทำ {len(retry_first)} รายการที่ค้างจากรอบก่อนก่อน: {', '.join(retry_first)}")
+    return retry_first + [unit for unit in units if unit not in retry_first]
@@ -0,0 +1,209 @@
+"""
+ตัวเก็บ metric ของทุกงาน (แทนการไล่อ่าน print / set50_news_log.txt)
+
+- counter    : นับจำนวน เช่น rows_matched, rows_written, retries, bytes
+- timer      : จับเวลา (count / sum / max) เช่น fetch_seconds ต่อ host, parse_seconds, job_seconds
+- run record : บรรทัด JSON ต่อการรัน 1 ครั้ง ต่อท้ายไฟล์ TEAMG_METRICS_FILE (ค่าเริ่มต้น run_metrics.jsonl)
+- snapshot   : ไฟล์ Prometheus text format (ใช้กับ node_exporter textfile collector) ถ้าตั้ง TEAMG_PROM_FILE
+
+metric ทุกตัวมี label ได้ เช่น metrics.timer("fetch_seconds", host="www.kaohoon.com")
+
+ตัวอย่าง:
+    from run_metrics import metrics, run_record
+
+    with run_record("news"):
+        with metrics.timer("parse_seconds", source="kaohoon"):
+            ...
+        metrics.inc("rows_written", len(rows), table="stock_news")
+"""
+import os
+import json
+import time
+import socket
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+METRICS_FILE = os.environ.get("TEAMG_METRICS_FILE", "run_metrics.jsonl")
+PROM_FILE = os.environ.get("TEAMG_PROM_FILE")
+METRIC_PREFIX = "teamg_"
+
+
+def _key(name, labels):
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}"
+
+
+class Metrics:
+    """registry ของ counter/timer ใช้ร่วมกันทั้ง process (thread-safe)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._timers = {}
+
+    def inc(self, name, value=1, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            stat = self._timers.setdefault(key, [0, 0.0, 0.0])
+            stat[0] += 1
+            stat[1] += seconds
+            stat[2] = max(stat[2], seconds)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def snapshot(self):
+        """ค่าปัจจุบันทั้งหมดเป็น dict ที่ dump เป็น JSON ได้"""
+        with self._lock:
+            counters = [{"name": name, "labels": dict(labels), "value": value}
+                        for (name, labels), value in sorted(self._counters.items())]
+            timers = [{"name": name, "labels": dict(labels), "count": count,
+                       "sum": round(total, 6), "max": round(peak, 6)}
+                      for (name, labels), (count, total, peak) in sorted(self._timers.items())]
+        return {"counters": counters, "timers": timers}
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._timers.clear()
+
+    def to_prometheus(self):
+        """snapshot ในรูปแบบ Prometheus / OpenMetrics text"""
+        lines = []
+        with self._lock:
+            counters = sorted(self._counters.items())
+            timers = sorted(self._timers.items())
+
+        typed = set()
+        for (name, labels), value in counters:
+            metric = f"{METRIC_PREFIX}{name}_total"
+            if metric not in typed:
+                lines.append(f"# TYPE {metric} counter")
+                typed.add(metric)
+            lines.append(f"{metric}{_format_labels(labels)} {value}")
+
+        for (name, labels), (count, total, peak) in timers:
+            metric = f"{METRIC_PREFIX}{name}"
+            if metric not in typed:
+                lines.append(f"# TYPE {metric} summary")
+                lines.append(f"# TYPE {metric}_max gauge")
+                typed.add(metric)
+            lines.append(f"{metric}_count{_format_labels(labels)} {count}")
+            lines.append(f"{metric}_sum{_format_labels(labels)} {total:.6f}")
+            lines.append(f"{metric}_max{_format_labels(labels)} {peak:.6f}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path=None):
+        """เขียนไฟล์ snapshot แบบ atomic (เขียนไฟล์ชั่วคราวแล้ว rename) ไม่ให้ collector อ่านไฟล์ครึ่ง ๆ"""
+        path = path or PROM_FILE
+        if not path:
+            return
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp, path)
+
+
+metrics = Metrics()
+
+
+def write_run_record(record, path=None):
+    """ต่อท้าย run record 1 บรรทัด"""
+    path = path or METRICS_FILE
+    line = json.dumps(record, ensure_ascii=False, default=str)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(line + "\n")
+
+
+@contextmanager
+def run_record(job, include_metrics=True, **fields):
+    """
+    ครอบการรันงาน 1 ครั้ง: จับเวลา สถานะ และแนบ snapshot metric (สะสมทั้ง process) ตอนจบ
+    แล้วเขียน run record + Prometheus snapshot (ถ้าตั้งไว้)
+    งานที่รันขนานกันใน process เดียว (orchestrator) ให้ปิด include_metrics แล้วแนบ snapshot ที่ record ของทั้งรอบแทน
+    """
+    started_at = datetime.now()
+    started = time.perf_counter()
+    status = "ok"
+    error = None
+    try:
+        yield
+    except BaseException as e:
+        status = "failed"
+        error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        seconds = time.perf_counter() - started
+        metrics.observe("job_seconds", seconds, job=job)
+        metrics.inc("job_runs", job=job, status=status)
+        record = {
+            "job": job,
+            "host": socket.gethostname(),
+            "started_at": started_at.isoformat(timespec="seconds"),
+            "seconds": round(seconds, 3),
+            "status": status,
+            **fields,
+        }
+        if error:
+            record["error"] = error
+        if include_metrics:
+            record.update(metrics.snapshot())
+        try:
+            write_run_record(record)
+            metrics.write_prometheus()
+        except OSError as e:
+            print(f"เขียน run metrics ไม่สำเร็จ: {e}")
+
+
+def summarize(path=None, job=None, last=10):
+    """อ่าน run record ล่าสุด (ใช้ดู regression) คืน list ของ (started_at, job, status, seconds, top timers)"""
+    path = path or METRICS_FILE
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    if job:
+        records = [r for r in records if r["job"] == job]
+
+    rows = []
+    for record in records[-last:]:
+        timers = sorted(record.get("timers", []), key=lambda t: t["sum"], reverse=True)
+        top = [(t["name"], t["labels"], t["sum"]) for t in timers if t["name"] != "job_seconds"][:3]
+        rows.append((record["started_at"], record["job"], record["status"], record["seconds"], top))
+    return rows
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="ดู run record ล่าสุดจาก run_metrics.jsonl")
+    parser.add_argument("--job", help="เฉพาะงานนี้")
+    parser.add_argument("--last", type=int, default=10)
+    parser.add_argument("--file", default=METRICS_FILE)
+    args = parser.parse_args()
+
+    for started_at, job, status, seconds, top in summarize(args.file, args.job, args.last):
+        print(f"{started_at}  {job:<16} {status:<7} {seconds:>8.1f}s")
+        for name, labels, total in top:
+            label_text = ",".join(f"{k}={v}" for k, v in labels.items())
+            print(f"    {total:>8.2f}s  {name} {label_text}")
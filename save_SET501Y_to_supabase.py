@@ -1,36 +1,19 @@
 import os
 import time
-import feedparser
-import requests
+import argparse
 from datetime import datetime, timedelta
-from supabase import create_client, Client
+from http_client import parse_feed, get_json
+from clients import supabase
 from dotenv import load_dotenv
+from news_dates import feed_entry_date, parse_news_date, to_iso
 import logging
-
-# ตั้งค่า logging ลงไฟล์ + console
-log_file = 'set50_news_log.txt'
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(log_file, mode='a', encoding='utf-8'),
-        logging.StreamHandler()
-    ]
-)
+from log_setup import setup_logging
 
 # โหลด .env
 load_dotenv()
 
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 NEWS_DATA_IO_KEY = os.getenv("NEWS_DATA_IO_KEY")  # ถ้ามี
 
-if not SUPABASE_URL or not SUPABASE_KEY:
-    logging.error("ไม่พบ SUPABASE_URL หรือ SUPABASE_KEY ใน .env")
-    exit(1)
-
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-
 # รายชื่อหุ้น SET50 (50 ตัว)
 SET50_SYMBOLS = [
     "AOT", "ADVANC", "BANPU", "BBL", "BCP", "BDMS", "BEM", "BGRIM", "BTS", "CBG",
@@ -51,19 +34,13 @@ def get_date_range():
     return from_date, to_date
 
 def get_news_date(entry):
-    published = entry.get("published_parsed")
-    if published:
-        try:
-            dt = datetime.fromtimestamp(time.mktime(published))
-            return dt.strftime("%Y-%m-%d")
-        except:
-            pass
-    return datetime.now().strftime("%Y-%m-%d")
+    """วันที่ข่าวแบบ 'YYYY-MM-DD' หรือ None ถ้าไม่รู้วันที่ (ข่าวนั้นจะไม่ถูก upsert)"""
+    return to_iso(feed_entry_date(entry))
 
 def fetch_kaohoon_rss(symbol, limit=50):  # เพิ่ม limit เพื่อดึงย้อนหลังมากขึ้น
     rss_url = f"https://www.kaohoon.com/feed/?s={symbol}"
     try:
-        feed = feedparser.parse(rss_url)
+        feed = parse_feed(rss_url)
         if feed.bozo:
             logging.warning(f"Kaohoon RSS Error {symbol}: {feed.bozo_exception}")
             return []
@@ -87,7 +64,8 @@ def fetch_kaohoon_rss(symbol, limit=50):  # เพิ่ม limit เพื่
                 }
                 news_list.append(news)
 
-        logging.info(f"Kaohoon: พบ {len(news_list)} ข่าวสำหรับ {symbol}")
+        logging.info(f"Kaohoon: พบ {len(news_list)} ข่าวสำหรับ {symbol}",
+                     extra={"symbol": symbol, "source": "Kaohoon", "count": len(news_list)})
         return news_list
 
     except Exception as e:
@@ -97,7 +75,7 @@ def fetch_kaohoon_rss(symbol, limit=50):  # เพิ่ม limit เพื่
 def fetch_set_rss(symbol, limit=20):
     rss_url = "https://www.set.or.th/en/rss/news.rss"
     try:
-        feed = feedparser.parse(rss_url)
+        feed = parse_feed(rss_url)
         news_list = []
         symbol_upper = symbol.upper()
 
@@ -119,7 +97,8 @@ def fetch_set_rss(symbol, limit=20):
                 if len(news_list) >= limit:
                     break
 
-        logging.info(f"SET: พบ {len(news_list)} ข่าวสำหรับ {symbol}")
+        logging.info(f"SET: พบ {len(news_list)} ข่าวสำหรับ {symbol}",
+                     extra={"symbol": symbol, "source": "SET", "count": len(news_list)})
         return news_list
 
     except Exception as e:
@@ -129,7 +108,7 @@ def fetch_set_rss(symbol, limit=20):
 def fetch_investing_rss(symbol, limit=20):
     rss_url = "https://th.investing.com/rss/news_95.rss"
     try:
-        feed = feedparser.parse(rss_url)
+        feed = parse_feed(rss_url)
         news_list = []
         symbol_upper = symbol.upper()
 
@@ -151,7 +130,8 @@ def fetch_investing_rss(symbol, limit=20):
                 if len(news_list) >= limit:
                     break
 
-        logging.info(f"Investing: พบ {len(news_list)} ข่าวสำหรับ {symbol}")
+        logging.info(f"Investing: พบ {len(news_list)} ข่าวสำหรับ {symbol}",
+                     extra={"symbol": symbol, "source": "Investing", "count": len(news_list)})
         return news_list
 
     except Exception as e:
@@ -167,9 +147,7 @@ def fetch_newsdata_io(symbol, limit=20):
     from_date, to_date = get_date_range()
     url = f"https://newsdata.io/api/1/news?apikey={api_key}&q={symbol}&language=th&country=th&size={limit}&from_date={from_date}&to_date={to_date}"
     try:
-        response = requests.get(url, timeout=20)
-        response.raise_for_status()
-        data = response.json()
+        data = get_json(url)
 
         news_list = []
         if data.get("status") == "success" and data.get("results"):
@@ -185,11 +163,12 @@ def fetch_newsdata_io(symbol, limit=20):
                         "source": "NewsData.io",
                         "url": item.get("link", ""),
                         "category": "ข่าวหุ้น",
-                        "news_date": item.get("pubDate", datetime.now().strftime("%Y-%m-%d"))[:10]
+                        "news_date": to_iso(parse_news_date(item.get("pubDate")))
                     }
                     news_list.append(news)
 
-        logging.info(f"NewsData.io: พบ {len(news_list)} ข่าวสำหรับ {symbol} (ย้อนหลัง {DAYS_BACK} วัน)")
+        logging.info(f"NewsData.io: พบ {len(news_list)} ข่าวสำหรับ {symbol} (ย้อนหลัง {DAYS_BACK} วัน)",
+                     extra={"symbol": symbol, "source": "NewsData.io", "count": len(news_list)})
         return news_list
 
     except Exception as e:
@@ -210,6 +189,11 @@ def update_set50_news():
         newsdata = fetch_newsdata_io(symbol, limit=20) if NEWS_DATA_IO_KEY else []
 
         all_news = kaohoon + sett + investing + newsdata
+        # ข่าวที่ไม่รู้วันที่ไม่ต้อง upsert เพราะ news_date เป็นส่วนหนึ่งของ conflict key
+        undated = [n for n in all_news if not n["news_date"]]
+        if undated:
+            logging.warning(f"ข้าม {len(undated)} ข่าวของ {symbol} ที่ไม่รู้วันที่")
+            all_news = [n for n in all_news if n["news_date"]]
 
         if all_news:
             try:
@@ -228,6 +212,10 @@ def update_set50_news():
     logging.info(f"สรุปวันนี้: นำเข้าทั้งหมด {total_news} ข่าวจาก {len(SET50_SYMBOLS)} หุ้น")
 
 if __name__ == "__main__":
+    argparse.ArgumentParser(description="ดึงข่าวหุ้น SET50 จากทุกแหล่งแล้ว upsert ลง stock_news").parse_args()
+
+    # logging ผ่านคิว + หมุนไฟล์/บีบอัด + JSON (ดู log_setup.py) ตั้งตอนรันเท่านั้น import แล้วไม่แตะ handler
+    setup_logging()
     logging.info("เริ่มโปรแกรมอัพเดตข่าวหุ้น SET50...")
     update_set50_news()
     logging.info("อัพเดตเสร็จสิ้น")
\ No newline at end of file
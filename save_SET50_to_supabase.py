@@ -1,23 +1,15 @@
-import os
 import time
-import feedparser
+import argparse
 from datetime import datetime
-from supabase import create_client, Client
+from http_client import parse_feed
+from clients import supabase
 from dotenv import load_dotenv
+from news_dates import feed_entry_date
 import schedule
 
 # โหลด .env
 load_dotenv()
 
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-
-if not SUPABASE_URL or not SUPABASE_KEY:
-    print("Error: ไม่พบ SUPABASE_URL หรือ SUPABASE_KEY ใน .env")
-    exit(1)
-
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-
 # รายชื่อหุ้น SET50 (50 ตัวตามดัชนีล่าสุด)
 SET50_SYMBOLS = [
     "AOT", "ADVANC", "BANPU", "BBL", "BCP", "BDMS", "BEM", "BGRIM", "BTS", "CBG",
@@ -32,7 +24,7 @@ def fetch_kaohoon_rss_news(symbol, limit=10):
     rss_url = f"https://www.kaohoon.com/feed/?s={symbol}"
     
     try:
-        feed = feedparser.parse(rss_url)
+        feed = parse_feed(rss_url)
         if feed.bozo:
             print(f"RSS Error สำหรับ {symbol}: {feed.bozo_exception}")
             return []
@@ -62,15 +54,11 @@ def fetch_kaohoon_rss_news(symbol, limit=10):
                 }
 
                 # จัดการวันที่ให้เป็น string 'YYYY-MM-DD' สำหรับ Supabase
-                published = entry.get("published_parsed")
-                news_date_str = datetime.now().strftime("%Y-%m-%d")
-                if published:
-                    try:
-                        dt = datetime.fromtimestamp(time.mktime(published))
-                        news_date_str = dt.strftime("%Y-%m-%d")
-                    except:
-                        pass
-                news["news_date"] = news_date_str
+                # ไม่รู้วันที่ → ข้าม เพราะ news_date เป็นส่วนหนึ่งของ conflict key
+                news_date = feed_entry_date(entry)
+                if not news_date:
+                    continue
+                news["news_date"] = news_date.isoformat()
 
                 news_list.append(news)
 
@@ -122,8 +110,14 @@ def run_daily_scheduler():
         time.sleep(60)  # เช็คทุก 1 นาที
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ดึงข่าว Kaohoon RSS ของหุ้น SET50 แล้ว upsert ลง stock_news")
+    parser.add_argument("--schedule", action="store_true", help="เปิดค้างไว้และรันทุกวันตอน 19:00")
+    args = parser.parse_args()
+
     print("โปรแกรมอัพเดตข่าวหุ้น SET50 เริ่มต้น...")
-    # ถ้าคุณตั้ง Task Scheduler แล้ว → เรียกแค่ update_set50_news() ก็พอ
-    update_set50_news()
-    # ถ้ายังอยากใช้ schedule ในโค้ด (กรณีเปิดสคริปต์ค้าง) ให้ uncomment บรรทัดด้านล่าง
-    # run_daily_scheduler()
\ No newline at end of file
+    if args.schedule:
+        # กรณีเปิดสคริปต์ค้างไว้ ไม่ได้ใช้ Task Scheduler
+        run_daily_scheduler()
+    else:
+        # ถ้าคุณตั้ง Task Scheduler แล้ว → เรียกแค่ update_set50_news() ก็พอ
+        update_set50_news()
\ No newline at end of file
@@ -1,22 +1,23 @@
-import os
-from datetime import datetime
-import yfinance as yf
-import pandas as pd
-from supabase import create_client, Client
+import sys
+import argparse
+from datetime import datetime, date, timedelta
+from clients import supabase
+from storage import fetch_all
+from trading_calendar import missing_sessions
+from run_metrics import metrics, run_record
+from resilience import call, dead_letters, prioritize
+import price_cache
 from dotenv import load_dotenv
 
 # โหลด environment variables จากไฟล์ .env
 load_dotenv()
 
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
+# ชื่องานใน dead_letters.json
+DEAD_LETTER_JOB = "prices"
 
-if not SUPABASE_URL or not SUPABASE_KEY:
-    print("Error: ไม่พบ SUPABASE_URL หรือ SUPABASE_KEY ในไฟล์ .env")
-    print("กรุณาตรวจสอบไฟล์ .env ใน folder เดียวกัน")
-    exit(1)
-
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+# หาวันล่าสุดใน DB ย้อนหลังเท่านี้วัน หุ้นที่ไม่มีราคาในช่วงนี้ (หุ้นใหม่/ขาดนาน) ดึงย้อนเท่านี้วัน
+# (ย้อนหลังทั้งหมดใช้ --period max)
+LOOKBACK_DAYS = 60
 
 # รายชื่อหุ้น SET50 (อัพเดตตามช่วงเวลาปัจจุบัน ธันวาคม 2025 - มิถุนายน 2026)
 # สามารถอัพเดตจาก https://www.set.or.th/th/market/index/set50/overview
@@ -30,53 +31,125 @@ set50_symbols = [
     "TTA.BK", "TU.BK", "VGI.BK", "WHA.BK", "AMATA.BK", "BCH.BK", "CRC.BK", "JMT.BK"
 ]
 
-print(f"กำลังดึงข้อมูลหุ้นทั้ง {len(set50_symbols)} ตัวจาก SET50...")
-
-total_rows = 0
-successful_symbols = 0
-
-for symbol in set50_symbols:
-    ticker = yf.Ticker(symbol)
-    print(f"กำลังดึงข้อมูล {symbol.replace('.BK', '')}...")
-
-    try:
-        df = ticker.history(period="5d")
-        if df.empty:
-            print(f"ไม่พบข้อมูลสำหรับ {symbol}")
-            continue
-
-        # เตรียมข้อมูล
-        df = df.reset_index()
-        df = df[['Date', 'Open', 'High', 'Low', 'Close', 'Volume']]
-        df.columns = ['date', 'open', 'high', 'low', 'close', 'volume']
-        df['symbol'] = symbol.replace('.BK', '')
-        df['date'] = pd.to_datetime(df['date']).dt.strftime('%Y-%m-%d')
-
-        # ลบคอลัมน์ที่ไม่ต้องการ (ป้องกันหลุด id หรือ index)
-        columns_to_drop = ['id', 'index', 'level_0']
-        df = df.drop(columns=[col for col in columns_to_drop if col in df.columns], errors='ignore')
-
-        # เลือกเฉพาะคอลัมน์ที่ส่ง
-        required_columns = ['symbol', 'date', 'open', 'high', 'low', 'close', 'volume']
-        data_to_insert = df[required_columns].to_dict(orient='records')
-
-        # upsert ข้อมูล
-        response = supabase.table('stock_prices').upsert(
-            data_to_insert,
-            on_conflict='symbol, date'
-        ).execute()
-
-        inserted = len(data_to_insert)
-        total_rows += inserted
-        successful_symbols += 1
-        print(f"บันทึก {inserted} แถวสำหรับ {symbol.replace('.BK', '')} สำเร็จ")
-
-    except Exception as e:
-        print(f"เกิดข้อผิดพลาดสำหรับ {symbol}: {e}")
-
-print(f"\nสรุปการทำงาน:")
-print(f"- ดึงข้อมูลสำเร็จทั้งหมด {successful_symbols} / {len(set50_symbols)} ตัว")
-print(f"- บันทึกข้อมูลรวมทั้งสิ้น {total_rows} แถว")
-print(f"- เสร็จสิ้นเวลา {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
 
-input("\nกด Enter เพื่อปิดหน้าต่าง...")
\ No newline at end of file
+def latest_dates(symbols, today=None):
+    """วันที่ล่าสุดใน stock_prices ของแต่ละหุ้น (query เดียว ย้อน LOOKBACK_DAYS) หุ้นที่ไม่มีในช่วงนี้ไม่อยู่ใน dict"""
+    since = (today or date.today()) - timedelta(days=LOOKBACK_DAYS)
+    rows = fetch_all(lambda: supabase.table('stock_prices')
+                     .select('symbol, date')
+                     .in_('symbol', [s.replace('.BK', '') for s in symbols])
+                     .gte('date', since.isoformat())
+                     .order('symbol')
+                     .order('date'))
+    return {row['symbol']: row['date'] for row in rows}
+
+
+def fetch_window(last_date, today=None):
+    """
+    ช่วง (start, end) ที่ต้องดึงจาก session ที่ขาดตาม trading_calendar (end ของ yfinance ไม่รวมวันนั้น)
+    ดึงวันล่าสุดใน DB ซ้ำด้วย (แท่งที่อาจบันทึกระหว่างวัน) คืน None ถ้าไม่มี session ใหม่
+    """
+    today = today or date.today()
+    if last_date is None:
+        return today - timedelta(days=LOOKBACK_DAYS), today + timedelta(days=1)
+    sessions = missing_sessions(last_date, today)
+    if not sessions:
+        return None
+    return date.fromisoformat(str(last_date)[:10]), sessions[-1] + timedelta(days=1)
+
+
+def update_prices(symbols=None, period=None):
+    """
+    ดึงราคาจาก Yahoo แล้ว upsert ลง stock_prices คืน (จำนวนหุ้นที่สำเร็จ, จำนวนแถวที่บันทึก)
+    period=None: ดึงตาม session ที่ขาดของแต่ละหุ้น (หลังวันหยุดยาว/รอบที่พลาดไม่ตกหล่น)
+    ระบุ period (เช่น '365d', 'max') เพื่อดึงช่วงนั้นตรง ๆ
+    """
+    # import ตอนใช้งาน เพื่อให้ import โมดูล/--help ไม่ต้องโหลด yfinance + pandas
+    import yfinance as yf
+    import pandas as pd
+
+    # symbol ที่ล้มจากรอบก่อน (dead-letter) ทำก่อน
+    symbols = prioritize(DEAD_LETTER_JOB, symbols or set50_symbols)
+    print(f"กำลังดึงข้อมูลหุ้นทั้ง {len(symbols)} ตัวจาก SET50...")
+    latest = latest_dates(symbols) if period is None else {}
+
+    total_rows = 0
+    successful_symbols = 0
+    written = []
+
+    for symbol in symbols:
+        ticker = yf.Ticker(symbol)
+        print(f"กำลังดึงข้อมูล {symbol.replace('.BK', '')}...")
+
+        try:
+            if period is None:
+                window = fetch_window(latest.get(symbol.replace('.BK', '')))
+                if window is None:
+                    print(f"{symbol.replace('.BK', '')} ไม่มีวันทำการใหม่ ข้าม")
+                    dead_letters.remove(DEAD_LETTER_JOB, symbol)
+                    continue
+                history = {"start": window[0].isoformat(), "end": window[1].isoformat()}
+            else:
+                history = {"period": period}
+            with metrics.timer("fetch_seconds", host="yahoo"):
+                df = call("yahoo", ticker.history, **history)
+            if df.empty:
+                print(f"ไม่พบข้อมูลสำหรับ {symbol}")
+                dead_letters.remove(DEAD_LETTER_JOB, symbol)
+                continue
+
+            # เตรียมข้อมูล
+            df = df.reset_index()
+            df = df[['Date', 'Open', 'High', 'Low', 'Close', 'Volume']]
+            df.columns = ['date', 'open', 'high', 'low', 'close', 'volume']
+            df['symbol'] = symbol.replace('.BK', '')
+            df['date'] = pd.to_datetime(df['date']).dt.strftime('%Y-%m-%d')
+
+            # ลบคอลัมน์ที่ไม่ต้องการ (ป้องกันหลุด id หรือ index)
+            columns_to_drop = ['id', 'index', 'level_0']
+            df = df.drop(columns=[col for col in columns_to_drop if col in df.columns], errors='ignore')
+
+            # เลือกเฉพาะคอลัมน์ที่ส่ง
+            required_columns = ['symbol', 'date', 'open', 'high', 'low', 'close', 'volume']
+            data_to_insert = df[required_columns].to_dict(orient='records')
+
+            # upsert ข้อมูล
+            query = supabase.table('stock_prices').upsert(
+                data_to_insert,
+                on_conflict='symbol, date'
+            )
+            call("supabase", query.execute)
+
+            inserted = len(data_to_insert)
+            total_rows += inserted
+            successful_symbols += 1
+            written.extend(data_to_insert)
+            dead_letters.remove(DEAD_LETTER_JOB, symbol)
+            print(f"บันทึก {inserted} แถวสำหรับ {symbol.replace('.BK', '')} สำเร็จ")
+
+        except Exception as e:
+            # ล้มหลัง retry (หรือ circuit เปิด) → จดไว้ให้รอบหน้าทำก่อน
+            dead_letters.add(DEAD_LETTER_JOB, symbol, e)
+            print(f"เกิดข้อผิดพลาดสำหรับ {symbol}: {e}")
+
+    dead_letters.save()
+    price_cache.update_quietly(written)
+    return successful_symbols, total_rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ดึงราคาหุ้นจาก Yahoo แล้ว upsert ลง stock_prices")
+    parser.add_argument("--period", help="ช่วงข้อมูลแบบ yfinance เช่น 365d, max (default: เฉพาะวันทำการที่ยังขาด)")
+    args = parser.parse_args()
+
+    with run_record("prices", period=args.period or "missing"):
+        successful_symbols, total_rows = update_prices(period=args.period)
+
+    print(f"\nสรุปการทำงาน:")
+    print(f"- ดึงข้อมูลสำเร็จทั้งหมด {successful_symbols} / {len(set50_symbols)} ตัว")
+    print(f"- บันทึกข้อมูลรวมทั้งสิ้น {total_rows} แถว")
+    print(f"- เสร็จสิ้นเวลา {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+
+    # รอ Enter เฉพาะตอนเปิดจากหน้าต่าง terminal (cron / orchestrator จะไม่ค้าง)
+    if sys.stdin.isatty():
+        input("\nกด Enter เพื่อปิดหน้าต่าง...")
@@ -1,22 +1,18 @@
-import os
+import json
+import time
+import argparse
 import requests
 from bs4 import BeautifulSoup
-import pandas as pd
-from datetime import datetime
-from supabase import create_client, Client
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, date, timedelta
+from clients import supabase, get_session
+from run_metrics import metrics, run_record
 from dotenv import load_dotenv
 
 # โหลด environment variables
 load_dotenv()
 
 # Supabase setup
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-
-if not SUPABASE_URL or not SUPABASE_KEY:
-    raise ValueError("กรุณาตั้งค่า SUPABASE_URL และ SUPABASE_KEY ใน .env")
-
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
 
 # URL ของหน้า รายงานแบบ 59
 BASE_URL = "https://market.sec.or.th/public/idisc/th/r59"
@@ -26,11 +22,42 @@ HEADERS = {
     "Accept-Language": "th-TH,th;q=0.9,en-US;q=0.8,en;q=0.7",
 }
 
+TABLE_NAME = "form_59_reports"
+
+# natural key ของรายการซื้อขาย (ต้องมี unique constraint ตามคอลัมน์นี้ในตาราง)
+FORM59_CONFLICT_KEY = "company_name, executive_name, transaction_date, quantity, price"
+
+# ไฟล์เก็บ watermark รายวัน: วันไหน sync ครบแล้ว (และ sync เมื่อไร)
+WATERMARK_FILE = "form59_watermark.json"
+
+# ยังไม่มี watermark (ติดตั้งใหม่): sync ย้อนหลังเท่านี้วัน
+INITIAL_DAYS = 7
+
+# วันล่าสุดเท่านี้วันถูก sync ซ้ำทุกรอบแม้อยู่ใน watermark แล้ว (รายงานที่ยื่นช้าเข้ามาทีหลัง)
+RECHECK_DAYS = 1
+
+# จำนวน request พร้อมกันสูงสุดต่อ market.sec.or.th (อย่ายิงถี่เกินไป)
+MAX_CONCURRENT_REQUESTS = 3
+
+# แปลงชื่อ column ให้ตรงกับตาราง (snake_case)
+RENAME_MAP = {
+    "ชื่อบริษัท": "company_name",
+    "ชื่อผู้บริหาร": "executive_name",
+    "ความสัมพันธ์ *": "relationship",
+    "ประเภทหลักทรัพย์": "security_type",
+    "วันที่ได้มา/จำหน่าย": "transaction_date",
+    "จำนวน": "quantity",
+    "ราคา": "price",
+    "วิธีการได้มา/จำหน่าย": "method",
+    "หมายเหตุ_URL": "remark_url",
+}
+
 def scrape_form59_data(company=None, date_from=None, date_to=None):
     """
     Scrape ข้อมูลจากหน้าเว็บ
     - ถ้าไม่ใส่เงื่อนไข = ดึงข้อมูล default (ล่าสุด)
     - ถ้าต้องการค้นหา ต้องใช้ selenium เพราะเว็บใช้ JS submit
+    คืน None ถ้าดึงหน้าเว็บหรือหาตารางไม่ได้ (เพื่อแยกจากกรณีที่ไม่มีรายการจริง ๆ)
     """
     params = {}
     if company:
@@ -41,12 +68,13 @@ def scrape_form59_data(company=None, date_from=None, date_to=None):
         params["dateTo"] = date_to
 
     try:
-        response = requests.get(BASE_URL, headers=HEADERS, params=params, timeout=15)
+        response = get_session().get(BASE_URL, headers=HEADERS, params=params, timeout=15)
         response.raise_for_status()
     except requests.RequestException as e:
         print(f"Error fetching page: {e}")
-        return []
+        return None
 
+    parse_started = time.perf_counter()
     soup = BeautifulSoup(response.text, "html.parser")
 
     # หาตาราง (จากโครงสร้างที่พบ = class="result-table")
@@ -54,7 +82,7 @@ def scrape_form59_data(company=None, date_from=None, date_to=None):
     if not table:
         print("ไม่พบตารางผลลัพธ์ อาจถูก block หรือโครงสร้างเว็บเปลี่ยน")
         print(soup.prettify()[:800])  # debug
-        return []
+        return None
 
     # ดึง header
     headers = [th.get_text(strip=True) for th in table.select("thead tr th")]
@@ -78,71 +106,193 @@ def scrape_form59_data(company=None, date_from=None, date_to=None):
         row_data.append(remark_link)
         data.append(row_data)
 
-    # สร้าง DataFrame
+    # สร้าง DataFrame (import pandas ตอนใช้งาน ให้ --help / import โมดูลเร็ว)
+    import pandas as pd
     columns = headers + ["หมายเหตุ_URL"]
     df = pd.DataFrame(data, columns=columns)
+    metrics.observe("parse_seconds", time.perf_counter() - parse_started, source="Form59")
+    metrics.inc("rows_matched", len(df), source="Form59")
 
     return df
 
 
-def insert_to_supabase(df):
-    """ Insert ข้อมูลจาก DataFrame ไปยัง Supabase (แบบ bulk) """
-    if df.empty:
-        print("ไม่มีข้อมูลให้ insert")
-        return
-
-    # แปลงชื่อ column ให้ตรงกับตาราง (snake_case)
-    rename_map = {
-        "ชื่อบริษัท": "company_name",
-        "ชื่อผู้บริหาร": "executive_name",
-        "ความสัมพันธ์ *": "relationship",
-        "ประเภทหลักทรัพย์": "security_type",
-        "วันที่ได้มา/จำหน่าย": "transaction_date",
-        "จำนวน": "quantity",
-        "ราคา": "price",
-        "วิธีการได้มา/จำหน่าย": "method",
-        "หมายเหตุ_URL": "remark_url",
-    }
-
-    df = df.rename(columns=rename_map)
-
-    # แปลงเป็น list of dicts
-    records = df.to_dict(orient="records")
+def prepare_records(df):
+    """
+    rename column + แปลงตัวเลข/วันที่ทั้งคอลัมน์ทีเดียว (vectorized) แล้วคืน list of dicts
+    - จำนวน/ราคา: ตัด ',' แล้วแปลงเป็นตัวเลข ค่าที่แปลงไม่ได้ (เช่น '-') เป็น None
+    - วันที่: 'dd/mm/yyyy' (พ.ศ. หรือ ค.ศ.) -> 'YYYY-MM-DD'
+    """
+    import pandas as pd
+
+    df = df.rename(columns=RENAME_MAP)
+
+    for col in ("quantity", "price"):
+        if col in df.columns:
+            cleaned = df[col].astype(str).str.replace(",", "", regex=False).str.strip()
+            df[col] = pd.to_numeric(cleaned, errors="coerce")
+
+    if "transaction_date" in df.columns:
+        parts = df["transaction_date"].astype(str).str.extract(r"(\d{1,2})/(\d{1,2})/(\d{4})").astype(float)
+        year = parts[2].where(parts[2] < 2400, parts[2] - 543)
+        parsed = pd.to_datetime(
+            pd.DataFrame({"year": year, "month": parts[1], "day": parts[0]}), errors="coerce"
+        )
+        df["transaction_date"] = parsed.dt.strftime("%Y-%m-%d")
+
+    # รายการซ้ำใน batch เดียวกันทำให้ upsert error จึงตัดทิ้งตาม natural key ก่อน
+    key_columns = [c.strip() for c in FORM59_CONFLICT_KEY.split(",") if c.strip() in df.columns]
+    df = df.drop_duplicates(subset=key_columns)
+
+    return df.astype(object).where(df.notna(), None).to_dict(orient="records")
+
+
+def upsert_to_supabase(df):
+    """ Upsert ข้อมูลจาก DataFrame ไปยัง Supabase (แบบ bulk) ตาม natural key รันซ้ำได้ไม่เกิดแถวซ้ำ """
+    if df is None or df.empty:
+        print("ไม่มีข้อมูลให้ upsert")
+        return 0
+
+    records = prepare_records(df)
 
     try:
-        # Insert แบบ bulk (supabase รองรับ list ได้)
         response = (
-            supabase.table("form_59_reports")
-            .insert(records)
+            supabase.table(TABLE_NAME)
+            .upsert(records, on_conflict=FORM59_CONFLICT_KEY)
             .execute()
         )
 
-        print(f"Insert สำเร็จ {len(response.data)} รายการ")
-        print(f"ตัวอย่าง record แรก: {response.data[0] if response.data else 'ไม่มี'}")
+        print(f"Upsert สำเร็จ {len(response.data)} รายการ")
+        return len(records)
 
     except Exception as e:
-        print(f"Error insert to Supabase: {e}")
+        print(f"Error upsert to Supabase: {e}")
         print("ตัวอย่าง record แรกที่ error:", records[0] if records else "ไม่มีข้อมูล")
+        return None
+
+
+# ----------------- sync แบบช่วงวันที่ + watermark -----------------
+
+def load_watermark():
+    """โหลด watermark {'YYYY-MM-DD': เวลาที่ sync} ของวันที่ sync ครบแล้ว"""
+    try:
+        with open(WATERMARK_FILE, encoding="utf-8") as f:
+            return json.load(f).get("synced_days", {})
+    except FileNotFoundError:
+        return {}
+
+
+def save_watermark(synced_days):
+    with open(WATERMARK_FILE, "w", encoding="utf-8") as f:
+        json.dump({"synced_days": dict(sorted(synced_days.items()))}, f, ensure_ascii=False, indent=1)
+
+
+def date_slices(start, end, slice_days):
+    """แบ่งช่วง start..end (รวมปลาย) เป็นช่วงย่อยละ slice_days วัน"""
+    current = start
+    while current <= end:
+        slice_end = min(current + timedelta(days=slice_days - 1), end)
+        yield current, slice_end
+        current = slice_end + timedelta(days=1)
+
+
+def sync_slice(date_from, date_to):
+    """
+    ดึง + upsert ช่วงวันที่เดียว คืนจำนวนรายการ (None ถ้าล้มเหลว)
+    เว็บกรองตามวันที่ยื่นรายงาน ซึ่งมักช้ากว่าวันซื้อขายหลายวัน วันซื้อขายก่อน date_from จึงเป็นเรื่องปกติ
+    (ตารางไม่มีคอลัมน์วันที่ยื่นให้เทียบ) แต่รายงานยื่นก่อนซื้อขายไม่ได้ ถ้ามีวันซื้อขายหลัง date_to
+    แปลว่าเว็บไม่กรอง (คืนหน้าล่าสุดมาแทน) ยังบันทึกรายการที่ได้ แต่คืน None ช่วงนี้จึงไม่ถูกนับว่า sync ครบ
+    """
+    df = scrape_form59_data(date_from=date_from.isoformat(), date_to=date_to.isoformat())
+    if df is None:
+        return None
+    if df.empty:
+        return 0
+    days = [r.get("transaction_date") for r in prepare_records(df)]
+    later = [d for d in days if d and d > date_to.isoformat()]
+    count = upsert_to_supabase(df)
+    if later:
+        print(f"  ! {date_from} ถึง {date_to}: {len(later)} รายการซื้อขายหลังวันสุดท้ายของช่วง (เว็บไม่กรองตามวันที่?)")
+        return None
+    return count
+
+
+def sync_form59(start, end=None, slice_days=1, max_workers=MAX_CONCURRENT_REQUESTS, recheck_from=None):
+    """
+    sync รายงาน 59 ช่วง start..end แบบแบ่ง slice และดึงพร้อมกันไม่เกิน max_workers
+    - ข้ามวันที่อยู่ใน watermark แล้ว (ยกเว้นตั้งแต่ recheck_from ที่ sync ซ้ำเสมอ)
+    - วันนี้ยังไม่ถือว่าครบ (รายงานยังเข้าได้อีก) จึงไม่บันทึกลง watermark
+    """
+    end = end or date.today()
+    synced_days = load_watermark()
+
+    def needs_sync(day):
+        return day.isoformat() not in synced_days or (recheck_from is not None and day >= recheck_from)
+
+    pending = [
+        (d_from, d_to) for d_from, d_to in date_slices(start, end, slice_days)
+        if any(needs_sync(d_from + timedelta(days=i)) for i in range((d_to - d_from).days + 1))
+    ]
+    print(f"Form 59: ต้อง sync {len(pending)} ช่วง ({start} ถึง {end})")
+
+    total = 0
+    synced_at = datetime.now().isoformat(timespec="seconds")
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        results = pool.map(lambda r: sync_slice(*r), pending)
+        for (d_from, d_to), count in zip(pending, results):
+            if count is None:
+                print(f"  ✗ {d_from} ถึง {d_to} ล้มเหลว จะลองใหม่รอบหน้า")
+                continue
+            total += count
+            print(f"  ✓ {d_from} ถึง {d_to}: {count} รายการ")
+            for i in range((d_to - d_from).days + 1):
+                day = d_from + timedelta(days=i)
+                if day < date.today():
+                    synced_days[day.isoformat()] = synced_at
+
+    save_watermark(synced_days)
+    print(f"Form 59: sync รวม {total} รายการ")
+    return total
+
+
+def sync_form59_incremental():
+    """
+    sync ตั้งแต่วันแรกที่ยังไม่มีใน watermark จนถึงวันนี้ (ไม่มี watermark: ย้อนหลัง INITIAL_DAYS วัน)
+    RECHECK_DAYS วันล่าสุดถูก sync ซ้ำเสมอ รายงานที่ยื่นช้าของเมื่อวานจึงไม่หาย
+    ถ้ารอบก่อนมีวันที่ล้มเหลวก็จะถูกดึงซ้ำในรอบนี้
+    """
+    today = date.today()
+    recheck_from = today - timedelta(days=RECHECK_DAYS)
+    synced_days = load_watermark()
+    if synced_days:
+        start = date.fromisoformat(min(synced_days))
+        while start.isoformat() in synced_days:
+            start += timedelta(days=1)
+    else:
+        start = today - timedelta(days=INITIAL_DAYS)
+    return sync_form59(min(start, recheck_from), recheck_from=recheck_from)
 
 
 # ----------------- ตัวอย่างการใช้งาน -----------------
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scrape รายงานแบบ 59 จาก ก.ล.ต. แล้ว upsert ลง Supabase")
+    parser.add_argument("--backfill-from", help="ดึงย้อนหลังตั้งแต่วันที่นี้ (YYYY-MM-DD)")
+    parser.add_argument("--to", help="วันสุดท้ายของช่วง (YYYY-MM-DD, default วันนี้)")
+    parser.add_argument("--slice-days", type=int, default=1, help="จำนวนวันต่อ request ตอน backfill")
+    args = parser.parse_args()
+
     print(f"เริ่ม scrape Form 59 - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
 
-    # ตัวอย่าง 1: ดึงข้อมูล default (วันล่าสุด)
-    df_default = scrape_form59_data()
-    if not df_default.empty:
-        print(f"พบ {len(df_default)} รายการ")
-        print(df_default.head(3))
-        insert_to_supabase(df_default)
-
-    # ตัวอย่าง 2: ค้นหาเฉพาะบริษัท + ช่วงวันที่ (อาจต้องใช้ selenium ถ้าไม่ทำงาน)
-    # df_search = scrape_form59_data(
-    #     company="เกียรตินาคินภัทร",
-    #     date_from="2026-01-01",
-    #     date_to="2026-01-22"
-    # )
-    # insert_to_supabase(df_search)
-
-    print("เสร็จสิ้น")
\ No newline at end of file
+    with run_record("form59"):
+        if args.backfill_from:
+            # ดึงประวัติย้อนหลังเป็นช่วง ๆ (วันที่ sync แล้วจะถูกข้าม)
+            sync_form59(
+                date.fromisoformat(args.backfill_from),
+                date.fromisoformat(args.to) if args.to else None,
+                slice_days=args.slice_days,
+            )
+        else:
+            # ปกติ: ดึงเฉพาะวันที่ยังไม่ได้ sync
+            sync_form59_incremental()
+
+    print("เสร็จสิ้น")
@@ -1,54 +1,43 @@
-import os
 import re
 import time
+import argparse
 from datetime import datetime
 from dotenv import load_dotenv
 
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from webdriver_manager.chrome import ChromeDriverManager
-
-from supabase import create_client, Client
+from clients import supabase, get_driver, close_all
 
 # โหลด environment variables
 load_dotenv()
 
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-
 TABLE_NAME = "news_set"
+NEWS_URL = "https://www.set.or.th/th/market/news-and-alert/news"
 
-# ====================== Selenium Setup ======================
-options = Options()
-# options.add_argument("--headless=new")  # comment ออกเพื่อดูหน้า browser ถ้าต้องการ debug
-options.add_argument("--no-sandbox")
-options.add_argument("--disable-dev-shm-usage")
-options.add_argument("--disable-blink-features=AutomationControlled")
 
-driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
-wait = WebDriverWait(driver, 20)
+# ====================== Selenium Setup ======================
+def open_news_page(driver, wait):
+    """เปิดหน้าข่าว SET + กดยอมรับ cookie (selenium import ตอนใช้งานจริงเท่านั้น)"""
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support import expected_conditions as EC
 
-driver.get("https://www.set.or.th/th/market/news-and-alert/news")
+    driver.get(NEWS_URL)
 
-# จัดการ Cookie ถ้ามี
-try:
-    accept_btn = wait.until(
-        EC.element_to_be_clickable((By.CSS_SELECTOR, "button[class*='accept'], button[id*='cookie'], button[contains(., 'ยอมรับ')]"))
-    )
-    accept_btn.click()
-    print("✓ ยอมรับ cookie แล้ว")
-except:
-    print("ไม่มี cookie modal หรือกดไม่ได้")
+    # จัดการ Cookie ถ้ามี
+    try:
+        accept_btn = wait.until(
+            EC.element_to_be_clickable((By.CSS_SELECTOR, "button[class*='accept'], button[id*='cookie'], button[contains(., 'ยอมรับ')]"))
+        )
+        accept_btn.click()
+        print("✓ ยอมรับ cookie แล้ว")
+    except:
+        print("ไม่มี cookie modal หรือกดไม่ได้")
 
-time.sleep(3)  # รอหน้าโหลด JS
+    time.sleep(3)  # รอหน้าโหลด JS
 
 # ====================== ฟังก์ชัน scrape หน้าเดียว ======================
-def scrape_page(page_num: int):
+def scrape_page(driver, wait, page_num: int):
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support import expected_conditions as EC
+
     try:
         # รอ container หลัก
         wait.until(EC.presence_of_element_located((By.ID, "news-alert-tab-news")))
@@ -110,44 +99,64 @@ def scrape_page(page_num: int):
         return 0
 
 # ====================== Pagination Loop ======================
-page = 1
-max_pages = 5  # ปรับได้ หรือตั้ง None เพื่อ scrape ทุกหน้า
-total_inserted = 0
+def scrape_set_news(max_pages=5):
+    """scrape ข่าว SET ทีละหน้าจนหมดหรือครบ max_pages (None = ทุกหน้า) คืนจำนวนที่บันทึก"""
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
+
+    driver = get_driver()
+    wait = WebDriverWait(driver, 20)
+    open_news_page(driver, wait)
+
+    page = 1
+    total_inserted = 0
+
+    while True:
+        print(f"\n================ หน้า {page} ================")
+        inserted = scrape_page(driver, wait, page)
+        total_inserted += inserted
+
+        if inserted == 0 and page > 1:
+            print("ไม่พบข้อมูลเพิ่มเติม → จบการ scrape")
+            break
 
-while True:
-    print(f"\n================ หน้า {page} ================")
-    inserted = scrape_page(page)
-    total_inserted += inserted
+        try:
+            # ปุ่มถัดไป (ลองหลาย pattern)
+            next_btn = wait.until(EC.element_to_be_clickable((
+                By.CSS_SELECTOR,
+                "button[aria-label='ถัดไป'], button.next, .ant-pagination-next button, "
+                "button[class*='next'], li.next button, [aria-label*='next']"
+            )))
 
-    if inserted == 0 and page > 1:
-        print("ไม่พบข้อมูลเพิ่มเติม → จบการ scrape")
-        break
+            if "disabled" in (next_btn.get_attribute("class") or "") or next_btn.get_attribute("disabled"):
+                print("ปุ่มถัดไปถูก disable แล้ว → จบ")
+                break
 
-    try:
-        # ปุ่มถัดไป (ลองหลาย pattern)
-        next_btn = wait.until(EC.element_to_be_clickable((
-            By.CSS_SELECTOR,
-            "button[aria-label='ถัดไป'], button.next, .ant-pagination-next button, "
-            "button[class*='next'], li.next button, [aria-label*='next']"
-        )))
-
-        if "disabled" in (next_btn.get_attribute("class") or "") or next_btn.get_attribute("disabled"):
-            print("ปุ่มถัดไปถูก disable แล้ว → จบ")
-            break
+            next_btn.click()
+            time.sleep(4)  # รอหน้าใหม่โหลด
+            page += 1
 
-        next_btn.click()
-        time.sleep(4)  # รอหน้าใหม่โหลด
-        page += 1
+            if max_pages is not None and page > max_pages:
+                print(f"ถึงจำนวนหน้าสูงสุดที่กำหนด ({max_pages})")
+                break
 
-        if max_pages is not None and page > max_pages:
-            print(f"ถึงจำนวนหน้าสูงสุดที่กำหนด ({max_pages})")
+        except Exception as pag_e:
+            print(f"ไม่พบปุ่มถัดไปหรือ timeout → จบ ({str(pag_e)[:80]})")
             break
 
-    except Exception as pag_e:
-        print(f"ไม่พบปุ่มถัดไปหรือ timeout → จบ ({str(pag_e)[:80]})")
-        break
+    return total_inserted
 
-driver.quit()
 
-print("\n================ เสร็จสิ้น ================")
-print(f"รวมบันทึกทั้งหมด: {total_inserted} รายการ")
\ No newline at end of file
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scrape ข่าวจากหน้า news-and-alert ของ SET แล้ว upsert ลง news_set")
+    parser.add_argument("--max-pages", type=int, default=5, help="จำนวนหน้าสูงสุด (0 = ทุกหน้า)")
+    args = parser.parse_args()
+
+    try:
+        total_inserted = scrape_set_news(args.max_pages or None)
+    finally:
+        close_all()
+
+    print("\n================ เสร็จสิ้น ================")
+    print(f"รวมบันทึกทั้งหมด: {total_inserted} รายการ")
@@ -1,25 +1,16 @@
-import os
 import time
+import argparse
 from datetime import datetime, timedelta
-import yfinance as yf
-import pandas as pd
-from supabase import create_client, Client
+from clients import supabase
+from run_metrics import metrics, run_record
+from trading_calendar import missing_sessions
+import price_cache
 from dotenv import load_dotenv
 import schedule
 
 # โหลด environment variables จาก .env
 load_dotenv()
 
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-
-if not SUPABASE_URL or not SUPABASE_KEY:
-    print("Error: ไม่พบ SUPABASE_URL หรือ SUPABASE_KEY ในไฟล์ .env")
-    print("กรุณาตรวจสอบไฟล์ .env ใน folder เดียวกัน")
-    exit(1)
-
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-
 # หุ้นที่ต้องการดึง (ใช้ตัวเดียวก่อนตามที่ขอ)
 SYMBOL = "SECURE.BK"  # ถ้าต้องการเปลี่ยนหุ้น แก้บรรทัดนี้
 
@@ -48,21 +39,32 @@ def update_stock_data():
     """ฟังก์ชันหลักในการอัพเดตข้อมูลหุ้น"""
     print(f"\nเริ่มอัพเดตข้อมูล {SYMBOL.replace('.BK', '')} - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
 
-    ticker = yf.Ticker(SYMBOL)
-
-    # ดึงวันที่ล่าสุดจาก DB
+    # ดึงวันที่ล่าสุดจาก DB แล้วหา session ที่ยังขาดจากปฏิทินตลาด
     latest_db_date = get_latest_date_in_db(SYMBOL)
+    sessions = missing_sessions(latest_db_date)
+
+    if sessions is not None and not sessions:
+        print("ไม่มีวันทำการใหม่ตั้งแต่ข้อมูลล่าสุด (วันหยุด/เสาร์-อาทิตย์) → ไม่ต้องดึง")
+        return
+
+    # import ตอนใช้งาน เพื่อให้ import โมดูล/--help และวันที่ไม่มีอะไรให้ดึง ไม่ต้องโหลด yfinance + pandas
+    import yfinance as yf
+    import pandas as pd
+
+    ticker = yf.Ticker(SYMBOL)
 
-    if latest_db_date:
-        # ดึงข้อมูลใหม่ตั้งแต่วันถัดไป
-        start_date = (latest_db_date + timedelta(days=1)).strftime('%Y-%m-%d')
-        end_date = datetime.now().strftime('%Y-%m-%d')
-        print(f"ดึงข้อมูลใหม่ตั้งแต่ {start_date} ถึง {end_date}")
-        df = ticker.history(start=start_date, end=end_date)
+    if sessions:
+        # ดึงเฉพาะช่วง session ที่ขาด (end ของ yfinance ไม่รวมวันนั้น จึง +1 วัน)
+        start_date = sessions[0].strftime('%Y-%m-%d')
+        end_date = (sessions[-1] + timedelta(days=1)).strftime('%Y-%m-%d')
+        print(f"ดึงข้อมูลใหม่ {len(sessions)} วันทำการ ตั้งแต่ {start_date} ถึง {sessions[-1]}")
+        with metrics.timer("fetch_seconds", host="yahoo"):
+            df = ticker.history(start=start_date, end=end_date)
     else:
         # ครั้งแรก ดึงทั้งหมด
         print("ดึงข้อมูลย้อนหลังทั้งหมด (ครั้งแรก)")
-        df = ticker.history(period="max")
+        with metrics.timer("fetch_seconds", host="yahoo"):
+            df = ticker.history(period="max")
 
     if df.empty:
         print(f"ไม่พบข้อมูลใหม่สำหรับ {SYMBOL}")
@@ -90,6 +92,7 @@ def update_stock_data():
 
         inserted = len(data_to_insert)
         print(f"บันทึก/อัพเดต {inserted} แถวสำเร็จ")
+        price_cache.update_quietly(data_to_insert)
         
         # แสดงตัวอย่างข้อมูลล่าสุด
         print("\nข้อมูลล่าสุด 3 แถว:")
@@ -113,5 +116,13 @@ def run_scheduler():
         time.sleep(60)  # เช็คทุก 1 นาที
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=f"อัพเดตราคา {SYMBOL} ลง stock_prices ทุกวันหลังตลาดปิด")
+    parser.add_argument("--once", action="store_true", help="อัพเดตครั้งเดียวแล้วจบ ไม่ต้องรอ scheduler")
+    args = parser.parse_args()
+
     print(f"โปรแกรมอัพเดตข้อมูลหุ้น {SYMBOL.replace('.BK', '')} เริ่มต้น...")
-    run_scheduler()
\ No newline at end of file
+    if args.once:
+        with run_record("prices_secure"):
+            update_stock_data()
+    else:
+        run_scheduler()
\ No newline at end of file
@@ -1,22 +1,17 @@
-import os
+import sys
+import argparse
 from datetime import datetime
-import yfinance as yf
-import pandas as pd
-from supabase import create_client, Client
+from clients import supabase
+from run_metrics import metrics, run_record
+from resilience import call, dead_letters, prioritize
+import price_cache
 from dotenv import load_dotenv
 
 # โหลด environment variables จากไฟล์ .env
 load_dotenv()
 
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-
-if not SUPABASE_URL or not SUPABASE_KEY:
-    print("Error: ไม่พบ SUPABASE_URL หรือ SUPABASE_KEY ในไฟล์ .env")
-    print("กรุณาตรวจสอบไฟล์ .env ใน folder เดียวกัน")
-    exit(1)
-
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+# ชื่องานใน dead_letters.json
+DEAD_LETTER_JOB = "prices_365d"
 
 # รายชื่อหุ้น SET50 (อัพเดตตามช่วงเวลาปัจจุบัน ธันวาคม 2025 - มิถุนายน 2026)
 # สามารถอัพเดตจาก https://www.set.or.th/th/market/index/set50/overview
@@ -24,53 +19,85 @@ set50_symbols = [
     "TEAMG.BK", "SECURE.BK", 
 ]
 
-print(f"กำลังดึงข้อมูลหุ้นทั้ง {len(set50_symbols)} ตัวจาก SET50...")
-
-total_rows = 0
-successful_symbols = 0
-
-for symbol in set50_symbols:
-    ticker = yf.Ticker(symbol)
-    print(f"กำลังดึงข้อมูล {symbol.replace('.BK', '')}...")
-
-    try:
-        df = ticker.history(period="365d")
-        if df.empty:
-            print(f"ไม่พบข้อมูลสำหรับ {symbol}")
-            continue
-
-        # เตรียมข้อมูล
-        df = df.reset_index()
-        df = df[['Date', 'Open', 'High', 'Low', 'Close', 'Volume']]
-        df.columns = ['date', 'open', 'high', 'low', 'close', 'volume']
-        df['symbol'] = symbol.replace('.BK', '')
-        df['date'] = pd.to_datetime(df['date']).dt.strftime('%Y-%m-%d')
-
-        # ลบคอลัมน์ที่ไม่ต้องการ (ป้องกันหลุด id หรือ index)
-        columns_to_drop = ['id', 'index', 'level_0']
-        df = df.drop(columns=[col for col in columns_to_drop if col in df.columns], errors='ignore')
-
-        # เลือกเฉพาะคอลัมน์ที่ส่ง
-        required_columns = ['symbol', 'date', 'open', 'high', 'low', 'close', 'volume']
-        data_to_insert = df[required_columns].to_dict(orient='records')
-
-        # upsert ข้อมูล
-        response = supabase.table('stock_prices').upsert(
-            data_to_insert,
-            on_conflict='symbol, date'
-        ).execute()
-
-        inserted = len(data_to_insert)
-        total_rows += inserted
-        successful_symbols += 1
-        print(f"บันทึก {inserted} แถวสำหรับ {symbol.replace('.BK', '')} สำเร็จ")
-
-    except Exception as e:
-        print(f"เกิดข้อผิดพลาดสำหรับ {symbol}: {e}")
-
-print(f"\nสรุปการทำงาน:")
-print(f"- ดึงข้อมูลสำเร็จทั้งหมด {successful_symbols} / {len(set50_symbols)} ตัว")
-print(f"- บันทึกข้อมูลรวมทั้งสิ้น {total_rows} แถว")
-print(f"- เสร็จสิ้นเวลา {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
 
-input("\nกด Enter เพื่อปิดหน้าต่าง...")
\ No newline at end of file
+def update_prices(symbols=None, period="365d"):
+    """ดึงราคาจาก Yahoo แล้ว upsert ลง stock_prices คืน (จำนวนหุ้นที่สำเร็จ, จำนวนแถวที่บันทึก)"""
+    # import ตอนใช้งาน เพื่อให้ import โมดูล/--help ไม่ต้องโหลด yfinance + pandas
+    import yfinance as yf
+    import pandas as pd
+
+    # symbol ที่ล้มจากรอบก่อน (dead-letter) ทำก่อน
+    symbols = prioritize(DEAD_LETTER_JOB, symbols or set50_symbols)
+    print(f"กำลังดึงข้อมูลหุ้นทั้ง {len(symbols)} ตัวจาก SET50...")
+
+    total_rows = 0
+    successful_symbols = 0
+    written = []
+
+    for symbol in symbols:
+        ticker = yf.Ticker(symbol)
+        print(f"กำลังดึงข้อมูล {symbol.replace('.BK', '')}...")
+
+        try:
+            with metrics.timer("fetch_seconds", host="yahoo"):
+                df = call("yahoo", ticker.history, period=period)
+            if df.empty:
+                print(f"ไม่พบข้อมูลสำหรับ {symbol}")
+                dead_letters.remove(DEAD_LETTER_JOB, symbol)
+                continue
+
+            # เตรียมข้อมูล
+            df = df.reset_index()
+            df = df[['Date', 'Open', 'High', 'Low', 'Close', 'Volume']]
+            df.columns = ['date', 'open', 'high', 'low', 'close', 'volume']
+            df['symbol'] = symbol.replace('.BK', '')
+            df['date'] = pd.to_datetime(df['date']).dt.strftime('%Y-%m-%d')
+
+            # ลบคอลัมน์ที่ไม่ต้องการ (ป้องกันหลุด id หรือ index)
+            columns_to_drop = ['id', 'index', 'level_0']
+            df = df.drop(columns=[col for col in columns_to_drop if col in df.columns], errors='ignore')
+
+            # เลือกเฉพาะคอลัมน์ที่ส่ง
+            required_columns = ['symbol', 'date', 'open', 'high', 'low', 'close', 'volume']
+            data_to_insert = df[required_columns].to_dict(orient='records')
+
+            # upsert ข้อมูล
+            query = supabase.table('stock_prices').upsert(
+                data_to_insert,
+                on_conflict='symbol, date'
+            )
+            call("supabase", query.execute)
+
+            inserted = len(data_to_insert)
+            total_rows += inserted
+            successful_symbols += 1
+            written.extend(data_to_insert)
+            dead_letters.remove(DEAD_LETTER_JOB, symbol)
+            print(f"บันทึก {inserted} แถวสำหรับ {symbol.replace('.BK', '')} สำเร็จ")
+
+        except Exception as e:
+            # ล้มหลัง retry (หรือ circuit เปิด) → จดไว้ให้รอบหน้าทำก่อน
+            dead_letters.add(DEAD_LETTER_JOB, symbol, e)
+            print(f"เกิดข้อผิดพลาดสำหรับ {symbol}: {e}")
+
+    dead_letters.save()
+    price_cache.update_quietly(written)
+    return successful_symbols, total_rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ดึงราคาหุ้นจาก Yahoo แล้ว upsert ลง stock_prices")
+    parser.add_argument("--period", default="365d", help="ช่วงข้อมูลแบบ yfinance เช่น 5d, 365d, max")
+    args = parser.parse_args()
+
+    with run_record("prices_365d", period=args.period):
+        successful_symbols, total_rows = update_prices(period=args.period)
+
+    print(f"\nสรุปการทำงาน:")
+    print(f"- ดึงข้อมูลสำเร็จทั้งหมด {successful_symbols} / {len(set50_symbols)} ตัว")
+    print(f"- บันทึกข้อมูลรวมทั้งสิ้น {total_rows} แถว")
+    print(f"- เสร็จสิ้นเวลา {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+
+    # รอ Enter เฉพาะตอนเปิดจากหน้าต่าง terminal (cron / orchestrator จะไม่ค้าง)
+    if sys.stdin.isatty():
+        input("\nกด Enter เพื่อปิดหน้าต่าง...")
@@ -0,0 +1,554 @@
+"""
+Storage backend กลางของทุกสคริปต์
+
+เลือก backend ด้วย env TEAMG_STORAGE
+- ไม่ตั้ง หรือ 'supabase'        → Supabase จริง (ใช้ SUPABASE_URL / SUPABASE_KEY)
+- 'memory'                      → LocalClient บน SQLite ใน memory (หายเมื่อจบ process)
+- 'sqlite:///path/to/file.db'   → LocalClient บนไฟล์ SQLite
+
+LocalClient เลียนแบบ API ของ supabase-py เท่าที่สคริปต์ในโปรเจกต์ใช้
+table().select/insert/upsert(on_conflict=...)/update/delete + filter eq/gt/gte/lt/lte/in_/ilike/order/limit
+ใช้ทดสอบและ benchmark ฝั่งเขียนข้อมูลแบบ offline ได้ และนับ request/แถว/ไบต์ ที่ส่งไว้ใน client.stats
+
+ทุก request ผ่าน MeteredClient: จับเวลา/นับ request แถว และไบต์ ต่อ table ลง run_metrics
+
+ถ้าตั้ง TEAMG_RECORD_DIR ทุก insert/upsert จะถูกบันทึกเป็น JSONL ต่อ table เพื่อเอาไป replay ใน bench_writers.py
+"""
+import os
+import re
+import sys
+import json
+import sqlite3
+import threading
+from collections import defaultdict
+
+from dotenv import load_dotenv
+
+from run_metrics import metrics
+
+# primary key ของตารางที่สคริปต์ upsert โดยไม่ระบุ on_conflict (PostgREST ใช้ primary key ให้เอง)
+DEFAULT_CONFLICT_KEYS = {
+    "teamg_master_analysis": "symbol, date",
+    "news_sentiment": "symbol, date",
+}
+
+_IDENT_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+class LocalAPIError(Exception):
+    """error ฝั่ง LocalClient (เทียบเท่า postgrest APIError)"""
+
+
+class LocalResponse:
+    """ผลลัพธ์แบบเดียวกับ APIResponse ของ supabase-py (ใช้แค่ .data และ .count)"""
+
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+
+def _quote(name):
+    name = name.strip()
+    if not _IDENT_RE.match(name):
+        raise LocalAPIError(f"ชื่อ table/column ไม่ถูกต้อง: {name!r}")
+    return f'"{name}"'
+
+
+def _split_columns(columns):
+    return [c.strip() for c in columns.split(",") if c.strip()]
+
+
+def _to_sql_value(value):
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False, default=str)
+    if value is not None and not isinstance(value, (str, int, float, bytes)):
+        return str(value)
+    return value
+
+
+def payload_size(rows):
+    """ขนาด payload (ไบต์) แบบเดียวกับที่ส่งเป็น JSON ไป PostgREST"""
+    return len(json.dumps(rows, ensure_ascii=False, default=str).encode("utf-8"))
+
+
+class LocalQuery:
+    """query builder ของ LocalClient (สร้างใหม่ทุกครั้งที่เรียก client.table())"""
+
+    def __init__(self, client, table):
+        self._client = client
+        self._table = table
+        self._op = "select"
+        self._columns = "*"
+        self._rows = None
+        self._values = None
+        self._on_conflict = None
+        self._ignore_duplicates = False
+        self._count = None
+        self._filters = []
+        self._order = []
+        self._limit = None
+        self._offset = None
+
+    # ---------- operations ----------
+    def select(self, columns="*", count=None):
+        self._op, self._columns, self._count = "select", columns, count
+        return self
+
+    def insert(self, rows, **kwargs):
+        self._op, self._rows = "insert", rows
+        return self
+
+    def upsert(self, rows, on_conflict=None, ignore_duplicates=False, **kwargs):
+        self._op, self._rows = "upsert", rows
+        self._on_conflict, self._ignore_duplicates = on_conflict, ignore_duplicates
+        return self
+
+    def update(self, values, **kwargs):
+        self._op, self._values = "update", values
+        return self
+
+    def delete(self, **kwargs):
+        self._op = "delete"
+        return self
+
+    # ---------- filters ----------
+    def _filter(self, column, op, value):
+        self._filters.append((column, op, value))
+        return self
+
+    def eq(self, column, value):
+        return self._filter(column, "=", value)
+
+    def neq(self, column, value):
+        return self._filter(column, "!=", value)
+
+    def gt(self, column, value):
+        return self._filter(column, ">", value)
+
+    def gte(self, column, value):
+        return self._filter(column, ">=", value)
+
+    def lt(self, column, value):
+        return self._filter(column, "<", value)
+
+    def lte(self, column, value):
+        return self._filter(column, "<=", value)
+
+    def like(self, column, pattern):
+        return self._filter(column, "LIKE", pattern.replace("*", "%"))
+
+    def ilike(self, column, pattern):
+        # LIKE ของ SQLite ไม่สนตัวพิมพ์ (ASCII) อยู่แล้ว
+        return self._filter(column, "LIKE", pattern.replace("*", "%"))
+
+    def in_(self, column, values):
+        return self._filter(column, "IN", list(values))
+
+    def is_(self, column, value):
+        return self._filter(column, "IS", None if value in (None, "null") else value)
+
+    def order(self, column, desc=False, **kwargs):
+        self._order.append((column, desc))
+        return self
+
+    def limit(self, size, **kwargs):
+        self._limit = size
+        return self
+
+    def range(self, start, end, **kwargs):
+        self._offset, self._limit = start, end - start + 1
+        return self
+
+    def execute(self):
+        return self._client._execute(self)
+
+    # ---------- SQL helpers ----------
+    def _where(self, existing_columns):
+        clauses, params = [], []
+        for column, op, value in self._filters:
+            if column not in existing_columns:
+                # column ที่ยังไม่เคยเขียน = ทุกแถวเป็น NULL
+                clauses.append("0" if op != "IS" or value is not None else "1")
+                continue
+            if op == "IN":
+                if not value:
+                    clauses.append("0")
+                    continue
+                clauses.append(f"{_quote(column)} IN ({', '.join('?' for _ in value)})")
+                params.extend(_to_sql_value(v) for v in value)
+            elif op == "IS":
+                clauses.append(f"{_quote(column)} IS {'NULL' if value is None else '?'}")
+                if value is not None:
+                    params.append(_to_sql_value(value))
+            else:
+                clauses.append(f"{_quote(column)} {op} ?")
+                params.append(_to_sql_value(value))
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+
+class LocalClient:
+    """
+    stand-in ของ Supabase client บน SQLite
+    schema ถูกสร้างอัตโนมัติจาก key ของแถวแรกที่เขียน (เพิ่ม column ใหม่ให้เองเมื่อเจอ)
+    ทุก table มี column id (autoincrement) เหมือนตารางใน Supabase
+    """
+
+    def __init__(self, path=":memory:"):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.RLock()
+        self._columns = {}
+        self.stats = defaultdict(lambda: {"requests": 0, "rows": 0, "bytes": 0})
+
+    def table(self, name):
+        return LocalQuery(self, name)
+
+    # supabase-py มีทั้ง table() และ from_()
+    from_ = table
+
+    def reset_stats(self):
+        self.stats.clear()
+
+    # ---------- schema ----------
+    def _table_columns(self, table):
+        if table not in self._columns:
+            rows = self._conn.execute(f"PRAGMA table_info({_quote(table)})").fetchall()
+            if not rows:
+                return set()
+            self._columns[table] = {r["name"] for r in rows}
+        return self._columns[table]
+
+    def _ensure_table(self, table, columns):
+        existing = self._table_columns(table)
+        if not existing:
+            self._conn.execute(f"CREATE TABLE {_quote(table)} (id INTEGER PRIMARY KEY AUTOINCREMENT)")
+            existing = self._columns[table] = {"id"}
+        for column in columns:
+            if column not in existing:
+                self._conn.execute(f"ALTER TABLE {_quote(table)} ADD COLUMN {_quote(column)}")
+                existing.add(column)
+
+    def _ensure_unique_index(self, table, keys):
+        index_name = "ux_" + table + "_" + "_".join(keys)
+        cols = ", ".join(_quote(k) for k in keys)
+        try:
+            self._conn.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS {_quote(index_name)} ON {_quote(table)} ({cols})")
+        except sqlite3.IntegrityError as e:
+            raise LocalAPIError(f"ข้อมูลเดิมใน {table} ซ้ำตาม {keys} สร้าง unique index ไม่ได้: {e}")
+
+    # ---------- execute ----------
+    def _execute(self, query):
+        with self._lock:
+            if query._op in ("insert", "upsert"):
+                return self._write(query)
+            if query._op == "select":
+                return self._select(query)
+            if query._op == "update":
+                return self._update(query)
+            return self._delete(query)
+
+    def _write(self, query):
+        rows = query._rows
+        if isinstance(rows, dict):
+            rows = [rows]
+        rows = list(rows or [])
+
+        stats = self.stats[query._table]
+        stats["requests"] += 1
+        stats["rows"] += len(rows)
+        stats["bytes"] += payload_size(rows)
+
+        if not rows:
+            return LocalResponse([])
+
+        columns = []
+        for row in rows:
+            for key in row:
+                if key not in columns:
+                    columns.append(key)
+        self._ensure_table(query._table, columns)
+
+        col_sql = ", ".join(_quote(c) for c in columns)
+        placeholders = ", ".join("?" for _ in columns)
+        sql = f"INSERT INTO {_quote(query._table)} ({col_sql}) VALUES ({placeholders})"
+
+        if query._op == "upsert":
+            conflict = query._on_conflict or DEFAULT_CONFLICT_KEYS.get(query._table)
+            if conflict:
+                keys = _split_columns(conflict)
+                self._ensure_table(query._table, keys)
+                self._ensure_unique_index(query._table, keys)
+
+                # PostgREST ไม่ยอมให้ batch เดียวมี key ซ้ำกัน (ON CONFLICT ... cannot affect row a second time)
+                seen = set()
+                for row in rows:
+                    key = tuple(_to_sql_value(row.get(k)) for k in keys)
+                    if None not in key and key in seen:
+                        raise LocalAPIError(f"upsert {query._table}: key ซ้ำใน batch เดียวกัน {key}")
+                    seen.add(key)
+
+                updates = [c for c in columns if c not in keys]
+                target = ", ".join(_quote(k) for k in keys)
+                if query._ignore_duplicates or not updates:
+                    sql += f" ON CONFLICT ({target}) DO NOTHING"
+                else:
+                    sets = ", ".join(f"{_quote(c)} = excluded.{_quote(c)}" for c in updates)
+                    sql += f" ON CONFLICT ({target}) DO UPDATE SET {sets}"
+
+        values = [tuple(_to_sql_value(row.get(c)) for c in columns) for row in rows]
+        try:
+            with self._conn:
+                self._conn.executemany(sql, values)
+        except sqlite3.IntegrityError as e:
+            raise LocalAPIError(f"{query._op} {query._table}: {e}")
+        return LocalResponse(rows)
+
+    def _select(self, query):
+        existing = self._table_columns(query._table)
+        if not existing:
+            return LocalResponse([], 0 if query._count else None)
+
+        if query._columns.strip() == "*":
+            col_sql = "*"
+        else:
+            wanted = _split_columns(query._columns)
+            col_sql = ", ".join(_quote(c) if c in existing else f"NULL AS {_quote(c)}" for c in wanted)
+
+        where, params = query._where(existing)
+        sql = f"SELECT {col_sql} FROM {_quote(query._table)}{where}"
+        order = [(c, desc) for c, desc in query._order if c in existing]
+        if order:
+            sql += " ORDER BY " + ", ".join(f"{_quote(c)} {'DESC' if desc else 'ASC'}" for c, desc in order)
+        if query._limit is not None:
+            sql += f" LIMIT {int(query._limit)}"
+            if query._offset:
+                sql += f" OFFSET {int(query._offset)}"
+
+        data = [dict(r) for r in self._conn.execute(sql, params).fetchall()]
+        count = None
+        if query._count:
+            count = self._conn.execute(f"SELECT COUNT(*) FROM {_quote(query._table)}{where}", params).fetchone()[0]
+        return LocalResponse(data, count)
+
+    def _update(self, query):
+        existing = self._table_columns(query._table)
+        if not existing:
+            return LocalResponse([])
+        self._ensure_table(query._table, query._values.keys())
+        sets = ", ".join(f"{_quote(c)} = ?" for c in query._values)
+        where, params = query._where(existing)
+        with self._conn:
+            self._conn.execute(
+                f"UPDATE {_quote(query._table)} SET {sets}{where}",
+                [_to_sql_value(v) for v in query._values.values()] + params,
+            )
+        return LocalResponse([query._values])
+
+    def _delete(self, query):
+        existing = self._table_columns(query._table)
+        if not existing:
+            return LocalResponse([])
+        where, params = query._where(existing)
+        with self._conn:
+            self._conn.execute(f"DELETE FROM {_quote(query._table)}{where}", params)
+        return LocalResponse([])
+
+
+class _RecordingTable:
+    """ห่อ query builder ของ client จริง แล้วบันทึก payload ของ insert/upsert ก่อนส่งต่อ"""
+
+    def __init__(self, recorder, name, builder):
+        self._recorder = recorder
+        self._name = name
+        self._builder = builder
+
+    def insert(self, rows, **kwargs):
+        self._recorder.record(self._name, "insert", rows, None)
+        return self._builder.insert(rows, **kwargs)
+
+    def upsert(self, rows, on_conflict=None, **kwargs):
+        self._recorder.record(self._name, "upsert", rows, on_conflict)
+        if on_conflict is not None:
+            kwargs["on_conflict"] = on_conflict
+        return self._builder.upsert(rows, **kwargs)
+
+    def __getattr__(self, attr):
+        return getattr(self._builder, attr)
+
+
+class RecordingClient:
+    """บันทึกทุก write เป็น <record_dir>/<table>.jsonl (1 บรรทัดต่อ request) แล้วส่งต่อให้ client จริง"""
+
+    def __init__(self, inner, record_dir):
+        self._inner = inner
+        self._record_dir = record_dir
+        self._lock = threading.Lock()
+        os.makedirs(record_dir, exist_ok=True)
+
+    def record(self, table, op, rows, on_conflict):
+        line = json.dumps({"table": table, "op": op, "on_conflict": on_conflict, "rows": rows},
+                          ensure_ascii=False, default=str)
+        with self._lock:
+            with open(os.path.join(self._record_dir, f"{table}.jsonl"), "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+    def table(self, name):
+        return _RecordingTable(self, name, self._inner.table(name))
+
+    from_ = table
+
+    def __getattr__(self, attr):
+        return getattr(self._inner, attr)
+
+
+class _MeteredQuery:
+    """ห่อ query builder แล้วจับเวลา execute() ต่อ table/op และนับแถว+ไบต์ที่เขียน"""
+
+    _OPS = ("insert", "upsert", "update", "delete", "select")
+
+    def __init__(self, builder, table, op="select", rows=None):
+        self._builder = builder
+        self._table = table
+        self._op = op
+        self._rows = rows
+
+    def __getattr__(self, attr):
+        value = getattr(self._builder, attr)
+        if not callable(value):
+            return value
+
+        def call(*args, **kwargs):
+            result = value(*args, **kwargs)
+            if not hasattr(result, "execute"):
+                return result
+            if attr in self._OPS:
+                rows = args[0] if attr in ("insert", "upsert") and args else None
+                return _MeteredQuery(result, self._table, attr, rows)
+            return _MeteredQuery(result, self._table, self._op, self._rows)
+
+        return call
+
+    def execute(self):
+        labels = {"table": self._table, "op": self._op}
+        with metrics.timer("storage_seconds", **labels):
+            response = self._builder.execute()
+        metrics.inc("storage_requests", **labels)
+        if self._rows:
+            metrics.inc("rows_written", len(self._rows) if isinstance(self._rows, list) else 1, **labels)
+            metrics.inc("bytes_sent", payload_size(self._rows), **labels)
+        return response
+
+
+class MeteredClient:
+    """ห่อ client (Supabase / Local / Recording) ให้ทุก request ถูกนับใน run_metrics"""
+
+    def __init__(self, inner):
+        self._inner = inner
+
+    def table(self, name):
+        return _MeteredQuery(self._inner.table(name), name)
+
+    from_ = table
+
+    def __getattr__(self, attr):
+        return getattr(self._inner, attr)
+
+
+def get_client(storage=None):
+    """
+    สร้าง client ตาม TEAMG_STORAGE (หรือค่า storage ที่ส่งมา)
+    backend Supabase จะออกจากโปรแกรมถ้าไม่ได้ตั้ง SUPABASE_URL / SUPABASE_KEY เหมือนที่ทุกสคริปต์ทำมาเดิม
+    """
+    load_dotenv()
+    storage = storage or os.getenv("TEAMG_STORAGE", "supabase")
+
+    if storage == "memory":
+        client = LocalClient(":memory:")
+    elif storage.startswith("sqlite:///"):
+        client = LocalClient(storage[len("sqlite:///"):])
+    elif storage == "supabase":
+        url = os.getenv("SUPABASE_URL")
+        key = os.getenv("SUPABASE_KEY")
+        if not url or not key:
+            print("Error: ไม่พบ SUPABASE_URL หรือ SUPABASE_KEY ในไฟล์ .env")
+            sys.exit(1)
+        from supabase import create_client
+        client = create_client(url, key)
+    else:
+        raise ValueError(f"TEAMG_STORAGE ไม่รองรับ: {storage!r} (ใช้ supabase, memory หรือ sqlite:///path)")
+
+    record_dir = os.getenv("TEAMG_RECORD_DIR")
+    if record_dir:
+        client = RecordingClient(client, record_dir)
+    return MeteredClient(client)
+
+
+class LazyClient:
+    """
+    client ที่ยังไม่สร้างจนกว่าจะถูกใช้ครั้งแรก (เช่น supabase.table(...))
+    import สคริปต์หรือเรียก --help จึงไม่ต้อง import supabase และไม่ต้องมี .env
+    """
+
+    def __init__(self, storage=None):
+        self._storage = storage
+        self._client = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = get_client(self._storage)
+        return self._client
+
+    def table(self, name):
+        return self.get().table(name)
+
+    from_ = table
+
+    def __getattr__(self, attr):
+        return getattr(self.get(), attr)
+
+
+def fetch_all(build_query, page_size=1000):
+    """
+    อ่านทุกแถวของ query ทีละหน้าด้วย .range() (PostgREST คืนได้สูงสุด 1000 แถวต่อ request)
+    build_query() ต้องคืน query ใหม่ทุกครั้ง และควรมี .order() ให้ลำดับคงที่ระหว่างหน้า
+    """
+    rows, start = [], 0
+    while True:
+        page = build_query().range(start, start + page_size - 1).execute().data
+        rows.extend(page)
+        if len(page) < page_size:
+            return rows
+        start += page_size
+
+
+def table_columns(client, table):
+    """
+    ชื่อคอลัมน์ที่มีอยู่จริงในตาราง (จากแถวแรก) ใช้ตัดคอลัมน์ใหม่ที่ยังไม่ได้ alter table ออกก่อนเขียน
+    ตารางว่างคืน None (ไม่รู้ ให้ผู้เรียกเขียนทุกคอลัมน์ตามเดิม)
+    """
+    rows = client.table(table).select("*").limit(1).execute().data
+    return set(rows[0]) if rows else None
+
+
+def write_batches(client, table, rows, op="upsert", on_conflict=None, batch_size=500):
+    """
+    bulk loader: แบ่ง rows เป็น batch แล้ว insert/upsert ทีละ batch
+    คืนจำนวนแถวที่ส่งสำเร็จ
+    """
+    written = 0
+    for i in range(0, len(rows), batch_size):
+        batch = rows[i:i + batch_size]
+        query = client.table(table)
+        if op == "insert":
+            query = query.insert(batch)
+        elif on_conflict:
+            query = query.upsert(batch, on_conflict=on_conflict)
+        else:
+            query = query.upsert(batch)
+        query.execute()
+        written += len(batch)
+    return written
@@ -1,49 +1,257 @@
+import os
+import time
 import streamlit as st
 import pandas as pd
 import plotly.graph_objects as go
-from supabase import create_client
-import os
+from clients import supabase
+from storage import fetch_all
+from ohlc_pyramid import build_pyramid, choose_level, downsample_line
+from dashboard_charts import PriceChart, data_version, line_figure
+from intraday_feed import IntradayFeed, market_open
+import news_index
 from dotenv import load_dotenv
 
 load_dotenv()
 st.set_page_config(layout="wide", page_title="TEAMG Dashboard Baseline")
-supabase = create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_KEY"))
 
-@st.cache_data(ttl=10)
+# เส้นที่วาดทับกราฟราคา (ถ้ามีคอลัมน์ในตาราง)
+OVERLAY_COLUMNS = ['ema_50', 'ema_200']
+
+# หน้า intraday: ทุก session อ่าน delta จาก worker ในหน่วยความจำทุกกี่วินาที (ไม่ query backend)
+INTRADAY_REFRESH = 5
+
+# หน้าข่าว: จำนวนข่าวที่แสดงต่อการค้น
+NEWS_LIMIT = 50
+
+# index ข่าว sync จาก Supabase เป็นเบื้องหลังใน process นี้ทุกกี่วินาที (ต่อจาก news_index.db ของ orchestrator
+# ถ้ามี ไม่งั้นสร้างเองครั้งแรกใน thread ไม่ใช่ใน request ของผู้ใช้)
+NEWS_SYNC_TTL = 600
+
+# ตารางรายวันเปลี่ยนวันละครั้งหลังรอบ orchestrator ราคาระหว่างวันมาจากหน้า intraday
+@st.cache_data(ttl=600)
 def load_data():
     # ดึงจากตารางหลักโดยตรง ไม่ผ่าน View
-    res = supabase.table("teamg_master_analysis").select("*").order("date", desc=True).limit(1000).execute()
-    return pd.DataFrame(res.data)
+    # อ่านประวัติทั้งหมดทีละ 1000 แถว (กราฟจะลดจำนวนแท่งเองตามช่วงที่ดู)
+    rows = fetch_all(lambda: supabase.table("teamg_master_analysis").select("*").order("date", desc=True))
+    return pd.DataFrame(rows)
+
+@st.cache_data(max_entries=4)
+def load_pyramid(version, _df_plot):
+    # รายวัน/สัปดาห์/เดือน คำนวณครั้งเดียวต่อ version ของข้อมูล (ไม่ต้อง hash ทั้ง DataFrame ทุก rerun)
+    return build_pyramid(_df_plot)
+
+@st.cache_data(max_entries=16)
+def cached_line_figure(version, visible_range, _pyramid, _start):
+    # กราฟเส้น (LTTB) สร้างใหม่เฉพาะเมื่อข้อมูลหรือช่วงเปลี่ยน
+    daily = _pyramid["รายวัน"].loc[_start:]
+    line = downsample_line(daily['close'])
+    overlays = {col: downsample_line(daily[col]) for col in OVERLAY_COLUMNS if col in daily.columns}
+    return line_figure(line, overlays, f"ราคาปิด · {len(line)} จุด")
 
-df = load_data()
+@st.cache_data(max_entries=4)
+def overview_figure(version, _summary):
+    ranked = _summary.sort_values("change_pct")
+    fig = go.Figure(go.Bar(x=ranked['change_pct'], y=ranked['symbol'], orientation="h",
+                           marker_color=["#ef5350" if v < 0 else "#26a69a" for v in ranked['change_pct']]))
+    fig.update_layout(height=900, template="plotly_dark", xaxis_title="เปลี่ยนแปลง (%)")
+    return fig
 
-if not df.empty:
-    df.columns = [c.lower() for c in df.columns]
-    latest = df.iloc[0]
+# ช่วงที่ดู -> จำนวนเดือนย้อนหลัง (None = ทั้งหมด)
+RANGES = {"3M": 3, "6M": 6, "1Y": 12, "3Y": 36, "5Y": 60, "ทั้งหมด": None}
+
+@st.cache_data(ttl=300)
+def load_summary():
+    # snapshot ภาพรวมที่ market_summary.py คำนวณไว้แล้ว (1 แถวต่อหุ้น) query เดียวจบ
+    res = supabase.table("market_summary").select("*").execute()
+    return pd.DataFrame(res.data)
 
-    st.title(f"🏹 TEAMG Dashboard - ข้อมูลล่าสุด: {latest['date']}")
+def render_overview():
+    summary = load_summary()
+    if summary.empty:
+        st.warning("ยังไม่มีข้อมูลภาพรวม (รัน market_summary.py หรือ orchestrator.py ก่อน)")
+        return
 
-    # --- ส่วนแสดง Metric หลัก ---
+    st.title(f"📊 ภาพรวม SET50 - ข้อมูลล่าสุด: {summary['as_of'].max()}")
+
+    up = int((summary['change_pct'] > 0).sum())
+    down = int((summary['change_pct'] < 0).sum())
     m1, m2, m3, m4 = st.columns(4)
     with m1:
-        st.metric("ROE (%)", f"{float(latest.get('roe', 0))*100:.2f} %")
+        st.metric("หุ้นขึ้น / ลง", f"{up} / {down}")
     with m2:
-        st.metric("Net Margin (%)", f"{float(latest.get('net_margin', 0))*100:.2f} %")
+        st.metric("เปลี่ยนแปลงเฉลี่ย (%)", f"{summary['change_pct'].mean():.2f} %")
     with m3:
-        st.metric("Z-Score (Volatility)", f"{float(latest.get('z_score', 0)):.2f}")
+        st.metric("RSI > 70 / < 30", f"{int((summary['rsi'] > 70).sum())} / {int((summary['rsi'] < 30).sum())}")
     with m4:
-        st.metric("Close Price", f"{latest['close']:.2f}")
-
-    # --- กราฟเดิมที่ต้องการ ---
-    df_plot = df.sort_values("date")
-    fig = go.Figure()
-    fig.add_trace(go.Candlestick(x=df_plot['date'], open=df_plot['open'], 
-                                 high=df_plot['high'], low=df_plot['low'], 
-                                 close=df_plot['close'], name="TEAMG"))
-    
-    fig.update_layout(height=600, template="plotly_dark", xaxis_rangeslider_visible=False)
+        st.metric("ข่าว 7 วัน", f"{int(summary['news_7d'].sum())}")
+
+    st.plotly_chart(overview_figure(data_version(summary, "as_of"), summary),
+                    use_container_width=True)
+
+    st.write("### ตารางสรุปรายหุ้น")
+    columns = ['symbol', 'as_of', 'close', 'change_pct', 'rsi', 'z_score', 'high_52w', 'low_52w',
+               'pct_from_high', 'volume_ratio', 'news_7d']
+    st.dataframe(summary[columns].sort_values("symbol"), use_container_width=True, hide_index=True)
+
+def render_teamg():
+    df = load_data()
+
+    if not df.empty:
+        df.columns = [c.lower() for c in df.columns]
+        latest = df.iloc[0]
+
+        st.title(f"🏹 TEAMG Dashboard - ข้อมูลล่าสุด: {latest['date']}")
+
+        # --- ส่วนแสดง Metric หลัก ---
+        m1, m2, m3, m4 = st.columns(4)
+        with m1:
+            st.metric("ROE (%)", f"{float(latest.get('roe', 0))*100:.2f} %")
+        with m2:
+            st.metric("Net Margin (%)", f"{float(latest.get('net_margin', 0))*100:.2f} %")
+        with m3:
+            st.metric("Z-Score (Volatility)", f"{float(latest.get('z_score', 0)):.2f}")
+        with m4:
+            st.metric("Close Price", f"{latest['close']:.2f}")
+
+        # --- ความผันผวน / volume (จาก factors.py ถ้ายังไม่มีคอลัมน์จะแสดง -) ---
+        def factor(column, fmt):
+            value = latest.get(column)
+            return fmt.format(float(value)) if value is not None and pd.notna(value) else "-"
+
+        f1, f2, f3, f4 = st.columns(4)
+        with f1:
+            st.metric("ATR 14", factor('atr_14', "{:.2f}"))
+        with f2:
+            st.metric("Volatility 20 / 60 วัน",
+                      f"{factor('vol_20', '{:.1%}')} / {factor('vol_60', '{:.1%}')}")
+        with f3:
+            st.metric("Bollinger Width / Volume Z", f"{factor('bb_width', '{:.3f}')} / {factor('volume_z', '{:.2f}')}")
+        with f4:
+            st.metric("ห่างจากจุดสูงสุด 52 สัปดาห์", factor('pct_from_high_52w', "{:.1f} %"))
+
+        # --- กราฟ: เลือกแท่งรายวัน/สัปดาห์/เดือนตามช่วงที่ดู ให้จำนวนแท่งไม่เกิน MAX_CANDLES ---
+        c1, c2 = st.columns([3, 1])
+        with c1:
+            visible_range = st.radio("ช่วงเวลา", list(RANGES), index=2, horizontal=True)
+        with c2:
+            chart_type = st.radio("รูปแบบ", ["แท่งเทียน", "เส้น"], horizontal=True)
+
+        version = data_version(df)
+        columns = ['date', 'open', 'high', 'low', 'close'] + [c for c in OVERLAY_COLUMNS if c in df.columns]
+        pyramid = load_pyramid(version, df[columns])
+        last_day = pyramid["รายวัน"].index[-1]
+        months = RANGES[visible_range]
+        start = last_day - pd.DateOffset(months=months) if months else None
+
+        if chart_type == "แท่งเทียน":
+            # figure ของ session นี้: version เดิมใช้ของเดิม มีแท่งใหม่ก็ต่อท้ายแทนการสร้างใหม่ทั้งรูป
+            level, bars = choose_level(pyramid, start)
+            chart = st.session_state.setdefault("price_chart", PriceChart())
+            fig = chart.render(bars, key=(visible_range, level), version=version,
+                               title=f"{level} · {len(bars)} แท่ง")
+        else:
+            # เส้นใช้ข้อมูลรายวันแล้วลดจุดด้วย LTTB (คงรูปทรงดีกว่าแท่งรายเดือน)
+            fig = cached_line_figure(version, visible_range, pyramid, start)
+
+        st.plotly_chart(fig, use_container_width=True)
+
+        # --- ตารางข้อมูลดิบ ---
+        st.write("### ตารางข้อมูลล่าสุด")
+        table_columns = [c for c in ['date', 'close', 'rsi', 'z_score', 'macd_hist', 'vol_20', 'volume_z', 'news_sentiment', 'news_stories', 'roe'] if c in df.columns]
+        st.dataframe(df[table_columns].head(10), use_container_width=True)
+
+@st.cache_resource
+def intraday_feed():
+    # worker ตัวเดียวต่อ server ใช้ร่วมกันทุก session
+    return IntradayFeed().start()
+
+@st.fragment(run_every=INTRADAY_REFRESH)
+def intraday_panel(feed):
+    # rerun เฉพาะส่วนนี้: รับแท่งที่ใหม่/เปลี่ยนหลัง cursor ของ session แล้วต่อท้ายกราฟเดิม
+    state = st.session_state.setdefault("intraday", {"cursor": 0, "bars": {}, "chart": PriceChart()})
+    cursor, delta, reset = feed.buffer.since(state["cursor"])
+    if reset:
+        state["bars"] = {}
+    for bar in delta:
+        state["bars"][bar["time"]] = bar
+    state["cursor"] = cursor
+
+    status = "ตลาดเปิด" if market_open() else "ตลาดปิด"
+    polled = feed.last_poll.strftime("%H:%M:%S") if feed.last_poll else "-"
+    st.caption(f"{status} · ดึงล่าสุด {polled} · ได้ {len(delta)} แท่งรอบนี้")
+    if feed.last_error:
+        st.warning(f"ดึงราคาไม่สำเร็จ: {feed.last_error}")
+
+    if not state["bars"]:
+        st.info("ยังไม่มีแท่งระหว่างวัน (นอกเวลาตลาด worker จะไม่ดึงข้อมูล)")
+        return
+
+    bars = pd.DataFrame(state["bars"].values()).set_index("time")
+    bars.index = pd.to_datetime(bars.index)
+    latest = bars.iloc[-1]
+    # ring buffer ยังมีแท่งของ session ก่อนหน้าปนอยู่ได้ metric ของวันนี้ใช้เฉพาะแท่งวันเดียวกับแท่งล่าสุด
+    today = bars[bars.index.date == bars.index[-1].date()]
+    m1, m2 = st.columns(2)
+    with m1:
+        st.metric("ราคาล่าสุด", f"{latest['close']:.2f}", f"{latest['close'] - today['open'].iloc[0]:+.2f}")
+    with m2:
+        st.metric("Volume วันนี้", f"{today['volume'].sum():,.0f}")
+
+    fig = state["chart"].render(bars, key="1m", version=cursor, title=f"แท่ง 1 นาที · {len(bars)} แท่ง",
+                                name=feed.symbol.replace(".BK", ""))
     st.plotly_chart(fig, use_container_width=True)
 
-    # --- ตารางข้อมูลดิบ ---
-    st.write("### ตารางข้อมูลล่าสุด")
-    st.dataframe(df[['date', 'close', 'rsi', 'z_score', 'roe']].head(10), use_container_width=True)
\ No newline at end of file
+def render_intraday():
+    feed = intraday_feed()
+    st.title(f"⏱️ {feed.symbol.replace('.BK', '')} ระหว่างวัน")
+    intraday_panel(feed)
+
+@st.cache_resource
+def news_sync_worker():
+    # worker ตัวเดียวต่อ server sync แบบ incremental ทุก NEWS_SYNC_TTL วินาที
+    return news_index.SyncWorker(supabase, interval=NEWS_SYNC_TTL).start()
+
+@st.cache_resource
+def news_connection():
+    # index ข่าว (SQLite FTS5 จาก news_index.py) เปิดแบบอ่านอย่างเดียวครั้งเดียวต่อ server
+    return news_index.connect(readonly=True)
+
+@st.cache_data(max_entries=2)
+def news_symbols(version, _conn):
+    return [symbol for symbol, _ in news_index.symbols(_conn)]
+
+def render_news():
+    st.title("📰 ข่าว")
+    worker = news_sync_worker()
+    if not os.path.exists(news_index.INDEX_PATH):
+        st.info("กำลังสร้าง index ข่าวเบื้องหลัง ลองเปิดหน้านี้ใหม่ภายหลัง"
+                + (f" (sync ล่าสุดไม่สำเร็จ: {worker.last_error})" if worker.last_error else ""))
+        return
+    version = worker.version
+    conn = news_connection()
+
+    symbols = news_symbols(version, conn)
+    c1, c2 = st.columns([1, 3])
+    with c1:
+        options = ["ทั้งหมด"] + symbols
+        symbol = st.selectbox("หุ้น", options, index=options.index("TEAMG") if "TEAMG" in options else 0)
+    with c2:
+        query = st.text_input("ค้นหา (ไทย/อังกฤษ คั่นหลายคำด้วยช่องว่าง)")
+
+    started = time.perf_counter()
+    results = news_index.search(conn, query, None if symbol == "ทั้งหมด" else symbol, limit=NEWS_LIMIT)
+    st.caption(f"{len(results)} ข่าว · {(time.perf_counter() - started) * 1000:.1f} ms")
+    for row in results:
+        title = f"[{row['title']}]({row['url']})" if row['url'] else row['title']
+        copies = f" (ซ้ำอีก {row['copies'] - 1} ข่าว)" if row['copies'] > 1 else ""
+        st.markdown(f"**{row['news_date'] or '-'}** · {row['symbol'] or '-'} · {title} · _{row['source'] or row['origin']}_{copies}")
+
+PAGES = {
+    "TEAMG": render_teamg,
+    "TEAMG ระหว่างวัน": render_intraday,
+    "ภาพรวม SET50": render_overview,
+    "ข่าว": render_news,
+}
+
+page = st.sidebar.radio("หน้า", list(PAGES))
+PAGES[page]()
@@ -1,21 +1,32 @@
-import yfinance as yf
-import pandas as pd
-import numpy as np
-from supabase import create_client
-import os
+import sys
+import time
+import argparse
+from clients import supabase
+from storage import fetch_all, table_columns, write_batches
+from run_metrics import metrics, run_record
+import factors
 from dotenv import load_dotenv
 
 load_dotenv()
-url = os.getenv("SUPABASE_URL")
-key = os.getenv("SUPABASE_KEY")
-supabase = create_client(url, key)
+
+TABLE = "teamg_master_analysis"
+
+# ดึงประวัติทั้งหมด: EMA เริ่มนับจากวันแรกเสมอ ค่าของวันเก่าจึงไม่ขยับทุกวันตามจุดเริ่มของช่วง
+# (ไม่งั้นทุกแถวจะ "เปลี่ยน" และต้องเขียนทับทั้งตารางทุกรอบ)
+HISTORY_PERIOD = "max"
 
 def run_pipeline(symbol="TEAMG.BK"):
+    # import ตอนใช้งาน เพื่อให้ import โมดูล/--help ไม่ต้องโหลด yfinance + pandas
+    import yfinance as yf
+    import pandas as pd
+    import numpy as np
+
     print(f"🚀 กำลังดึงข้อมูล {symbol}...")
     ticker = yf.Ticker(symbol)
     
-    # 1. ดึงข้อมูลราคา (ย้อนหลัง 2 ปี)
-    df = yf.download(symbol, period="2y", interval="1d", auto_adjust=True)
+    # 1. ดึงข้อมูลราคา
+    with metrics.timer("fetch_seconds", host="yahoo"):
+        df = yf.download(symbol, period=HISTORY_PERIOD, interval="1d", auto_adjust=True)
     if df.empty: return
 
     # จัดการชื่อคอลัมน์ให้ตรงตาม Database
@@ -24,31 +35,73 @@ def run_pipeline(symbol="TEAMG.BK"):
     df = df.reset_index()
     df.columns = [c.lower() for c in df.columns]
 
-    # 2. คำนวณค่าทางเทคนิค
-    df['ema_50'] = df['close'].ewm(span=50, adjust=False).mean()
-    df['ema_200'] = df['close'].ewm(span=200, adjust=False).mean()
-    
-    # RSI
-    delta = df['close'].diff()
-    gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
-    loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
-    df['rsi'] = 100 - (100 / (1 + (gain / loss.replace(0, np.nan))))
-
-    # Z-Score (Window 20 วัน)
-    df['z_score'] = (df['close'] - df['close'].rolling(20).mean()) / df['close'].rolling(20).std()
-
-    # 3. ดึงงบการเงินมา "แปะ" รวมเข้ากับ DataFrame
-    info = ticker.info
-    df['roe'] = info.get("returnOnEquity")
-    df['net_margin'] = info.get("profitMargins")
-    df['market_cap'] = info.get("marketCap")
+    # 2. คำนวณค่าทางเทคนิคทั้งชุดรอบเดียว (EMA, RSI, Z-Score, ATR, Bollinger, MACD, OBV, volatility, 52 สัปดาห์)
+    indicator_started = time.perf_counter()
+    df = factors.add_factors(df)
+    metrics.observe("stage_seconds", time.perf_counter() - indicator_started, stage="indicators")
+
+    # 3. ดึงงบการเงิน (ค่าของวันนี้)
+    with metrics.timer("fetch_seconds", host="yahoo"):
+        info = ticker.info
     df['symbol'] = symbol
     df['date'] = pd.to_datetime(df['date']).dt.strftime('%Y-%m-%d')
 
-    # 4. ส่งข้อมูลขึ้น Supabase (Upsert ทับของเก่า)
+    # 4. ส่งขึ้น Supabase เฉพาะแถวที่ใหม่หรือค่าเปลี่ยน
     records = df.replace({np.nan: None, np.inf: None, -np.inf: None}).to_dict(orient='records')
-    supabase.table("teamg_master_analysis").upsert(records).execute()
-    print(f"✅ อัปเดตข้อมูลสำเร็จ! (Z-Score และ ROE พร้อมใช้งาน)")
+    written = sync_rows(supabase, symbol, records, info)
+    print(f"✅ อัปเดตข้อมูลสำเร็จ! เขียน {written} / {len(records)} แถว (ที่เหลือไม่เปลี่ยน)")
+
+
+def sync_rows(client, symbol, records, info):
+    """
+    เขียนเฉพาะแถวที่ใหม่หรือค่าเปลี่ยน คืนจำนวนแถวที่เขียน
+    roe / net_margin / market_cap จาก ticker.info เป็นค่าของวันนี้ แปะเฉพาะแถวล่าสุด
+    (market_cap ขยับทุกวัน ถ้าแปะทุกแถว ทั้งประวัติจะ "เปลี่ยน" ทุกรอบ)
+    """
+    if not records:
+        return 0
+    latest = dict(records[-1], roe=info.get("returnOnEquity"), net_margin=info.get("profitMargins"),
+                  market_cap=info.get("marketCap"))
+    history = records[:-1]
+
+    # คอลัมน์ factor ใหม่ที่ยังไม่ได้ alter table (DDL อยู่ใน factors.py) ข้ามไปก่อน ไม่ให้ทั้งงานล้ม
+    available = table_columns(client, TABLE)
+    missing = [c for c in latest if available is not None and c not in available]
+    if missing:
+        print(f"⚠️ {TABLE} ยังไม่มีคอลัมน์ {', '.join(missing)} (ดู DDL ใน factors.py) เขียนเฉพาะคอลัมน์ที่มี")
+        metrics.inc("columns_skipped", len(missing), table=TABLE)
+        latest = {k: v for k, v in latest.items() if k not in missing}
+        history = [{k: v for k, v in record.items() if k not in missing} for record in history]
+    columns = ", ".join(["symbol", "date"] + [c for c in latest if c not in ("symbol", "date")])
+    existing = fetch_all(lambda: client.table(TABLE).select(columns).eq("symbol", symbol).order("date"))
+
+    # แถวเก่าเทียบเฉพาะราคา/factor (changed_rows เทียบแค่คอลัมน์ที่มีใน record) แถวล่าสุดเทียบรวมงบด้วย
+    changed = factors.changed_rows(history, existing)
+    newest = factors.changed_rows([latest], existing)
+    metrics.inc("rows_unchanged", len(records) - len(changed) - len(newest), table=TABLE)
+    write_batches(client, TABLE, changed)
+    write_batches(client, TABLE, newest)
+    return len(changed) + len(newest)
+
+
+def check_rerun():
+    """รันซ้ำด้วย marketCap ใหม่บน storage จำลอง ต้องเขียนแค่แถวล่าสุดแถวเดียว"""
+    from storage import get_client
+
+    client = get_client("memory")
+    records = [{"symbol": "CHECK", "date": f"2026-01-{day:02d}", "close": 10.0 + day, "rsi": 50.0}
+               for day in range(1, 11)]
+    first = sync_rows(client, "CHECK", records, {"marketCap": 1_000})
+    rerun = sync_rows(client, "CHECK", [dict(r) for r in records], {"marketCap": 1_050})
+    print(f"รอบแรกเขียน {first} แถว / รันซ้ำ (marketCap เปลี่ยน) เขียน {rerun} แถว")
+    return first == len(records) and rerun == 1
 
 if __name__ == "__main__":
-    run_pipeline()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="ดึงราคา + คำนวณ indicator แล้ว upsert ลง teamg_master_analysis")
+    parser.add_argument("--symbol", default="TEAMG.BK", help="ชื่อหุ้นแบบ Yahoo เช่น TEAMG.BK")
+    parser.add_argument("--check", action="store_true", help="ตรวจว่ารันซ้ำเขียนเฉพาะแถวที่เปลี่ยน (ไม่ต่อเน็ต)")
+    args = parser.parse_args()
+    if args.check:
+        sys.exit(0 if check_rerun() else 1)
+    with run_record("indicators", symbol=args.symbol):
+        run_pipeline(args.symbol)
\ No newline at end of file
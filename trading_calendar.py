@@ -0,0 +1,150 @@
+"""
+ปฏิทินวันทำการของตลาดหลักทรัพย์ฯ (SET)
+
+ใช้ตัดสินว่าวันไหนมีราคาให้ดึง และคำนวณ session ที่ยังขาดใน DB ให้ตรงวัน
+แทนการยิง Yahoo ทุกวันตามปฏิทินแล้วได้ DataFrame ว่างกลับมา
+
+- วันหยุดวันที่ตายตัว + วันหยุดชดเชยเมื่อตรงเสาร์/อาทิตย์ (คำนวณให้ทุกปี)
+- วันหยุดทางจันทรคติ (มาฆะ วิสาขะ อาสาฬหะ) และวันหยุดพิเศษ ต้องใส่ทีละปีใน LUNAR_HOLIDAYS / SPECIAL_CLOSURES
+- แก้เพิ่มได้โดยไม่ต้องแก้โค้ดผ่านไฟล์ trading_calendar.json:
+    {"closed": {"2026-06-02": "วันหยุดพิเศษ"}, "open": ["2026-12-31"]}
+
+ควรเทียบกับประกาศวันหยุดของ SET ทุกต้นปี
+"""
+import os
+import json
+import logging
+from functools import lru_cache
+from datetime import date, datetime, timedelta
+
+# ไฟล์ override (ไม่มีก็ได้)
+OVERRIDE_FILE = os.environ.get("TEAMG_TRADING_CALENDAR", "trading_calendar.json")
+
+# วันหยุดวันที่ตายตัว (เดือน, วัน) -> ชื่อ ถ้าตรงเสาร์/อาทิตย์จะชดเชยวันทำการถัดไป
+FIXED_HOLIDAYS = {
+    (1, 1): "วันขึ้นปีใหม่",
+    (4, 6): "วันจักรี",
+    (4, 13): "วันสงกรานต์",
+    (4, 14): "วันสงกรานต์",
+    (4, 15): "วันสงกรานต์",
+    (5, 1): "วันแรงงานแห่งชาติ",
+    (5, 4): "วันฉัตรมงคล",
+    (6, 3): "วันเฉลิมพระชนมพรรษาพระราชินี",
+    (7, 28): "วันเฉลิมพระชนมพรรษา ร.10",
+    (8, 12): "วันแม่แห่งชาติ",
+    (10, 13): "วันนวมินทรมหาราช",
+    (10, 23): "วันปิยมหาราช",
+    (12, 5): "วันพ่อแห่งชาติ",
+    (12, 10): "วันรัฐธรรมนูญ",
+    (12, 31): "วันสิ้นปี",
+}
+
+# วันหยุดทางจันทรคติ (วันจริง ถ้าตรงเสาร์/อาทิตย์จะชดเชยให้เอง)
+LUNAR_HOLIDAYS = {
+    2024: {date(2024, 2, 24): "วันมาฆบูชา", date(2024, 5, 22): "วันวิสาขบูชา", date(2024, 7, 20): "วันอาสาฬหบูชา"},
+    2025: {date(2025, 2, 12): "วันมาฆบูชา", date(2025, 5, 11): "วันวิสาขบูชา", date(2025, 7, 10): "วันอาสาฬหบูชา"},
+    2026: {date(2026, 3, 3): "วันมาฆบูชา", date(2026, 5, 31): "วันวิสาขบูชา", date(2026, 7, 29): "วันอาสาฬหบูชา"},
+    2027: {date(2027, 2, 20): "วันมาฆบูชา", date(2027, 5, 20): "วันวิสาขบูชา", date(2027, 7, 18): "วันอาสาฬหบูชา"},
+}
+
+# วันหยุดพิเศษที่ประกาศเพิ่มระหว่างปี (ไม่ชดเชย)
+SPECIAL_CLOSURES = {}
+
+
+def _load_overrides():
+    if not os.path.exists(OVERRIDE_FILE):
+        return {}, set()
+    with open(OVERRIDE_FILE, encoding="utf-8") as f:
+        data = json.load(f)
+    closed = {date.fromisoformat(d): name for d, name in data.get("closed", {}).items()}
+    opened = {date.fromisoformat(d) for d in data.get("open", [])}
+    return closed, opened
+
+
+@lru_cache(maxsize=None)
+def holidays(year):
+    """วันหยุดตลาดของปี (ไม่รวมเสาร์/อาทิตย์) คืน dict วันที่ -> ชื่อวันหยุด"""
+    observed = {}
+    actual = {date(year, month, day): name for (month, day), name in FIXED_HOLIDAYS.items()}
+    if year not in LUNAR_HOLIDAYS:
+        # ไม่มีข้อมูลปีนี้ = มาฆะ/วิสาขะ/อาสาฬหะ กลายเป็นวันทำการไปเงียบ ๆ ต้องเพิ่ม LUNAR_HOLIDAYS
+        logging.warning(f"trading_calendar: ยังไม่มีวันหยุดทางจันทรคติของปี {year} ใน LUNAR_HOLIDAYS "
+                        f"(เพิ่มตามประกาศ SET หรือใส่ใน {OVERRIDE_FILE})")
+    actual.update(LUNAR_HOLIDAYS.get(year, {}))
+
+    # วันธรรมดาลงก่อน แล้วค่อยหาวันชดเชยให้วันที่ตรงเสาร์/อาทิตย์ (ไม่ทับวันหยุดอื่น)
+    for day in sorted(actual):
+        if day.weekday() < 5:
+            observed[day] = actual[day]
+    for day in sorted(actual):
+        if day.weekday() >= 5:
+            substitute = day + timedelta(days=1)
+            while substitute.weekday() >= 5 or substitute in observed or substitute in actual:
+                substitute += timedelta(days=1)
+            observed[substitute] = f"ชดเชย{actual[day]}"
+
+    for day, name in SPECIAL_CLOSURES.items():
+        if day.year == year:
+            observed[day] = name
+
+    closed, opened = _load_overrides()
+    observed.update({day: name for day, name in closed.items() if day.year == year})
+    for day in opened:
+        observed.pop(day, None)
+    return observed
+
+
+def _as_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, str):
+        return date.fromisoformat(value[:10])
+    return value
+
+
+def is_trading_day(day=None):
+    """ตลาดเปิดวันนี้ไหม (day เป็น date / datetime / 'YYYY-MM-DD')"""
+    day = _as_date(day or date.today())
+    return day.weekday() < 5 and day not in holidays(day.year)
+
+
+def trading_days(start, end):
+    """วันทำการทั้งหมดตั้งแต่ start ถึง end (รวมทั้งสองวัน)"""
+    start, end = _as_date(start), _as_date(end)
+    days = []
+    day = start
+    while day <= end:
+        if is_trading_day(day):
+            days.append(day)
+        day += timedelta(days=1)
+    return days
+
+
+def previous_trading_day(day=None):
+    """วันทำการก่อนหน้า day (ไม่รวม day)"""
+    day = _as_date(day or date.today()) - timedelta(days=1)
+    while not is_trading_day(day):
+        day -= timedelta(days=1)
+    return day
+
+
+def missing_sessions(last_date, today=None):
+    """
+    session ที่ยังไม่มีใน DB: วันทำการหลัง last_date จนถึง today
+    last_date เป็น None (ยังไม่มีข้อมูล) คืน None ให้ผู้เรียกตัดสินใจดึงย้อนหลังทั้งหมดเอง
+    """
+    if last_date is None:
+        return None
+    return trading_days(_as_date(last_date) + timedelta(days=1), _as_date(today or date.today()))
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="แสดงวันหยุดตลาดของปี")
+    parser.add_argument("year", type=int, nargs="?", default=date.today().year)
+    args = parser.parse_args()
+
+    for day, name in sorted(holidays(args.year).items()):
+        print(f"{day}  {day.strftime('%a')}  {name}")
+    print(f"วันทำการทั้งปี: {len(trading_days(date(args.year, 1, 1), date(args.year, 12, 31)))} วัน")
@@ -1,34 +1,19 @@
-import os
 import time
-import feedparser
+import argparse
 from datetime import datetime
-from supabase import create_client, Client
+from clients import supabase
+from http_client import parse_feed
 from dotenv import load_dotenv
+from news_dates import feed_entry_date, to_iso
+from run_metrics import metrics, run_record
+from resilience import call, dead_letters, prioritize
+import news_dedup
 import logging
-
-# ตั้งค่า logging ลงไฟล์ + แสดงบน console
-log_file = 'set50_news_log.txt'
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(log_file, mode='a', encoding='utf-8'),
-        logging.StreamHandler()
-    ]
-)
+from log_setup import setup_logging
 
 # โหลด .env
 load_dotenv()
 
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-
-if not SUPABASE_URL or not SUPABASE_KEY:
-    logging.error("ไม่พบ SUPABASE_URL หรือ SUPABASE_KEY ใน .env")
-    exit(1)
-
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-
 # รายชื่อหุ้น SET50 (อัพเดต ณ ม.ค. 2026 - ถ้ามีปรับดัชนี แก้ list นี้ได้เลย)
 SET50_SYMBOLS = [
     "AOT", "ADVANC", "BANPU", "BBL", "BCP", "BDMS", "BEM", "BGRIM", "BTS", "CBG",
@@ -38,20 +23,18 @@ SET50_SYMBOLS = [
     "TRUE", "TTA", "TU", "VGI", "WHA", "AMATA", "BCH", "CRC", "JMT"
 ]
 
+# ชื่องานใน dead_letters.json
+DEAD_LETTER_JOB = "news"
+
 def get_news_date(entry):
-    published = entry.get("published_parsed")
-    if published:
-        try:
-            dt = datetime.fromtimestamp(time.mktime(published))
-            return dt.strftime("%Y-%m-%d")
-        except:
-            pass
-    return datetime.now().strftime("%Y-%m-%d")
+    """วันที่ข่าวแบบ 'YYYY-MM-DD' หรือ None ถ้าไม่รู้วันที่ (ข่าวนั้นจะไม่ถูก upsert)"""
+    return to_iso(feed_entry_date(entry))
 
 def fetch_kaohoon_rss_news(symbol, limit=10):
     rss_url = f"https://www.kaohoon.com/feed/?s={symbol}"
     try:
-        feed = feedparser.parse(rss_url)
+        with metrics.timer("feed_seconds", source="Kaohoon"):
+            feed = parse_feed(rss_url)
         if feed.bozo:
             logging.warning(f"Kaohoon RSS Error สำหรับ {symbol}: {feed.bozo_exception}")
             return []
@@ -75,17 +58,20 @@ def fetch_kaohoon_rss_news(symbol, limit=10):
                 news["news_date"] = get_news_date(entry)
                 news_list.append(news)
 
-        logging.info(f"Kaohoon: พบ {len(news_list)} ข่าวสำหรับ {symbol}")
+        metrics.inc("rows_matched", len(news_list), source="Kaohoon")
+        logging.info(f"Kaohoon: พบ {len(news_list)} ข่าวสำหรับ {symbol}",
+                     extra={"symbol": symbol, "source": "Kaohoon", "count": len(news_list)})
         return news_list
 
     except Exception as e:
         logging.error(f"Kaohoon Error ดึง {symbol}: {e}")
-        return []
+        raise
 
 def fetch_set_rss_news(symbol, limit=5):
     rss_url = "https://www.set.or.th/en/rss/news.rss"
     try:
-        feed = feedparser.parse(rss_url)
+        with metrics.timer("feed_seconds", source="SET"):
+            feed = parse_feed(rss_url)
         news_list = []
         symbol_upper = symbol.upper()
 
@@ -108,17 +94,20 @@ def fetch_set_rss_news(symbol, limit=5):
                 if len(news_list) >= limit:
                     break
 
-        logging.info(f"SET: พบ {len(news_list)} ข่าวสำหรับ {symbol}")
+        metrics.inc("rows_matched", len(news_list), source="SET")
+        logging.info(f"SET: พบ {len(news_list)} ข่าวสำหรับ {symbol}",
+                     extra={"symbol": symbol, "source": "SET", "count": len(news_list)})
         return news_list
 
     except Exception as e:
         logging.error(f"SET Error ดึง {symbol}: {e}")
-        return []
+        raise
 
 def fetch_investing_rss_news(symbol, limit=5):
     rss_url = "https://th.investing.com/rss/news_95.rss"
     try:
-        feed = feedparser.parse(rss_url)
+        with metrics.timer("feed_seconds", source="Investing"):
+            feed = parse_feed(rss_url)
         news_list = []
         symbol_upper = symbol.upper()
 
@@ -141,17 +130,20 @@ def fetch_investing_rss_news(symbol, limit=5):
                 if len(news_list) >= limit:
                     break
 
-        logging.info(f"Investing: พบ {len(news_list)} ข่าวสำหรับ {symbol}")
+        metrics.inc("rows_matched", len(news_list), source="Investing")
+        logging.info(f"Investing: พบ {len(news_list)} ข่าวสำหรับ {symbol}",
+                     extra={"symbol": symbol, "source": "Investing", "count": len(news_list)})
         return news_list
 
     except Exception as e:
         logging.error(f"Investing Error ดึง {symbol}: {e}")
-        return []
+        raise
 
 def fetch_manager_rss_news(symbol, limit=5):
     rss_url = "https://www.manager.co.th/rss/stock"
     try:
-        feed = feedparser.parse(rss_url)
+        with metrics.timer("feed_seconds", source="Manager"):
+            feed = parse_feed(rss_url)
         news_list = []
         symbol_upper = symbol.upper()
 
@@ -174,12 +166,22 @@ def fetch_manager_rss_news(symbol, limit=5):
                 if len(news_list) >= limit:
                     break
 
-        logging.info(f"Manager: พบ {len(news_list)} ข่าวสำหรับ {symbol}")
+        metrics.inc("rows_matched", len(news_list), source="Manager")
+        logging.info(f"Manager: พบ {len(news_list)} ข่าวสำหรับ {symbol}",
+                     extra={"symbol": symbol, "source": "Manager", "count": len(news_list)})
         return news_list
 
     except Exception as e:
         logging.error(f"Manager Error ดึง {symbol}: {e}")
-        return []
+        raise
+
+# แหล่งข่าวและจำนวนข่าวสูงสุดต่อหุ้น
+NEWS_SOURCES = [
+    (fetch_kaohoon_rss_news, 10),
+    (fetch_set_rss_news, 5),
+    (fetch_investing_rss_news, 5),
+    (fetch_manager_rss_news, 5),
+]
 
 def update_set50_news():
     total_news = 0
@@ -187,36 +189,72 @@ def update_set50_news():
 
     logging.info(f"\n=== เริ่มอัพเดตข่าว SET50 วันที่ {today} ===")
 
-    for symbol in SET50_SYMBOLS:
-        logging.info(f"เริ่มดึงข่าว {symbol} จากทุกแหล่ง...")
+    # หุ้นที่รอบก่อนดึง/บันทึกไม่ครบ (dead-letter) ทำก่อน
+    for symbol in prioritize(DEAD_LETTER_JOB, SET50_SYMBOLS):
+        logging.info(f"เริ่มดึงข่าว {symbol} จากทุกแหล่ง...", extra={"symbol": symbol})
+        symbol_started = time.perf_counter()
 
-        kaohoon_list = fetch_kaohoon_rss_news(symbol, limit=10)
-        set_list = fetch_set_rss_news(symbol, limit=5)
-        investing_list = fetch_investing_rss_news(symbol, limit=5)
-        manager_list = fetch_manager_rss_news(symbol, limit=5)
-
-        all_news = kaohoon_list + set_list + investing_list + manager_list
+        # แต่ละแหล่งล้มได้โดยไม่กระทบแหล่งอื่น แต่หุ้นนี้จะถูกจดลง dead-letter ให้รอบหน้าทำซ้ำ
+        all_news, errors = [], []
+        for fetch, limit in NEWS_SOURCES:
+            try:
+                all_news += fetch(symbol, limit=limit)
+            except Exception as e:
+                errors.append(e)
+
+        # ข่าวที่ไม่รู้วันที่ไม่ต้อง upsert เพราะ news_date เป็นส่วนหนึ่งของ conflict key
+        undated = [n for n in all_news if not n["news_date"]]
+        if undated:
+            logging.warning(f"ข้าม {len(undated)} ข่าวของ {symbol} ที่ไม่รู้วันที่",
+                            extra={"symbol": symbol, "count": len(undated)})
+            metrics.inc("rows_skipped", len(undated), reason="undated")
+            all_news = [n for n in all_news if n["news_date"]]
+
+        # ข่าวเดียวกันจากหลายแหล่ง (เช่น Kaohoon กับ Manager) เก็บแค่ข่าวแรกตามลำดับ NEWS_SOURCES
+        stories = news_dedup.unique(all_news)
+        if len(stories) < len(all_news):
+            logging.info(f"ข้าม {len(all_news) - len(stories)} ข่าวซ้ำของ {symbol}",
+                         extra={"symbol": symbol, "count": len(all_news) - len(stories)})
+            metrics.inc("rows_skipped", len(all_news) - len(stories), reason="near_duplicate")
+            all_news = stories
 
         if all_news:
             try:
-                supabase.table('stock_news').upsert(
+                query = supabase.table('stock_news').upsert(
                     all_news,
                     on_conflict='symbol, news_date, title'
-                ).execute()
+                )
+                call("supabase", query.execute)
                 inserted = len(all_news)
                 total_news += inserted
-                logging.info(f"นำเข้า {inserted} ข่าวสำหรับ {symbol} จากทุกแหล่งสำเร็จ")
+                logging.info(f"นำเข้า {inserted} ข่าวสำหรับ {symbol} จากทุกแหล่งสำเร็จ",
+                             extra={"symbol": symbol, "count": inserted,
+                                    "duration": round(time.perf_counter() - symbol_started, 3)})
                 # แสดงรายละเอียดข่าวที่เข้า DB (optional)
                 for news in all_news:
-                    logging.info(f"  - {news['source']}: {news['title']} ({news['news_date']})")
+                    logging.info(f"  - {news['source']}: {news['title']} ({news['news_date']})",
+                                 extra={"symbol": symbol, "source": news['source'], "url": news['url']})
             except Exception as e:
-                logging.error(f"Error upsert {symbol}: {e}")
+                logging.error(f"Error upsert {symbol}: {e}", extra={"symbol": symbol})
+                errors.append(e)
+
+        if errors:
+            dead_letters.add(DEAD_LETTER_JOB, symbol, "; ".join(str(e) for e in errors))
+        else:
+            dead_letters.remove(DEAD_LETTER_JOB, symbol)
 
         time.sleep(3)  # Delay ระหว่างหุ้น
 
-    logging.info(f"\nสรุปการอัพเดตวันนี้: นำเข้าข่าวทั้งหมด {total_news} ข่าวจาก {len(SET50_SYMBOLS)} หุ้น")
+    dead_letters.save()
+    logging.info(f"\nสรุปการอัพเดตวันนี้: นำเข้าข่าวทั้งหมด {total_news} ข่าวจาก {len(SET50_SYMBOLS)} หุ้น",
+                 extra={"count": total_news})
 
 if __name__ == "__main__":
+    argparse.ArgumentParser(description="ดึงข่าวหุ้น SET50 จากทุกแหล่งแล้ว upsert ลง stock_news").parse_args()
+
+    # logging ผ่านคิว + หมุนไฟล์/บีบอัด + JSON (ดู log_setup.py) ตั้งตอนรันเท่านั้น import แล้วไม่แตะ handler
+    setup_logging()
     logging.info("เริ่มโปรแกรมอัพเดตข่าวหุ้น SET50...")
-    update_set50_news()
+    with run_record("news"):
+        update_set50_news()
     logging.info("อัพเดตเสร็จสิ้น")
\ No newline at end of file